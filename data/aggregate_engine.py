@@ -0,0 +1,191 @@
+import threading
+import time
+import numpy as np
+import pandas as pd
+import streamlit as st
+from database.connection import run_query, get_data_versions
+from database.frames import compact_frame
+
+# Engine agregat in-process (opsional), diaktifkan lewat [aggregate_engine] di st.secrets
+ENGINE_DEFAULTS = {
+    'enabled': False,
+    'max_age': 600,
+    'retry_after': 60
+}
+
+# Kolom crime_daily_cube yang di-encode sebagai kode integer (dictionary encoding)
+DIMENSIONS = ('year', 'month', 'daytime', 'weekday', 'crime_category', 'location_category', 'arrest_status', 'domestic_status')
+MEASURES = ('incident_count', 'fact_rows')
+
+_engine_lock = threading.Lock()
+_engine_state = {
+    'engine': None,
+    'version': None,
+    'loaded_at': 0.0,
+    'failed_at': 0.0,
+    'loading': False
+}
+_engine_stats = {
+    'loads': 0,
+    'load_ms': 0.0,
+    'served': 0,
+    'fallbacks': 0
+}
+
+def get_engine_config():
+    """Effective aggregate engine config (defaults + st.secrets["aggregate_engine"])"""
+    config = dict(ENGINE_DEFAULTS)
+    try:
+        config.update(dict(st.secrets.get("aggregate_engine", {})))
+    except Exception:
+        pass
+    return config
+
+class AggregateEngine:
+    """crime_daily_cube in memory: date_key sorted, dimensions as integer codes, measures as int64 arrays"""
+
+    def __init__(self, df):
+        df = df.sort_values('date_key', kind='stable').reset_index(drop=True)
+        self.rows = len(df)
+        self.date_key = df['date_key'].to_numpy(dtype=np.int64)
+        self.codes = {}
+        self.labels = {}
+        for dim in DIMENSIONS:
+            codes, uniques = pd.factorize(df[dim], sort=True)
+            labels = list(uniques.tolist()) + [None]
+            # NULL mendapat kode terakhir supaya tetap menjadi satu grup, seperti GROUP BY di SQL
+            codes = np.where(codes < 0, len(labels) - 1, codes)
+            self.codes[dim] = codes.astype(np.int32)
+            self.labels[dim] = labels
+        self.measures = {measure: df[measure].fillna(0).to_numpy(dtype=np.int64) for measure in MEASURES}
+
+    def _code_of(self, dim, value):
+        """Code of a label (None matches NULL, -1 if the label is unknown)"""
+        try:
+            return self.labels[dim].index(value)
+        except ValueError:
+            return -1
+
+    def select(self, start_key, end_key, filters=None, not_null=()):
+        """Row indices inside [start_key, end_key] matching equality filters and non-NULL dimensions"""
+        lo = np.searchsorted(self.date_key, start_key, side='left')
+        hi = np.searchsorted(self.date_key, end_key, side='right')
+        mask = np.ones(hi - lo, dtype=bool)
+        for dim, value in (filters or {}).items():
+            mask &= self.codes[dim][lo:hi] == self._code_of(dim, value)
+        for dim in not_null:
+            mask &= self.codes[dim][lo:hi] != len(self.labels[dim]) - 1
+        return lo + np.flatnonzero(mask)
+
+    def group_sum(self, rows, dims, measure='incident_count'):
+        """SUM(measure) per combination of dims over the selected rows; returns (label tuples, sums)"""
+        values = self.measures[measure][rows]
+        if not dims:
+            return [()], [int(values.sum())] if len(rows) else [None]
+
+        shape = tuple(len(self.labels[dim]) for dim in dims)
+        flat = np.ravel_multi_index(tuple(self.codes[dim][rows] for dim in dims), shape)
+        counts = np.bincount(flat, minlength=int(np.prod(shape)))
+        sums = np.bincount(flat, weights=values, minlength=int(np.prod(shape)))
+        present = np.flatnonzero(counts)
+        positions = np.unravel_index(present, shape)
+        keys = list(zip(*[[self.labels[dim][code] for code in position] for dim, position in zip(dims, positions)]))
+        return keys, [int(total) for total in sums[present]]
+
+    def grouping_sets(self, start_key, end_key, sets, value_name='total_incidents', filters=None, not_null=(), measure='incident_count'):
+        """Same rows as a SQL GROUP BY GROUPING SETS query, labelled by a grouping_set column"""
+        rows = self.select(start_key, end_key, filters, not_null)
+        columns = []
+        for dims in sets.values():
+            columns += [dim for dim in dims if dim not in columns]
+
+        records = []
+        for set_name, dims in sets.items():
+            keys, sums = self.group_sum(rows, list(dims), measure)
+            for key, total in zip(keys, sums):
+                record = dict.fromkeys(columns)
+                record.update(zip(dims, key))
+                record.update({'grouping_set': set_name, value_name: total})
+                records.append(record)
+        return pd.DataFrame(records, columns=['grouping_set'] + columns + [value_name])
+
+def _load_engine():
+    """Load crime_daily_cube from the database into a new AggregateEngine"""
+    query = """
+    SELECT date_key, year, month, daytime, weekday, crime_category, location_category,
+           arrest_status, domestic_status, incident_count, fact_rows
+    FROM crime_daily_cube
+    """
+    start = time.perf_counter()
+    df = run_query(query, query_class='build', ttl=0, name="aggregate engine load")
+    if df is None:
+        return None
+    engine = AggregateEngine(df)
+    with _engine_lock:
+        _engine_stats['loads'] += 1
+        _engine_stats['load_ms'] = round((time.perf_counter() - start) * 1000, 2)
+    return engine
+
+def _load(version):
+    """Thread latar: memuat engine lalu memasangnya; kegagalan dicoba lagi setelah retry_after"""
+    try:
+        loaded = _load_engine()
+    except Exception:
+        loaded = None
+    with _engine_lock:
+        if loaded is not None:
+            _engine_state.update(engine=loaded, version=version, loaded_at=time.time())
+        else:
+            _engine_state['failed_at'] = time.time()
+        _engine_state['loading'] = False
+
+def get_aggregate_engine():
+    """The process-wide AggregateEngine, or None when disabled, not loaded yet, or out of date (callers fall back to SQL);
+    loading runs in a background thread so no render waits for it"""
+    config = get_engine_config()
+    if not config['enabled']:
+        return None
+
+    now = time.time()
+    versions = get_data_versions()
+    version = versions.get('crime_daily_cube') if versions else None
+    with _engine_lock:
+        engine = _engine_state['engine']
+        if version is not None:
+            # Muat ulang hanya jika cube sudah di-refresh sejak engine dimuat
+            expired = engine is not None and _engine_state['version'] != version
+        else:
+            max_age = float(config['max_age'])
+            expired = engine is not None and max_age > 0 and now - _engine_state['loaded_at'] > max_age
+        retry = now - _engine_state['failed_at'] > float(config['retry_after'])
+        if (engine is None or expired) and retry and not _engine_state['loading']:
+            _engine_state['loading'] = True
+            threading.Thread(target=_load, args=(version,), name="aggregate-engine-load", daemon=True).start()
+        # Engine yang sudah tertinggal tidak dipakai sampai yang baru selesai dimuat
+        return None if expired else engine
+
+def engine_grouping_sets(start_key, end_key, sets, **kwargs):
+    """Answer a GROUPING SETS aggregate from the engine, or None when the caller must run SQL"""
+    engine = get_aggregate_engine()
+    if engine is None:
+        if get_engine_config()['enabled']:
+            with _engine_lock:
+                _engine_stats['fallbacks'] += 1
+        return None
+    with _engine_lock:
+        _engine_stats['served'] += 1
+    return compact_frame(engine.grouping_sets(start_key, end_key, sets, **kwargs))
+
+def get_engine_stats():
+    """Aggregate engine stats (status, size, calls served without SQL)"""
+    with _engine_lock:
+        engine = _engine_state['engine']
+        stats = dict(_engine_stats)
+        version = _engine_state['version']
+    stats.update({
+        'enabled': bool(get_engine_config()['enabled']),
+        'version': version,
+        'rows': engine.rows if engine is not None else 0,
+        'bytes': sum(array.nbytes for array in [engine.date_key, *engine.codes.values(), *engine.measures.values()]) if engine is not None else 0
+    })
+    return stats
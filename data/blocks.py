@@ -0,0 +1,93 @@
+import threading
+import pandas as pd
+import streamlit as st
+from database.connection import run_query, run_query_batch
+from database.frames import compact_frame
+from data.date_range import from_date_key, calendar_blocks
+
+# Pemecahan rentang tanggal menjadi blok tahun penuh, bulan penuh, dan tepi, bisa di-override lewat [month_blocks] di st.secrets.
+# Rentang yang menghasilkan lebih dari max_blocks blok dijalankan sebagai satu query
+BLOCK_DEFAULTS = {
+    'enabled': True,
+    'max_blocks': 36
+}
+
+_block_lock = threading.Lock()
+_block_stats = {
+    'ranges': 0,
+    'whole_range': 0,
+    'over_max_blocks': 0,
+    'full_year_blocks': 0,
+    'full_month_blocks': 0,
+    'edge_blocks': 0
+}
+
+def get_block_config():
+    """Effective month block config (defaults + st.secrets["month_blocks"])"""
+    config = dict(BLOCK_DEFAULTS)
+    try:
+        config.update(dict(st.secrets.get("month_blocks", {})))
+    except Exception:
+        pass
+    return config
+
+def _blocks(params):
+    """Calendar blocks of the range in params, or None when the query should run over the whole range"""
+    config = get_block_config()
+    if not config['enabled'] or params['start_key'] > params['end_key']:
+        return None
+    blocks = calendar_blocks(from_date_key(params['start_key']), from_date_key(params['end_key']))
+    # Tanpa satu pun tahun atau bulan penuh tidak ada blok yang bisa dipakai ulang
+    if all(kind == 'edge' for _, kind in blocks):
+        return None
+    if len(blocks) > int(config['max_blocks']):
+        with _block_lock:
+            _block_stats['over_max_blocks'] += 1
+        return None
+    return blocks
+
+def block_jobs(query, params, query_class='chart', name=None):
+    """run_query_batch jobs running `query` once per calendar block of params' start_key..end_key (one job when the range is not split)"""
+    blocks = _blocks(params)
+    if blocks is None:
+        return [(query, params, query_class, name)]
+    return [(query, {**params, **block_params}, query_class, name) for block_params, _ in blocks]
+
+def merge_blocks(frames, keys):
+    """Combine per-block results of a SUM/COUNT aggregate: rows with equal `keys` are added up (None if any block failed)"""
+    if any(df is None for df in frames):
+        return None
+    columns = list(frames[0].columns)
+    measures = [column for column in columns if column not in keys]
+    # Blok tanpa data (misalnya tahun sebelum data pertama) hanya berisi baris kosong atau ukuran NULL ber-dtype object;
+    # blok itu tidak ikut digabung supaya dtype ukuran tetap angka
+    frames = [frame for frame in frames if frame[measures].notna().any(axis=None)] or frames[:1]
+    if len(frames) == 1:
+        return frames[0]
+
+    # Tiap blok bisa menyimpan teks sebagai category atau string Arrow, jadi key teks digabung sebagai object lalu diringkas lagi
+    df = pd.concat([frame.astype({key: object for key in keys if not pd.api.types.is_numeric_dtype(frame[key])}) for frame in frames],
+                   ignore_index=True)
+    if not keys:
+        return compact_frame(df[measures].sum(min_count=1).to_frame().T.reset_index(drop=True))
+    df = df.groupby(keys, dropna=False, sort=False)[measures].sum(min_count=1).reset_index()
+    return compact_frame(df[columns])
+
+def run_blocked_aggregate(query, params, keys, query_class='chart', name=None):
+    """Run a SUM/COUNT aggregate per calendar block and merge the blocks, so overlapping ranges reuse cached full years and months and only the edges hit the database"""
+    blocks = _blocks(params)
+    with _block_lock:
+        _block_stats['ranges'] += 1
+        if blocks is None:
+            _block_stats['whole_range'] += 1
+        else:
+            for _, kind in blocks:
+                _block_stats[f"{'full_' if kind != 'edge' else ''}{kind}_blocks"] += 1
+    if blocks is None:
+        return run_query(query, params, query_class=query_class, name=name)
+    return merge_blocks(run_query_batch(block_jobs(query, params, query_class, name)), keys)
+
+def get_block_stats():
+    """Calendar block stats (ranges split into blocks, full year/month vs edge blocks, ranges over max_blocks); block cache hits show up per query in Query Stats"""
+    with _block_lock:
+        return dict(_block_stats)
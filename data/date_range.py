@@ -0,0 +1,33 @@
+from datetime import date, timedelta
+
+def to_date_key(value):
+    """Convert a date into the ordered yyyymmdd integer used by dim_date.date_key"""
+    return value.year * 10000 + value.month * 100 + value.day
+
+def resolve_date_range(start_date, end_date):
+    """Resolve a (start_date, end_date) pair into the inclusive dim_date.date_key range parameters"""
+    return {
+        'start_key': to_date_key(start_date),
+        'end_key': to_date_key(end_date)
+    }
+
+def from_date_key(key):
+    """Convert a yyyymmdd date_key back into a date"""
+    return date(key // 10000, key // 100 % 100, key % 100)
+
+def calendar_blocks(start_date, end_date):
+    """Split an inclusive date range into full calendar years, full months, and the partial months at its edges,
+    as (range params, 'year' | 'month' | 'edge') pairs"""
+    blocks = []
+    block_start = start_date
+    while block_start <= end_date:
+        year_end = date(block_start.year, 12, 31)
+        if block_start.month == 1 and block_start.day == 1 and year_end <= end_date:
+            blocks.append((resolve_date_range(block_start, year_end), 'year'))
+            block_start = year_end + timedelta(days=1)
+            continue
+        month_end = date(block_start.year + block_start.month // 12, block_start.month % 12 + 1, 1) - timedelta(days=1)
+        block_end = min(month_end, end_date)
+        blocks.append((resolve_date_range(block_start, block_end), 'month' if block_start.day == 1 and block_end == month_end else 'edge'))
+        block_start = block_end + timedelta(days=1)
+    return blocks
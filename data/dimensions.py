@@ -0,0 +1,120 @@
+import threading
+import time
+import numpy as np
+import pandas as pd
+from database.connection import run_query, get_data_versions
+
+# Dimensi yang di-cache per proses: key integer fakta -> kolom label (join ke kategori sama seperti query lama)
+DIMENSIONS = {
+    'crime': {
+        'key': 'id_crime',
+        'tables': ('dim_crime', 'dim_crime_category'),
+        'query': """
+        SELECT dc.id_crime, dc.primary_type, dc.description, dcc.crime_category
+        FROM dim_crime dc
+        JOIN dim_crime_category dcc ON dc.id_crime_category = dcc.id_crime_category
+        """
+    },
+    'location': {
+        'key': 'id_location',
+        'tables': ('dim_location', 'dim_location_category'),
+        'query': """
+        SELECT dl.id_location, dl.location_description, dlc.location_category
+        FROM dim_location dl
+        JOIN dim_location_category dlc ON dl.id_location_category = dlc.id_location_category
+        """
+    }
+}
+
+# Umur maksimum cache dimensi (detik) jika watermark tidak tersedia
+DIMENSION_MAX_AGE = 3600
+
+_dimension_lock = threading.Lock()
+_dimensions = {}
+_dimension_stats = {
+    'loads': 0,
+    'hits': 0
+}
+
+class DimensionLabels:
+    """One dimension table held as an id index plus, per label column, category codes and categories"""
+
+    def __init__(self, df, key):
+        self.key = key
+        self.ids = pd.Index(df[key].to_numpy())
+        self.labels = {}
+        for column in df.columns:
+            if column == key:
+                continue
+            codes, categories = pd.factorize(df[column].astype(object), sort=True)
+            self.labels[column] = (codes, pd.Index(categories))
+
+    def ids_where(self, column, value):
+        """Ids whose label in `column` equals `value`"""
+        codes, categories = self.labels[column]
+        if value not in categories:
+            return []
+        return self.ids[codes == categories.get_loc(value)].tolist()
+
+    def positions(self, keys):
+        """Row position of each fact key in this dimension (-1 when the key has no dimension row)"""
+        return self.ids.get_indexer(pd.Index(keys))
+
+    def categorical(self, column, positions):
+        """Labels of `column` for the given row positions, as a pandas Categorical"""
+        codes, categories = self.labels[column]
+        fact_codes = np.full(len(positions), -1, dtype=np.int64)
+        found = positions >= 0
+        fact_codes[found] = codes[positions[found]]
+        return pd.Categorical.from_codes(fact_codes, categories=categories)
+
+def _version_token(tables):
+    """Watermark version of the dimension tables (or a time bucket when watermarks are unavailable)"""
+    versions = get_data_versions()
+    if versions and all(table in versions for table in tables):
+        return tuple(versions[table] for table in tables)
+    return int(time.time() // DIMENSION_MAX_AGE)
+
+def get_dimension(name):
+    """Process-wide labels of one dimension, reloaded only when its tables' watermark changes (None if unavailable)"""
+    spec = DIMENSIONS[name]
+    token = _version_token(spec['tables'])
+    with _dimension_lock:
+        cached = _dimensions.get(name)
+        if cached is not None and cached['token'] == token:
+            _dimension_stats['hits'] += 1
+            return cached['labels']
+
+    df = run_query(spec['query'], query_class='metadata', ttl=0, name=f"dimension {name}")
+    if df is None:
+        return cached['labels'] if cached is not None else None
+    labels = DimensionLabels(df, spec['key'])
+    with _dimension_lock:
+        _dimensions[name] = {'token': token, 'labels': labels}
+        _dimension_stats['loads'] += 1
+    return labels
+
+def attach_labels(df, columns):
+    """Replace integer dimension keys ({dimension: [label columns]}) with label Categoricals, dropping rows without a dimension row like an INNER JOIN"""
+    keep = np.ones(len(df), dtype=bool)
+    labelled = {}
+    for name, label_columns in columns.items():
+        dimension = get_dimension(name)
+        if dimension is None:
+            return None
+        positions = dimension.positions(df[dimension.key])
+        keep &= positions >= 0
+        for column in label_columns:
+            labelled[column] = dimension.categorical(column, positions)
+
+    df = df.drop(columns=[DIMENSIONS[name]['key'] for name in columns])
+    for column, values in labelled.items():
+        df[column] = values
+    return df[keep].reset_index(drop=True)
+
+def get_dimension_stats():
+    """Dimension cache stats (loads, hits, rows per dimension)"""
+    with _dimension_lock:
+        stats = dict(_dimension_stats)
+        stats['rows'] = {name: len(entry['labels'].ids) for name, entry in _dimensions.items()}
+    return stats
@@ -1,513 +1,265 @@
-import streamlit as st
 import pandas as pd
-from database.connection import init_connection
+from database.connection import run_query
+from data.date_range import resolve_date_range
+from data.aggregate_engine import engine_grouping_sets
+from data.blocks import run_blocked_aggregate
+from data.dimensions import attach_labels, get_dimension
+from data.metrics import get_metric_value
+from data.sketches import get_distinct_count
 
-def get_total_cases_by_date_range(start_date, end_date):
-    """Get total number of cases within date range"""
-    engine = init_connection()
-    if engine is None:
-        return 0
-    
-    try:
-        start_year = start_date.year
-        start_month = start_date.month
-        start_day = start_date.day
-        end_year = end_date.year
-        end_month = end_date.month
-        end_day = end_date.day
-        
-        query = """
-        SELECT SUM(crime_facts.incident_count) AS total_incidents 
-        FROM crime_facts 
-        JOIN dim_date ON crime_facts.id_date = dim_date.id_date
-        WHERE (dim_date.year > %(start_year)s OR 
-               (dim_date.year = %(start_year)s AND dim_date.month > %(start_month)s) OR
-               (dim_date.year = %(start_year)s AND dim_date.month = %(start_month)s AND dim_date.day >= %(start_day)s))
-        AND (dim_date.year < %(end_year)s OR 
-             (dim_date.year = %(end_year)s AND dim_date.month < %(end_month)s) OR
-             (dim_date.year = %(end_year)s AND dim_date.month = %(end_month)s AND dim_date.day <= %(end_day)s))
-        """
-        
-        params = {
-            'start_year': start_year,
-            'start_month': start_month, 
-            'start_day': start_day,
-            'end_year': end_year,
-            'end_month': end_month,
-            'end_day': end_day
-        }
-        
-        df = pd.read_sql_query(query, engine, params=params)
-        return int(df['total_incidents'].iloc[0]) if not df.empty and df['total_incidents'].iloc[0] is not None else 0
-    except Exception as e:
-        st.error(f"Error fetching total cases: {e}")
-        return 0
-
-def get_crime_hotspot_category_by_date_range(start_date, end_date):
-    """Get the location category with highest crime count within date range"""
-    engine = init_connection()
-    if engine is None:
-        return None, 0
-    
-    try:
-        start_year = start_date.year
-        start_month = start_date.month
-        start_day = start_date.day
-        end_year = end_date.year
-        end_month = end_date.month
-        end_day = end_date.day
-        
-        query = """
-        SELECT dim_location_category.location_category, SUM(crime_facts.incident_count) as total_cases
+def get_geographic_kpis(start_date, end_date):
+    """Get top location category and top location description from a single filtered scan (the page total comes from the `incidents` metric)"""
+    query = """
+    WITH grouped AS (
+        SELECT 
+            CASE
+                WHEN GROUPING(dim_location_category.id_location_category) = 0 THEN 'location_category'
+                ELSE 'location_description'
+            END AS grouping_set,
+            dim_location_category.location_category,
+            dim_location.location_description,
+            SUM(crime_facts.incident_count) AS total_cases
         FROM crime_facts
         JOIN dim_location ON dim_location.id_location = crime_facts.id_location
         JOIN dim_location_category ON dim_location.id_location_category = dim_location_category.id_location_category
         JOIN dim_date ON crime_facts.id_date = dim_date.id_date
-        WHERE (dim_date.year > %(start_year)s OR 
-               (dim_date.year = %(start_year)s AND dim_date.month > %(start_month)s) OR
-               (dim_date.year = %(start_year)s AND dim_date.month = %(start_month)s AND dim_date.day >= %(start_day)s))
-        AND (dim_date.year < %(end_year)s OR 
-             (dim_date.year = %(end_year)s AND dim_date.month < %(end_month)s) OR
-             (dim_date.year = %(end_year)s AND dim_date.month = %(end_month)s AND dim_date.day <= %(end_day)s))
-        GROUP BY dim_location_category.id_location_category, dim_location_category.location_category
-        ORDER BY total_cases DESC
-        LIMIT 1
-        """
-        
-        params = {
-            'start_year': start_year,
-            'start_month': start_month, 
-            'start_day': start_day,
-            'end_year': end_year,
-            'end_month': end_month,
-            'end_day': end_day
-        }
-        
-        df = pd.read_sql_query(query, engine, params=params)
-        if not df.empty:
-            return df['location_category'].iloc[0], int(df['total_cases'].iloc[0])
-        return None, 0
-    except Exception as e:
-        st.error(f"Error fetching crime hotspot category: {e}")
-        return None, 0
+        WHERE dim_date.date_key BETWEEN %(start_key)s AND %(end_key)s
+        GROUP BY GROUPING SETS (
+            (dim_location_category.id_location_category, dim_location_category.location_category),
+            (dim_location.id_location, dim_location.location_description)
+        )
+    )
+    SELECT grouping_set, location_category, location_description, total_cases
+    FROM (
+        SELECT grouped.*, ROW_NUMBER() OVER (PARTITION BY grouping_set ORDER BY total_cases DESC) AS rank
+        FROM grouped
+    ) ranked
+    WHERE rank = 1
+    """
+    
+    params = resolve_date_range(start_date, end_date)
+    
+    kpis = {
+        "hotspot_category": None,
+        "hotspot_cases": 0,
+        "risky_area": None,
+        "risky_cases": 0
+    }
+    df = run_query(query, params, query_class='kpi', name="geographic kpis")
+    if df is None:
+        return kpis
+
+    for _, row in df.iterrows():
+        if row['grouping_set'] == 'location_category':
+            kpis["hotspot_category"] = row['location_category']
+            kpis["hotspot_cases"] = int(row['total_cases'])
+        elif row['grouping_set'] == 'location_description':
+            kpis["risky_area"] = row['location_description']
+            kpis["risky_cases"] = int(row['total_cases'])
+    return kpis
+
+def get_total_cases_by_date_range(start_date, end_date):
+    """Get total number of cases within date range (shared `incidents` metric)"""
+    return get_metric_value('incidents', start_date, end_date)
+
+def get_crime_hotspot_category_by_date_range(start_date, end_date):
+    """Get the location category with highest crime count within date range"""
+    kpis = get_geographic_kpis(start_date, end_date)
+    return kpis["hotspot_category"], kpis["hotspot_cases"]
 
 def get_crime_hotspot_by_date_range(start_date, end_date):
     """Get the location with highest crime count within date range (kept for backward compatibility)"""
-    engine = init_connection()
-    if engine is None:
-        return None, 0
-    
-    try:
-        start_year = start_date.year
-        start_month = start_date.month
-        start_day = start_date.day
-        end_year = end_date.year
-        end_month = end_date.month
-        end_day = end_date.day
-        
-        query = """
-        SELECT dim_location.location_description, SUM(crime_facts.incident_count) as total_cases
-        FROM crime_facts
-        JOIN dim_location ON dim_location.id_location = crime_facts.id_location
-        JOIN dim_date ON crime_facts.id_date = dim_date.id_date
-        WHERE (dim_date.year > %(start_year)s OR 
-               (dim_date.year = %(start_year)s AND dim_date.month > %(start_month)s) OR
-               (dim_date.year = %(start_year)s AND dim_date.month = %(start_month)s AND dim_date.day >= %(start_day)s))
-        AND (dim_date.year < %(end_year)s OR 
-             (dim_date.year = %(end_year)s AND dim_date.month < %(end_month)s) OR
-             (dim_date.year = %(end_year)s AND dim_date.month = %(end_month)s AND dim_date.day <= %(end_day)s))
-        GROUP BY dim_location.id_location, dim_location.location_description
-        ORDER BY total_cases DESC
-        LIMIT 1
-        """
-        
-        params = {
-            'start_year': start_year,
-            'start_month': start_month, 
-            'start_day': start_day,
-            'end_year': end_year,
-            'end_month': end_month,
-            'end_day': end_day
-        }
-        
-        df = pd.read_sql_query(query, engine, params=params)
-        if not df.empty:
-            return df['location_description'].iloc[0], int(df['total_cases'].iloc[0])
-        return None, 0
-    except Exception as e:
-        st.error(f"Error fetching crime hotspot: {e}")
-        return None, 0
+    kpis = get_geographic_kpis(start_date, end_date)
+    return kpis["risky_area"], kpis["risky_cases"]
 
 def get_risky_area_by_date_range(start_date, end_date):
     """Get the riskiest location type within date range"""
-    engine = init_connection()
-    if engine is None:
-        return None, 0
-    
-    try:
-        start_year = start_date.year
-        start_month = start_date.month
-        start_day = start_date.day
-        end_year = end_date.year
-        end_month = end_date.month
-        end_day = end_date.day
-        
-        query = """
-        SELECT dim_location.location_description, SUM(crime_facts.incident_count) as total_cases
-        FROM crime_facts
-        JOIN dim_location ON dim_location.id_location = crime_facts.id_location
-        JOIN dim_date ON crime_facts.id_date = dim_date.id_date
-        WHERE (dim_date.year > %(start_year)s OR 
-               (dim_date.year = %(start_year)s AND dim_date.month > %(start_month)s) OR
-               (dim_date.year = %(start_year)s AND dim_date.month = %(start_month)s AND dim_date.day >= %(start_day)s))
-        AND (dim_date.year < %(end_year)s OR 
-             (dim_date.year = %(end_year)s AND dim_date.month < %(end_month)s) OR
-             (dim_date.year = %(end_year)s AND dim_date.month = %(end_month)s AND dim_date.day <= %(end_day)s))
-        GROUP BY dim_location.id_location, dim_location.location_description
-        ORDER BY total_cases DESC
-        LIMIT 1
-        """
-        
-        params = {
-            'start_year': start_year,
-            'start_month': start_month, 
-            'start_day': start_day,
-            'end_year': end_year,
-            'end_month': end_month,
-            'end_day': end_day
-        }
-        
-        df = pd.read_sql_query(query, engine, params=params)
-        if not df.empty:
-            return df['location_description'].iloc[0], int(df['total_cases'].iloc[0])
-        return None, 0
-    except Exception as e:
-        st.error(f"Error fetching risky area: {e}")
-        return None, 0
+    return get_crime_hotspot_by_date_range(start_date, end_date)
 
-def get_total_areas():
-    """Get total number of areas in database"""
-    engine = init_connection()
-    if engine is None:
-        return 0
-    
-    try:
-        query = "SELECT COUNT(*) as total_areas FROM dim_location"
-        df = pd.read_sql_query(query, engine)
-        return int(df['total_areas'].iloc[0]) if not df.empty else 0
-    except Exception as e:
-        st.error(f"Error fetching total areas: {e}")
+def get_total_areas(start_date=None, end_date=None):
+    """Get total number of areas in database, or the number of distinct areas with incidents in a date range (HyperLogLog estimate)"""
+    if start_date is not None and end_date is not None:
+        return get_distinct_count('location_description', start_date, end_date)
+    query = "SELECT COUNT(*) as total_areas FROM dim_location"
+    df = run_query(query, query_class='metadata', name="total areas")
+    if df is None:
         return 0
+    return int(df['total_areas'].iloc[0]) if not df.empty else 0
 
 def get_map_data_by_date_range(start_date, end_date):
     """Get geographical data for map visualization"""
-    engine = init_connection()
-    if engine is None:
-        return pd.DataFrame()
+    # Fakta diambil dengan key integer; label dimensi ditempel dari cache dimensi proses
+    query = """
+    SELECT 
+        crime_facts.latitude,
+        crime_facts.longitude,
+        crime_facts.id_crime,
+        crime_facts.id_location,
+        SUM(crime_facts.incident_count) as total_incidents
+    FROM crime_facts
+    JOIN dim_date ON crime_facts.id_date = dim_date.id_date
+    WHERE dim_date.date_key BETWEEN %(start_key)s AND %(end_key)s
+    AND crime_facts.latitude IS NOT NULL 
+    AND crime_facts.longitude IS NOT NULL
+    AND crime_facts.id_crime IS NOT NULL
+    AND crime_facts.id_location IS NOT NULL
+    GROUP BY crime_facts.latitude, crime_facts.longitude, crime_facts.id_crime, crime_facts.id_location
+    """
     
-    try:
-        start_year = start_date.year
-        start_month = start_date.month
-        start_day = start_date.day
-        end_year = end_date.year
-        end_month = end_date.month
-        end_day = end_date.day
-        
-        query = """
-        SELECT 
-            crime_facts.latitude,
-            crime_facts.longitude,
-            dim_crime.primary_type,
-            dim_crime_category.crime_category,
-            dim_location.location_description,
-            dim_location_category.location_category,
-            SUM(crime_facts.incident_count) as total_incidents
-        FROM crime_facts
-        JOIN dim_crime ON crime_facts.id_crime = dim_crime.id_crime
-        JOIN dim_crime_category ON dim_crime.id_crime_category = dim_crime_category.id_crime_category
-        JOIN dim_location ON crime_facts.id_location = dim_location.id_location
-        JOIN dim_location_category ON dim_location.id_location_category = dim_location_category.id_location_category
-        JOIN dim_date ON crime_facts.id_date = dim_date.id_date
-        WHERE (dim_date.year > %(start_year)s OR 
-               (dim_date.year = %(start_year)s AND dim_date.month > %(start_month)s) OR
-               (dim_date.year = %(start_year)s AND dim_date.month = %(start_month)s AND dim_date.day >= %(start_day)s))
-        AND (dim_date.year < %(end_year)s OR 
-             (dim_date.year = %(end_year)s AND dim_date.month < %(end_month)s) OR
-             (dim_date.year = %(end_year)s AND dim_date.month = %(end_month)s AND dim_date.day <= %(end_day)s))
-        AND crime_facts.latitude IS NOT NULL 
-        AND crime_facts.longitude IS NOT NULL
-        GROUP BY crime_facts.latitude, crime_facts.longitude, dim_crime.primary_type, 
-                 dim_crime_category.crime_category, dim_location.location_description,
-                 dim_location_category.location_category
-        ORDER BY total_incidents DESC
-        """
-        
-        params = {
-            'start_year': start_year,
-            'start_month': start_month, 
-            'start_day': start_day,
-            'end_year': end_year,
-            'end_month': end_month,
-            'end_day': end_day
-        }
-        
-        df = pd.read_sql_query(query, engine, params=params)
-        return df
-    except Exception as e:
-        st.error(f"Error fetching map data: {e}")
+    params = resolve_date_range(start_date, end_date)
+    
+    df = run_query(query, params, query_class='map', name="map data")
+    if df is None:
+        return pd.DataFrame()
+    df = attach_labels(df, {
+        'crime': ['primary_type', 'crime_category'],
+        'location': ['location_description', 'location_category']
+    })
+    if df is None:
         return pd.DataFrame()
+    columns = ['latitude', 'longitude', 'primary_type', 'crime_category', 'location_description', 'location_category']
+    df = df.groupby(columns, observed=True, sort=False)['total_incidents'].sum().reset_index()
+    return df.sort_values('total_incidents', ascending=False, kind='stable').reset_index(drop=True)
 
 def get_crime_by_location_category(start_date, end_date):
     """Get crime data grouped by location category for doughnut chart"""
-    engine = init_connection()
-    if engine is None:
-        return pd.DataFrame()
+    query = """
+    SELECT 
+        crime_daily_cube.location_category,
+        crime_daily_cube.crime_category,
+        SUM(crime_daily_cube.incident_count) as total_incidents
+    FROM crime_daily_cube
+    WHERE crime_daily_cube.date_key BETWEEN %(start_key)s AND %(end_key)s
+    AND crime_daily_cube.id_location_category IS NOT NULL
+    AND crime_daily_cube.id_crime_category IS NOT NULL
+    GROUP BY crime_daily_cube.location_category, crime_daily_cube.crime_category
+    ORDER BY crime_daily_cube.location_category, total_incidents DESC
+    """
     
-    try:
-        start_year = start_date.year
-        start_month = start_date.month
-        start_day = start_date.day
-        end_year = end_date.year
-        end_month = end_date.month
-        end_day = end_date.day
-        
-        query = """
-        SELECT 
-            dim_location_category.location_category,
-            dim_crime_category.crime_category,
-            SUM(crime_facts.incident_count) as total_incidents
-        FROM crime_facts
-        JOIN dim_location ON crime_facts.id_location = dim_location.id_location
-        JOIN dim_location_category ON dim_location.id_location_category = dim_location_category.id_location_category
-        JOIN dim_crime ON crime_facts.id_crime = dim_crime.id_crime
-        JOIN dim_crime_category ON dim_crime.id_crime_category = dim_crime_category.id_crime_category
-        JOIN dim_date ON crime_facts.id_date = dim_date.id_date
-        WHERE (dim_date.year > %(start_year)s OR 
-               (dim_date.year = %(start_year)s AND dim_date.month > %(start_month)s) OR
-               (dim_date.year = %(start_year)s AND dim_date.month = %(start_month)s AND dim_date.day >= %(start_day)s))
-        AND (dim_date.year < %(end_year)s OR 
-             (dim_date.year = %(end_year)s AND dim_date.month < %(end_month)s) OR
-             (dim_date.year = %(end_year)s AND dim_date.month = %(end_month)s AND dim_date.day <= %(end_day)s))
-        GROUP BY dim_location_category.location_category, dim_crime_category.crime_category
-        ORDER BY dim_location_category.location_category, total_incidents DESC
-        """
-        
-        params = {
-            'start_year': start_year,
-            'start_month': start_month, 
-            'start_day': start_day,
-            'end_year': end_year,
-            'end_month': end_month,
-            'end_day': end_day
-        }
-        
-        df = pd.read_sql_query(query, engine, params=params)
-        return df
-    except Exception as e:
-        st.error(f"Error fetching crime by location category: {e}")
+    params = resolve_date_range(start_date, end_date)
+    
+    df = engine_grouping_sets(params['start_key'], params['end_key'], {'location_category': ('location_category', 'crime_category')},
+                              not_null=('location_category', 'crime_category'))
+    if df is not None:
+        df = df.drop(columns='grouping_set').sort_values(['location_category', 'total_incidents'], ascending=[True, False])
+        return df.reset_index(drop=True)
+    
+    df = run_blocked_aggregate(query, params, ['location_category', 'crime_category'], query_class='chart', name="crime by location category")
+    if df is None:
         return pd.DataFrame()
+    # Blok bulan yang digabung tidak lagi mengikuti ORDER BY query
+    df = df.sort_values(['location_category', 'total_incidents'], ascending=[True, False], kind='stable')
+    return df.reset_index(drop=True)
 
 def get_top_location_descriptions(start_date, end_date, limit=5):
     """Get top location descriptions for bar chart"""
-    engine = init_connection()
-    if engine is None:
-        return pd.DataFrame()
+    query = """
+    SELECT 
+        crime_facts.id_location,
+        crime_facts.id_crime,
+        SUM(crime_facts.incident_count) as total_incidents
+    FROM crime_facts
+    JOIN dim_date ON crime_facts.id_date = dim_date.id_date
+    WHERE dim_date.date_key BETWEEN %(start_key)s AND %(end_key)s
+    AND crime_facts.id_crime IS NOT NULL
+    AND crime_facts.id_location IS NOT NULL
+    GROUP BY crime_facts.id_location, crime_facts.id_crime
+    """
     
-    try:
-        start_year = start_date.year
-        start_month = start_date.month
-        start_day = start_date.day
-        end_year = end_date.year
-        end_month = end_date.month
-        end_day = end_date.day
-        
-        query = """
-        SELECT 
-            dim_location.location_description,
-            dim_location_category.location_category,
-            dim_crime_category.crime_category,
-            SUM(crime_facts.incident_count) as total_incidents
-        FROM crime_facts
-        JOIN dim_location ON crime_facts.id_location = dim_location.id_location
-        JOIN dim_location_category ON dim_location.id_location_category = dim_location_category.id_location_category
-        JOIN dim_crime ON crime_facts.id_crime = dim_crime.id_crime
-        JOIN dim_crime_category ON dim_crime.id_crime_category = dim_crime_category.id_crime_category
-        JOIN dim_date ON crime_facts.id_date = dim_date.id_date
-        WHERE (dim_date.year > %(start_year)s OR 
-               (dim_date.year = %(start_year)s AND dim_date.month > %(start_month)s) OR
-               (dim_date.year = %(start_year)s AND dim_date.month = %(start_month)s AND dim_date.day >= %(start_day)s))
-        AND (dim_date.year < %(end_year)s OR 
-             (dim_date.year = %(end_year)s AND dim_date.month < %(end_month)s) OR
-             (dim_date.year = %(end_year)s AND dim_date.month = %(end_month)s AND dim_date.day <= %(end_day)s))
-        GROUP BY dim_location.location_description, dim_location_category.location_category, dim_crime_category.crime_category
-        ORDER BY total_incidents DESC
-        LIMIT %(limit)s
-        """
-        
-        params = {
-            'start_year': start_year,
-            'start_month': start_month, 
-            'start_day': start_day,
-            'end_year': end_year,
-            'end_month': end_month,
-            'end_day': end_day,
-            'limit': limit
-        }
-        
-        df = pd.read_sql_query(query, engine, params=params)
-        return df
-    except Exception as e:
-        st.error(f"Error fetching top location descriptions: {e}")
+    params = resolve_date_range(start_date, end_date)
+    
+    df = run_query(query, params, query_class='chart', name="top location descriptions")
+    if df is None:
         return pd.DataFrame()
+    df = attach_labels(df, {
+        'location': ['location_description', 'location_category'],
+        'crime': ['crime_category']
+    })
+    if df is None:
+        return pd.DataFrame()
+    columns = ['location_description', 'location_category', 'crime_category']
+    df = df.groupby(columns, observed=True, sort=False)['total_incidents'].sum().reset_index()
+    return df.sort_values('total_incidents', ascending=False, kind='stable').head(limit).reset_index(drop=True)
 
 def get_crime_details_by_date_range(start_date, end_date, location_category=None, crime_category=None):
     """Get detailed crime data for table display"""
-    engine = init_connection()
-    if engine is None:
-        return pd.DataFrame()
+    query = """
+    SELECT 
+        crime_facts.id_crime,
+        dim_date.day,
+        dim_date.month,
+        dim_date.year,
+        dim_date.daytime,
+        crime_facts.arrest_status,
+        crime_facts.id_location,
+        crime_facts.incident_count
+    FROM crime_facts
+    JOIN dim_date ON crime_facts.id_date = dim_date.id_date
+    WHERE dim_date.date_key BETWEEN %(start_key)s AND %(end_key)s
+    AND crime_facts.id_crime IS NOT NULL
+    AND crime_facts.id_location IS NOT NULL
+    """
     
-    try:
-        start_year = start_date.year
-        start_month = start_date.month
-        start_day = start_date.day
-        end_year = end_date.year
-        end_month = end_date.month
-        end_day = end_date.day
-
-        query = """
-        SELECT 
-            dim_crime_category.crime_category,
-            dim_crime.primary_type,
-            dim_crime.description as crime_description,
-            dim_date.day,
-            dim_date.month,
-            dim_date.year,
-            dim_date.daytime,
-            crime_facts.arrest_status,
-            dim_location.location_description,
-            dim_location_category.location_category,
-            crime_facts.incident_count
-        FROM crime_facts
-        JOIN dim_crime ON crime_facts.id_crime = dim_crime.id_crime
-        JOIN dim_crime_category ON dim_crime.id_crime_category = dim_crime_category.id_crime_category
-        JOIN dim_location ON crime_facts.id_location = dim_location.id_location
-        JOIN dim_location_category ON dim_location.id_location_category = dim_location_category.id_location_category
-        JOIN dim_date ON crime_facts.id_date = dim_date.id_date
-        WHERE (dim_date.year > %(start_year)s OR 
-               (dim_date.year = %(start_year)s AND dim_date.month > %(start_month)s) OR
-               (dim_date.year = %(start_year)s AND dim_date.month = %(start_month)s AND dim_date.day >= %(start_day)s))
-        AND (dim_date.year < %(end_year)s OR 
-             (dim_date.year = %(end_year)s AND dim_date.month < %(end_month)s) OR
-             (dim_date.year = %(end_year)s AND dim_date.month = %(end_month)s AND dim_date.day <= %(end_day)s))
-        """
-        
-        params = {
-            'start_year': start_year,
-            'start_month': start_month, 
-            'start_day': start_day,
-            'end_year': end_year,
-            'end_month': end_month,
-            'end_day': end_day
-        }
+    params = resolve_date_range(start_date, end_date)
 
-        if location_category and location_category != "Semua Area":
-            query += " AND dim_location_category.location_category = %(location_category)s"
-            params['location_category'] = location_category
+    # Filter label diterjemahkan ke daftar key integer dari cache dimensi
+    if location_category and location_category != "Semua Area":
+        locations = get_dimension('location')
+        query += " AND crime_facts.id_location = ANY(%(location_ids)s)"
+        params['location_ids'] = locations.ids_where('location_category', location_category) if locations is not None else []
 
-        if crime_category and crime_category != "Semua Kategori":
-            query += " AND dim_crime_category.crime_category = %(crime_category)s"
-            params['crime_category'] = crime_category
-        
-        query += """
-        ORDER BY dim_date.year DESC, dim_date.month DESC, dim_date.day DESC
-        """
-        
-        df = pd.read_sql_query(query, engine, params=params)
-        return df
-    except Exception as e:
-        st.error(f"Error fetching crime details: {e}")
+    if crime_category and crime_category != "Semua Kategori":
+        crimes = get_dimension('crime')
+        query += " AND crime_facts.id_crime = ANY(%(crime_ids)s)"
+        params['crime_ids'] = crimes.ids_where('crime_category', crime_category) if crimes is not None else []
+    
+    query += """
+    ORDER BY dim_date.year DESC, dim_date.month DESC, dim_date.day DESC
+    """
+    
+    df = run_query(query, params, query_class='detail', name="crime details")
+    if df is None:
+        return pd.DataFrame()
+    df = attach_labels(df, {
+        'crime': ['crime_category', 'primary_type', 'description'],
+        'location': ['location_description', 'location_category']
+    })
+    if df is None:
         return pd.DataFrame()
+    df = df.rename(columns={'description': 'crime_description'})
+    return df[['crime_category', 'primary_type', 'crime_description', 'day', 'month', 'year', 'daytime',
+               'arrest_status', 'location_description', 'location_category', 'incident_count']]
 
 def get_location_categories():
     """Get all location categories for dropdown"""
-    engine = init_connection()
-    if engine is None:
-        return []
-    
-    try:
-        query = "SELECT DISTINCT location_category FROM dim_location_category ORDER BY location_category"
-        df = pd.read_sql_query(query, engine)
-        categories = ["Semua Area"] + df['location_category'].tolist()
-        return categories
-    except Exception as e:
-        st.error(f"Error fetching location categories: {e}")
+    query = "SELECT DISTINCT location_category FROM dim_location_category ORDER BY location_category"
+    df = run_query(query, query_class='metadata', name="location categories")
+    if df is None:
         return ["Semua Area"]
+    categories = ["Semua Area"] + df['location_category'].tolist()
+    return categories
 
 def get_crime_categories():
     """Get all crime categories for dropdown"""
-    engine = init_connection()
-    if engine is None:
-        return []
-    
-    try:
-        query = "SELECT DISTINCT crime_category FROM dim_crime_category ORDER BY crime_category"
-        df = pd.read_sql_query(query, engine)
-        categories = ["Semua Kategori"] + df['crime_category'].tolist()
-        return categories
-    except Exception as e:
-        st.error(f"Error fetching crime categories: {e}")
+    query = "SELECT DISTINCT crime_category FROM dim_crime_category ORDER BY crime_category"
+    df = run_query(query, query_class='metadata', name="crime categories")
+    if df is None:
         return ["Semua Kategori"]
+    categories = ["Semua Kategori"] + df['crime_category'].tolist()
+    return categories
     
 def get_filtered_total_incidents_geographic(start_date, end_date, location_category_filter=None, crime_category_filter=None):
     """Get total incidents with geographic filters applied (aggregated by incident_count, not row count)"""
-    engine = init_connection()
-    if engine is None:
-        return 0
-    
-    try:
-        start_year = start_date.year
-        start_month = start_date.month
-        start_day = start_date.day
-        end_year = end_date.year
-        end_month = end_date.month
-        end_day = end_date.day
-        
-        query = """
-        SELECT 
-            SUM(cf.incident_count) AS total_incidents
-        FROM crime_facts cf
-        JOIN dim_date dd ON cf.id_date = dd.id_date
-        JOIN dim_location dl ON cf.id_location = dl.id_location
-        JOIN dim_location_category dlc ON dl.id_location_category = dlc.id_location_category
-        JOIN dim_crime dc ON cf.id_crime = dc.id_crime
-        JOIN dim_crime_category dcc ON dc.id_crime_category = dcc.id_crime_category
-        WHERE (dd.year > %(start_year)s OR 
-               (dd.year = %(start_year)s AND dd.month > %(start_month)s) OR
-               (dd.year = %(start_year)s AND dd.month = %(start_month)s AND dd.day >= %(start_day)s))
-        AND (dd.year < %(end_year)s OR 
-             (dd.year = %(end_year)s AND dd.month < %(end_month)s) OR
-             (dd.year = %(end_year)s AND dd.month = %(end_month)s AND dd.day <= %(end_day)s))
-        """
-        
-        params = {
-            'start_year': start_year,
-            'start_month': start_month, 
-            'start_day': start_day,
-            'end_year': end_year,
-            'end_month': end_month,
-            'end_day': end_day
-        }
+    filters = {'location': location_category_filter, 'category': crime_category_filter}
+    return get_metric_value('incidents', start_date, end_date, filters=filters)
+
+def get_unique_crime_types_geographic(start_date, end_date, location_category_filter=None, crime_category_filter=None):
+    """Get the number of distinct primary types for the detail filters (HyperLogLog estimate, no detail rows pulled)"""
+    return get_distinct_count('primary_type', start_date, end_date, {
+        'location_category': location_category_filter,
+        'crime_category': crime_category_filter
+    })
 
-        if location_category_filter:
-            query += " AND dlc.location_category = %(location_category_filter)s"
-            params['location_category_filter'] = location_category_filter
-        
-        if crime_category_filter:
-            query += " AND dcc.crime_category = %(crime_category_filter)s"
-            params['crime_category_filter'] = crime_category_filter
-        
-        df = pd.read_sql_query(query, engine, params=params)
-        return int(df['total_incidents'].iloc[0]) if not df.empty and df['total_incidents'].iloc[0] is not None else 0
-    except Exception as e:
-        st.error(f"Error fetching filtered total incidents: {e}")
-        return 0
\ No newline at end of file
+def get_distinct_coordinates_by_date_range(start_date, end_date):
+    """Get the number of distinct incident coordinates in a date range (HyperLogLog estimate)"""
+    return get_distinct_count('coordinates', start_date, end_date, query_class='chart')
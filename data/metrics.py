@@ -0,0 +1,135 @@
+import pandas as pd
+from database.connection import run_query
+from data.date_range import resolve_date_range
+from data.aggregate_engine import engine_grouping_sets
+from data.blocks import run_blocked_aggregate
+from data.prefix_index import prefix_total
+
+# Metrik yang dipakai bersama oleh semua halaman; rasio dihitung dari incident_count dengan flag tertentu
+METRICS = {
+    'incidents': {
+        'sql': "SUM(cdc.incident_count)",
+        'flag': None
+    },
+    'arrest_rate': {
+        'sql': "ROUND(100.0 * SUM(CASE WHEN cdc.arrest_status THEN cdc.incident_count ELSE 0 END) / NULLIF(SUM(cdc.incident_count), 0), 2)::float",
+        'flag': 'arrest_status'
+    },
+    'domestic_share': {
+        'sql': "ROUND(100.0 * SUM(CASE WHEN cdc.domestic_status THEN cdc.incident_count ELSE 0 END) / NULLIF(SUM(cdc.incident_count), 0), 2)::float",
+        'flag': 'domestic_status'
+    }
+}
+
+# Dimensi metrik -> kolom crime_daily_cube (urutan ini juga urutan kanonik di SQL dan hasil)
+METRIC_DIMENSIONS = {
+    'date': 'date_key',
+    'year': 'year',
+    'month': 'month',
+    'weekday': 'weekday',
+    'daytime': 'daytime',
+    'category': 'crime_category',
+    'location': 'location_category'
+}
+
+# Dimensi yang berasal dari LEFT JOIN di cube: fakta tanpa kategori hanya disaring jika dimensi ini dipakai (filter atau grouping),
+# seperti INNER JOIN pada query lama; total tanpa dimensi ini tetap menghitung semua fakta
+NULLABLE_DIMENSIONS = {
+    'category': 'id_crime_category',
+    'location': 'id_location_category'
+}
+
+def _not_null(dimensions, filters):
+    """Nullable dimensions used by a request (as a grouping or a filter), in registry order"""
+    return [dim for dim in NULLABLE_DIMENSIONS if dim in dimensions or dim in filters]
+
+def _canonical(dimensions, filters):
+    """Dimensions in registry order and filters without empty values, so equal requests compile to equal SQL"""
+    unknown = [dim for dim in list(dimensions) + list(filters or {}) if dim not in METRIC_DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown metric dimension: {unknown[0]}")
+    dimensions = [dim for dim in METRIC_DIMENSIONS if dim in dimensions]
+    filters = filters or {}
+    filters = {dim: filters[dim] for dim in METRIC_DIMENSIONS if filters.get(dim) not in (None, "")}
+    return dimensions, filters
+
+def compile_metric(metric, start_date, end_date, dimensions=(), filters=None):
+    """SQL and parameters of one metric over crime_daily_cube, grouped by `dimensions` and restricted by equality `filters`"""
+    dimensions, filters = _canonical(dimensions, filters)
+    columns = [f"cdc.{METRIC_DIMENSIONS[dim]}" for dim in dimensions]
+    query = f"""
+    SELECT {''.join(column + ', ' for column in columns)}{METRICS[metric]['sql']} AS {metric}
+    FROM crime_daily_cube cdc
+    WHERE cdc.date_key BETWEEN %(start_key)s AND %(end_key)s
+    """
+
+    params = resolve_date_range(start_date, end_date)
+    for dim in _not_null(dimensions, filters):
+        query += f" AND cdc.{NULLABLE_DIMENSIONS[dim]} IS NOT NULL"
+    for dim, value in filters.items():
+        query += f" AND cdc.{METRIC_DIMENSIONS[dim]} = %(filter_{dim})s"
+        params[f"filter_{dim}"] = value
+
+    if columns:
+        query += f" GROUP BY {', '.join(columns)} ORDER BY {', '.join(columns)}"
+    return query, params
+
+def _engine_metric(metric, params, dimensions, filters):
+    """Metric answered by the aggregate engine, or None when it has to go to SQL"""
+    if 'date' in dimensions:
+        return None
+    columns = tuple(METRIC_DIMENSIONS[dim] for dim in dimensions)
+    engine_filters = {METRIC_DIMENSIONS[dim]: value for dim, value in filters.items()}
+    kwargs = {'not_null': tuple(METRIC_DIMENSIONS[dim] for dim in _not_null(dimensions, filters))}
+    totals = engine_grouping_sets(params['start_key'], params['end_key'], {'metric': columns}, filters=engine_filters, **kwargs)
+    if totals is None:
+        return None
+    totals = totals.drop(columns='grouping_set')
+
+    flag = METRICS[metric]['flag']
+    if flag is None:
+        return totals.rename(columns={'total_incidents': metric})
+
+    flagged = engine_grouping_sets(params['start_key'], params['end_key'], {'metric': columns}, filters={**engine_filters, flag: True}, **kwargs)
+    if flagged is None:
+        return None
+    flagged = flagged.drop(columns='grouping_set').rename(columns={'total_incidents': 'flagged'})
+    df = totals.merge(flagged, on=list(columns), how='left') if columns else totals.assign(flagged=flagged['flagged'].iloc[0])
+    rate = 100.0 * df['flagged'].fillna(0).astype(float) / df['total_incidents'].where(df['total_incidents'] != 0)
+    return df[list(columns)].assign(**{metric: rate.round(2)})
+
+def _prefix_metric(metric, params, dimensions, filters):
+    """Range total answered by the prefix sum index (two lookups per date segment), or None when it has to go elsewhere"""
+    if METRICS[metric]['flag'] is not None or dimensions:
+        return None
+    total = prefix_total(params['start_key'], params['end_key'], {METRIC_DIMENSIONS[dim]: value for dim, value in filters.items()})
+    if total is None:
+        return None
+    return pd.DataFrame({metric: [total]})
+
+def get_metric(metric, start_date, end_date, dimensions=(), filters=None, query_class='chart'):
+    """One registered metric per combination of `dimensions` (a one-row frame when none); identical (metric, dimensions, filters) share one result"""
+    dimensions, filters = _canonical(dimensions, filters)
+    query, params = compile_metric(metric, start_date, end_date, dimensions, filters)
+
+    df = _prefix_metric(metric, params, dimensions, filters)
+    if df is None:
+        df = _engine_metric(metric, params, dimensions, filters)
+    if df is None and METRICS[metric]['flag'] is None:
+        # Jumlah bisa dijumlahkan per blok bulan; rasio dihitung sekali untuk seluruh rentang
+        df = run_blocked_aggregate(query, params, [METRIC_DIMENSIONS[dim] for dim in dimensions], query_class=query_class, name=f"metric {metric}")
+    elif df is None:
+        df = run_query(query, params, query_class=query_class, name=f"metric {metric}")
+    if df is None:
+        return pd.DataFrame(columns=[METRIC_DIMENSIONS[dim] for dim in dimensions] + [metric])
+    if dimensions:
+        df = df.sort_values([METRIC_DIMENSIONS[dim] for dim in dimensions]).reset_index(drop=True)
+    return df
+
+def get_metric_value(metric, start_date, end_date, filters=None, query_class='kpi'):
+    """Scalar value of a metric without dimensions (0 when there are no rows)"""
+    df = get_metric(metric, start_date, end_date, filters=filters, query_class=query_class)
+    if df.empty or pd.isna(df[metric].iloc[0]):
+        return 0
+    value = df[metric].iloc[0]
+    return int(value) if metric == 'incidents' else float(value)
@@ -1,197 +1,141 @@
-import streamlit as st
+from dataclasses import dataclass, field
 import pandas as pd
-from database.connection import init_connection
+from database.connection import run_query
+
+@dataclass
+class OverviewBundle:
+    """All figures shown on the Overview page"""
+    total_cases: int = 0
+    common_crime: dict = field(default_factory=lambda: {"primary_type": "N/A", "incident_count": 0})
+    trend_case: dict = field(default_factory=lambda: {"primary_type": "N/A", "month": 0, "year": 0})
+    arrest_rate: float = 0
+    crime_history: pd.DataFrame = field(default_factory=pd.DataFrame)
+    arrest_rates_by_category: pd.DataFrame = field(default_factory=pd.DataFrame)
+    cases_by_category: pd.DataFrame = field(default_factory=pd.DataFrame)
+    domestic_status_by_category: pd.DataFrame = field(default_factory=pd.DataFrame)
+
+def get_overview_bundle():
+    """Get every Overview figure from a single pass over crime_facts using GROUPING SETS; dimensions are LEFT JOINed so the
+    total and arrest rate count every fact, and each figure drops only the NULL keys its own baseline join would have dropped"""
+    query = """
+    WITH facts AS (
+        SELECT
+            cf.incident_count,
+            cf.arrest_status,
+            cf.domestic_status,
+            c.id_crime,
+            c.primary_type,
+            cc.crime_category,
+            dd.year,
+            (dd.year = EXTRACT(YEAR FROM CURRENT_DATE) AND dd.month = EXTRACT(MONTH FROM CURRENT_DATE)) AS is_current_month
+        FROM crime_facts cf
+        LEFT JOIN dim_crime c ON cf.id_crime = c.id_crime
+        LEFT JOIN dim_crime_category cc ON cc.id_crime_category = c.id_crime_category
+        LEFT JOIN dim_date dd ON cf.id_date = dd.id_date
+    )
+    SELECT
+        CASE
+            WHEN GROUPING(year) = 0 THEN 'year'
+            WHEN GROUPING(crime_category) = 0 THEN 'crime_category'
+            WHEN GROUPING(id_crime) = 0 THEN 'crime'
+            WHEN GROUPING(is_current_month) = 0 THEN 'current_month'
+            ELSE 'total'
+        END AS grouping_set,
+        year,
+        crime_category,
+        id_crime,
+        primary_type,
+        is_current_month,
+        EXTRACT(YEAR FROM CURRENT_DATE)::int AS current_year,
+        EXTRACT(MONTH FROM CURRENT_DATE)::int AS current_month,
+        COUNT(*) AS fact_rows,
+        SUM(incident_count) AS total_cases,
+        SUM(CASE WHEN arrest_status = TRUE THEN 1 ELSE 0 END) AS arrested_rows,
+        SUM(CASE WHEN arrest_status = TRUE THEN incident_count ELSE 0 END) AS arrested_cases,
+        SUM(CASE WHEN domestic_status = TRUE THEN incident_count ELSE 0 END) AS domestic_cases,
+        SUM(CASE WHEN domestic_status = FALSE THEN incident_count ELSE 0 END) AS non_domestic_cases
+    FROM facts
+    GROUP BY GROUPING SETS (
+        (),
+        (year),
+        (crime_category),
+        (id_crime, primary_type),
+        (is_current_month, primary_type)
+    )
+    """
+    df = run_query(query, query_class='chart', name="overview bundle")
+    bundle = OverviewBundle()
+    if df is None or df.empty:
+        return bundle
+
+    total = df[df['grouping_set'] == 'total']
+    if not total.empty and total['fact_rows'].iloc[0]:
+        bundle.total_cases = int(total['total_cases'].iloc[0])
+        bundle.arrest_rate = round(100.0 * float(total['arrested_rows'].iloc[0]) / float(total['fact_rows'].iloc[0]), 2)
+
+    crimes = df[(df['grouping_set'] == 'crime') & df['id_crime'].notna()].sort_values('fact_rows', ascending=False)
+    if not crimes.empty:
+        bundle.common_crime = {
+            "primary_type": crimes['primary_type'].iloc[0],
+            "incident_count": int(crimes['fact_rows'].iloc[0])
+        }
+
+    current_month = df[(df['grouping_set'] == 'current_month') & (df['is_current_month'] == True) & df['primary_type'].notna()]
+    current_month = current_month.sort_values('total_cases', ascending=False)
+    if not current_month.empty:
+        bundle.trend_case = {
+            "primary_type": current_month['primary_type'].iloc[0],
+            "month": int(current_month['current_month'].iloc[0]),
+            "year": int(current_month['current_year'].iloc[0])
+        }
+
+    history = df[(df['grouping_set'] == 'year') & df['year'].notna()].sort_values('year')
+    bundle.crime_history = pd.DataFrame({
+        'Year': history['year'].astype(int),
+        'Total Crime': history['total_cases'],
+        'Arrested Cases': history['arrested_cases']
+    }).reset_index(drop=True)
+
+    categories = df[(df['grouping_set'] == 'crime_category') & df['crime_category'].notna()]
+    arrest_rates = pd.DataFrame({
+        'Crime Type': categories['crime_category'],
+        'Arrest Rate': (100.0 * categories['arrested_cases'] / categories['total_cases'].where(categories['total_cases'] != 0)).round(2)
+    })
+    bundle.arrest_rates_by_category = arrest_rates.sort_values('Arrest Rate', ascending=False).reset_index(drop=True)
+
+    by_category = categories.sort_values('total_cases', ascending=False)
+    bundle.cases_by_category = by_category[['crime_category', 'total_cases']].reset_index(drop=True)
+    bundle.domestic_status_by_category = by_category[['crime_category', 'domestic_cases', 'non_domestic_cases', 'total_cases']].reset_index(drop=True)
+    return bundle
 
 def get_total_cases():
     """Get total number of cases"""
-    engine = init_connection()
-    if engine is None:
-        return 0
-    
-    try:
-        query = "SELECT SUM(crime_facts.incident_count) AS total_incidents FROM crime_facts;"
-        df = pd.read_sql_query(query, engine)
-        return int(df['total_incidents'].iloc[0]) if not df.empty and df['total_incidents'].iloc[0] is not None else 0
-    except Exception as e:
-        st.error(f"Error fetching total cases: {e}")
-        return 0
+    return get_overview_bundle().total_cases
 
 def get_common_crime():
     """Get most common crime type"""
-    engine = init_connection()
-    if engine is None:
-        return {"primary_type": "N/A", "incident_count": 0}
-    
-    try:
-        query = """
-        SELECT crime_facts.id_crime, dim_crime.primary_type, COUNT(*) AS incident_count
-        FROM crime_facts
-        JOIN dim_crime ON crime_facts.id_crime = dim_crime.id_crime
-        GROUP BY crime_facts.id_crime, dim_crime.primary_type
-        ORDER BY incident_count DESC
-        LIMIT 1;
-        """
-        df = pd.read_sql_query(query, engine)
-        if not df.empty:
-            return {
-                "primary_type": df['primary_type'].iloc[0],
-                "incident_count": int(df['incident_count'].iloc[0])
-            }
-        return {"primary_type": "N/A", "incident_count": 0}
-    except Exception as e:
-        st.error(f"Error fetching common crime: {e}")
-        return {"primary_type": "N/A", "incident_count": 0}
+    return get_overview_bundle().common_crime
 
 def get_trend_case():
     """Get trending case for current month"""
-    engine = init_connection()
-    if engine is None:
-        return {"primary_type": "N/A", "month": 0, "year": 0}
-    
-    try:
-        query = """
-        SELECT 
-            dim_crime.primary_type, dim_date.month, dim_date.year,
-            SUM(crime_facts.incident_count) AS total_incidents
-        FROM crime_facts
-        JOIN dim_crime ON crime_facts.id_crime = dim_crime.id_crime
-        JOIN dim_date ON crime_facts.id_date = dim_date.id_date
-        WHERE dim_date.month = EXTRACT(MONTH FROM CURRENT_DATE)
-          AND dim_date.year = EXTRACT(YEAR FROM CURRENT_DATE)
-        GROUP BY dim_crime.primary_type, dim_date.month, dim_date.year
-        ORDER BY total_incidents DESC
-        LIMIT 1;
-        """
-        df = pd.read_sql_query(query, engine)
-        if not df.empty:
-            return {
-                "primary_type": df['primary_type'].iloc[0],
-                "month": int(df['month'].iloc[0]),
-                "year": int(df['year'].iloc[0])
-            }
-        return {"primary_type": "N/A", "month": 0, "year": 0}
-    except Exception as e:
-        st.error(f"Error fetching trend case: {e}")
-        return {"primary_type": "N/A", "month": 0, "year": 0}
+    return get_overview_bundle().trend_case
 
 def get_arrest_rate():
     """Get overall arrest rate percentage"""
-    engine = init_connection()
-    if engine is None:
-        return 0
-    
-    try:
-        query = """
-        SELECT 
-            ROUND(
-                100.0 * SUM(CASE WHEN arrest_status = TRUE THEN 1 ELSE 0 END) / COUNT(*), 
-                2
-            ) AS arrest_true_percentage
-        FROM crime_facts;
-        """
-        df = pd.read_sql_query(query, engine)
-        return float(df['arrest_true_percentage'].iloc[0]) if not df.empty and df['arrest_true_percentage'].iloc[0] is not None else 0
-    except Exception as e:
-        st.error(f"Error fetching arrest rate: {e}")
-        return 0
-    
+    return get_overview_bundle().arrest_rate
+
 def get_crime_history_data():
     """Get total cases per year for crime history chart including arrest data"""
-    engine = init_connection()
-    if engine is None:
-        return pd.DataFrame()
-    
-    try:
-        query = """
-        SELECT 
-            dim_date.year,
-            SUM(crime_facts.incident_count) AS total_cases,
-            SUM(CASE WHEN crime_facts.arrest_status = TRUE THEN crime_facts.incident_count ELSE 0 END) AS arrested_cases
-        FROM crime_facts
-        JOIN dim_date ON crime_facts.id_date = dim_date.id_date
-        GROUP BY dim_date.year
-        ORDER BY dim_date.year;
-        """
-        df = pd.read_sql_query(query, engine)
-        df = df.rename(columns={
-            'year': 'Year', 
-            'total_cases': 'Total Crime',
-            'arrested_cases': 'Arrested Cases'
-        })
-        return df
-    except Exception as e:
-        st.error(f"Error fetching crime history data: {e}")
-        return pd.DataFrame()
+    return get_overview_bundle().crime_history
 
 def get_arrest_rates_by_category():
     """Get arrest rate for each crime category"""
-    engine = init_connection()
-    if engine is None:
-        return pd.DataFrame()
-    
-    try:
-        query = """
-        SELECT 
-            cc.crime_category,
-            ROUND(100.0 * SUM(CASE WHEN cf.arrest_status = true THEN cf.incident_count ELSE 0 END) 
-                      / NULLIF(SUM(cf.incident_count), 0), 2) AS arrest_rate_percentage
-        FROM crime_facts cf
-        JOIN dim_crime c ON cf.id_crime = c.id_crime
-        JOIN dim_crime_category cc ON cc.id_crime_category = c.id_crime_category
-        GROUP BY cc.crime_category
-        ORDER BY arrest_rate_percentage DESC;
-        """
-        df = pd.read_sql_query(query, engine)
-        df = df.rename(columns={'crime_category': 'Crime Type', 'arrest_rate_percentage': 'Arrest Rate'})
-        return df
-    except Exception as e:
-        st.error(f"Error fetching arrest rates by category: {e}")
-        return pd.DataFrame()
+    return get_overview_bundle().arrest_rates_by_category
 
 def get_cases_by_category():
     """Get total cases for each crime category"""
-    engine = init_connection()
-    if engine is None:
-        return pd.DataFrame()
-    
-    try:
-        query = """
-        SELECT 
-            dim_crime_category.crime_category,
-            SUM(crime_facts.incident_count) AS total_cases
-        FROM crime_facts
-        JOIN dim_crime ON crime_facts.id_crime = dim_crime.id_crime
-        JOIN dim_crime_category ON dim_crime_category.id_crime_category = dim_crime.id_crime_category
-        GROUP BY dim_crime_category.id_crime_category, dim_crime_category.crime_category
-        ORDER BY total_cases DESC;
-        """
-        df = pd.read_sql_query(query, engine)
-        return df
-    except Exception as e:
-        st.error(f"Error fetching cases by category: {e}")
-        return pd.DataFrame()
+    return get_overview_bundle().cases_by_category
 
 def get_domestic_status_by_category():
     """Get domestic status comparison per crime category"""
-    engine = init_connection()
-    if engine is None:
-        return pd.DataFrame()
-    
-    try:
-        query = """
-        SELECT 
-            cc.crime_category,
-            SUM(CASE WHEN cf.domestic_status = true THEN cf.incident_count ELSE 0 END) AS domestic_cases,
-            SUM(CASE WHEN cf.domestic_status = false THEN cf.incident_count ELSE 0 END) AS non_domestic_cases,
-            SUM(cf.incident_count) AS total_cases
-        FROM crime_facts cf
-        JOIN dim_crime c ON cf.id_crime = c.id_crime
-        JOIN dim_crime_category cc ON cc.id_crime_category = c.id_crime_category
-        GROUP BY cc.crime_category
-        ORDER BY total_cases DESC;
-        """
-        df = pd.read_sql_query(query, engine)
-        return df
-    except Exception as e:
-        st.error(f"Error fetching domestic status by category: {e}")
-        return pd.DataFrame()
\ No newline at end of file
+    return get_overview_bundle().domestic_status_by_category
@@ -0,0 +1,58 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:
+    add_script_run_ctx = None
+    get_script_run_ctx = None
+
+# Jumlah thread untuk query halaman, bisa di-override lewat [page_loader] di st.secrets (1 = berurutan)
+PAGE_LOADER_DEFAULTS = {
+    'max_workers': 8
+}
+
+_executor_lock = threading.Lock()
+_executor_state = {
+    'executor': None,
+    'max_workers': 0
+}
+
+def get_page_loader_config():
+    """Effective page loader config (defaults + st.secrets["page_loader"])"""
+    config = dict(PAGE_LOADER_DEFAULTS)
+    try:
+        config.update(dict(st.secrets.get("page_loader", {})))
+    except Exception:
+        pass
+    return config
+
+def _get_executor(max_workers):
+    """Process-wide bounded thread pool shared by every session"""
+    with _executor_lock:
+        if _executor_state['executor'] is None or _executor_state['max_workers'] != max_workers:
+            if _executor_state['executor'] is not None:
+                _executor_state['executor'].shutdown(wait=False)
+            _executor_state['executor'] = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="page-loader")
+            _executor_state['max_workers'] = max_workers
+        return _executor_state['executor']
+
+def _run_with_ctx(ctx, function, args):
+    """Run a data function on a pool thread with the caller's ScriptRunContext so st.error still reaches the page"""
+    if ctx is not None and add_script_run_ctx is not None:
+        add_script_run_ctx(threading.current_thread(), ctx)
+    return function(*args)
+
+def load_page_data(tasks):
+    """Run a page's independent data functions concurrently; `tasks` maps a name to (function, *args), results come back under the same names"""
+    max_workers = int(get_page_loader_config()['max_workers'])
+    # Dipanggil dari thread pool sendiri (mis. run_query_batch di dalam task halaman): jalankan di tempat supaya pool tidak saling menunggu
+    nested = threading.current_thread().name.startswith("page-loader")
+    if max_workers <= 1 or len(tasks) <= 1 or nested:
+        return {name: task[0](*task[1:]) for name, task in tasks.items()}
+
+    ctx = get_script_run_ctx() if get_script_run_ctx is not None else None
+    executor = _get_executor(max_workers)
+    futures = {name: executor.submit(_run_with_ctx, ctx, task[0], task[1:]) for name, task in tasks.items()}
+    return {name: future.result() for name, future in futures.items()}
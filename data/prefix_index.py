@@ -0,0 +1,298 @@
+import copy
+import threading
+import time
+from datetime import date
+import numpy as np
+import streamlit as st
+from database.connection import run_query, get_data_versions
+from data.date_range import from_date_key
+
+# Index prefix sum per hari untuk total kasus, bisa di-override lewat [prefix_index] di st.secrets
+PREFIX_INDEX_DEFAULTS = {
+    'enabled': True,
+    'max_age': 600,
+    'retry_after': 60
+}
+
+# Satu kolom per kombinasi nilai ini. Weekday tidak dijadikan kolom: setiap hari hanya punya satu weekday,
+# jadi filter weekday dijawab dari prefix sum berjarak 7 hari (hanya hari dengan weekday yang sama)
+COMBO_COLUMNS = ('crime_category', 'location_category', 'daytime')
+
+# Sidik jari per hari untuk menemukan hari pertama yang berubah sejak index dibangun
+FINGERPRINT_QUERY = """
+SELECT
+    date_key,
+    SUM(incident_count)::bigint AS incidents,
+    SUM(incident_count::bigint * hashtext(concat_ws('|', crime_category, location_category, daytime, weekday)))::bigint AS checksum
+FROM crime_daily_cube
+GROUP BY date_key
+ORDER BY date_key
+"""
+
+DAILY_QUERY = """
+SELECT
+    date_key,
+    weekday,
+    crime_category,
+    location_category,
+    daytime,
+    SUM(incident_count)::bigint AS incidents
+FROM crime_daily_cube
+WHERE date_key >= %(start_key)s
+GROUP BY date_key, weekday, crime_category, location_category, daytime
+"""
+
+_index_lock = threading.Lock()
+_index_state = {
+    'index': None,
+    'version': None,
+    'loaded_at': 0.0,
+    'failed_at': 0.0,
+    'building': False
+}
+_index_stats = {
+    'builds': 0,
+    'updates': 0,
+    'days_rebuilt': 0,
+    'build_ms': 0.0,
+    'served': 0,
+    'fallbacks': 0
+}
+
+def get_prefix_index_config():
+    """Effective prefix index config (defaults + st.secrets["prefix_index"])"""
+    config = dict(PREFIX_INDEX_DEFAULTS)
+    try:
+        config.update(dict(st.secrets.get("prefix_index", {})))
+    except Exception:
+        pass
+    return config
+
+def _stride_sums(values, previous):
+    """Prefix sums over every 7th day: row i is values[i] plus the row 7 days earlier; `previous` holds the 7 rows before values"""
+    sums = np.empty_like(values)
+    for offset in range(7):
+        sums[offset::7] = previous[offset] + np.cumsum(values[offset::7], axis=0)
+    return sums
+
+def _combos(daily):
+    """(crime_category, location_category, daytime) per row of `daily`, with NULL as None so equal combinations hash equal"""
+    return zip(*[daily[column].astype(object).where(daily[column].notna(), None) for column in COMBO_COLUMNS])
+
+class PrefixIndex:
+    """Cumulative incident sums over a dense day axis (one row per calendar day, one column per combination), so range totals are two lookups"""
+
+    def __init__(self, fingerprints, daily):
+        self.origin = from_date_key(int(fingerprints['date_key'].iloc[0]))
+        self.days = (from_date_key(int(fingerprints['date_key'].iloc[-1])) - self.origin).days + 1
+        self.fingerprints = fingerprints
+        # Fakta tanpa kategori menjadi kombinasi berlabel None: ikut di total tanpa filter, tidak pernah cocok dengan filter kategori
+        combos = sorted(set(_combos(daily)),
+                        key=lambda combo: [(value is None, '' if value is None else value) for value in combo])
+        self.column_of = {combo: i for i, combo in enumerate(combos)}
+        self.labels = {column: np.array([combo[i] for combo in combos], dtype=object) for i, column in enumerate(COMBO_COLUMNS)}
+        self.weekdays = {}
+        self._learn_weekdays(daily)
+
+        values = self._daily_matrix(daily, 0, self.days)
+        self.cumulative = np.zeros((self.days + 1, len(combos)), dtype=np.int64)
+        self.cumulative[1:] = np.cumsum(values, axis=0)
+        # 7 baris nol di depan supaya hari ke-i ada di baris i + 7
+        self.cumulative_7 = np.zeros((self.days + 7, len(combos)), dtype=np.int64)
+        self.cumulative_7[7:] = _stride_sums(values, self.cumulative_7[:7])
+
+    def _learn_weekdays(self, daily):
+        """Map weekday labels of the cube to Python weekday numbers"""
+        for date_key, weekday in daily[['date_key', 'weekday']].drop_duplicates('weekday').itertuples(index=False):
+            self.weekdays[weekday] = from_date_key(int(date_key)).weekday()
+
+    def _day(self, value):
+        return (value - self.origin).days
+
+    def _daily_matrix(self, daily, first, days):
+        """Incidents of days first..days-1 as a (day, combination) matrix"""
+        values = np.zeros((days - first, len(self.column_of)), dtype=np.int64)
+        if daily.empty:
+            return values
+        keys, positions = np.unique(daily['date_key'].to_numpy(dtype=np.int64), return_inverse=True)
+        rows = np.array([self._day(from_date_key(int(key))) - first for key in keys], dtype=np.int64)[positions]
+        columns = np.array([self.column_of[combo] for combo in _combos(daily)], dtype=np.int64)
+        np.add.at(values, (rows, columns), daily['incidents'].to_numpy(dtype=np.int64))
+        return values
+
+    def covers(self, daily):
+        """True if every combination in `daily` already has a column (otherwise the index must be rebuilt)"""
+        return all(combo in self.column_of for combo in _combos(daily))
+
+    def updated(self, fingerprints, daily, first_key):
+        """A new index where every day from first_key on is recomputed from `daily`; earlier rows are reused as they are"""
+        index = copy.copy(self)
+        index.fingerprints = fingerprints
+        index.days = (from_date_key(int(fingerprints['date_key'].iloc[-1])) - self.origin).days + 1
+        index.weekdays = dict(self.weekdays)
+        index._learn_weekdays(daily)
+        # Hari kosong antara akhir index lama dan hari baru pertama juga dihitung ulang
+        first = min(self._day(from_date_key(first_key)), self.days, index.days)
+        values = index._daily_matrix(daily, first, index.days)
+        index.cumulative = np.vstack([self.cumulative[:first + 1], self.cumulative[first] + np.cumsum(values, axis=0)])
+        index.cumulative_7 = np.vstack([self.cumulative_7[:first + 7], _stride_sums(values, self.cumulative_7[first:first + 7])])
+        return index
+
+    def _segments(self, start_key, end_key, filters):
+        """Day index ranges [first, last] inside the date range that also satisfy date_key/year/month filters"""
+        start, end = from_date_key(start_key), from_date_key(end_key)
+        if filters.get('date_key') is not None:
+            day = from_date_key(int(filters['date_key']))
+            start, end = max(start, day), min(end, day)
+        if filters.get('year') is not None:
+            start, end = max(start, date(int(filters['year']), 1, 1)), min(end, date(int(filters['year']), 12, 31))
+        ranges = [(start, end)]
+        if filters.get('month') is not None:
+            month = int(filters['month'])
+            ranges = []
+            for year in range(start.year, end.year + 1):
+                month_end = date(year + month // 12, month % 12 + 1, 1).toordinal() - 1
+                ranges.append((max(start, date(year, month, 1)), min(end, date.fromordinal(month_end))))
+        segments = []
+        for first, last in ranges:
+            first, last = max(self._day(first), 0), min(self._day(last), self.days - 1)
+            if first <= last:
+                segments.append((first, last))
+        return segments
+
+    def total(self, start_key, end_key, filters=None):
+        """SUM(incident_count) over [start_key, end_key] for rows matching equality filters on crime_daily_cube columns"""
+        filters = filters or {}
+        selected = np.ones(len(self.column_of), dtype=bool)
+        for column in COMBO_COLUMNS:
+            if filters.get(column) is not None:
+                selected &= self.labels[column] == filters[column]
+
+        weekday = filters.get('weekday')
+        if weekday is not None and weekday not in self.weekdays:
+            return 0
+        total = 0
+        for first, last in self._segments(start_key, end_key, filters):
+            if weekday is None:
+                row = self.cumulative[last + 1] - self.cumulative[first]
+            else:
+                # Hari pertama dan terakhir dengan weekday ini di dalam segmen
+                target = self.weekdays[weekday]
+                first += (target - (self.origin.weekday() + first)) % 7
+                last -= ((self.origin.weekday() + last) - target) % 7
+                if first > last:
+                    continue
+                row = self.cumulative_7[last + 7] - self.cumulative_7[first]
+            total += int(row[selected].sum())
+        return total
+
+    def nbytes(self):
+        return self.cumulative.nbytes + self.cumulative_7.nbytes
+
+def _first_changed(old, new):
+    """Smallest date_key whose fingerprint differs between two fingerprint frames (None when nothing changed)"""
+    merged = old.merge(new, on='date_key', how='outer', suffixes=('_old', '_new'), indicator=True)
+    changed = merged[(merged['_merge'] != 'both')
+                     | (merged['incidents_old'] != merged['incidents_new'])
+                     | (merged['checksum_old'] != merged['checksum_new'])]
+    return None if changed.empty else int(changed['date_key'].min())
+
+def _refresh(index):
+    """Bring the index up to date: only days from the first changed day on are reloaded (full build when there is no index yet)"""
+    start = time.perf_counter()
+    fingerprints = run_query(FINGERPRINT_QUERY, query_class='build', ttl=0, name="prefix index fingerprints")
+    if fingerprints is None or fingerprints.empty:
+        return None
+
+    first_key = 0
+    if index is not None:
+        first_key = _first_changed(index.fingerprints, fingerprints)
+        if first_key is None:
+            return index
+        if first_key < int(index.fingerprints['date_key'].iloc[0]):
+            first_key = 0
+    daily = run_query(DAILY_QUERY, {'start_key': first_key}, query_class='build', ttl=0, name="prefix index days")
+    if daily is None:
+        return None
+
+    if index is not None and first_key and index.covers(daily):
+        refreshed = index.updated(fingerprints, daily, first_key)
+        counts = {'updates': 1, 'days_rebuilt': refreshed.days - min(index._day(from_date_key(first_key)), index.days)}
+    else:
+        if first_key:
+            # Kombinasi baru muncul: kolom berubah, jadi index dibangun ulang dari awal
+            daily = run_query(DAILY_QUERY, {'start_key': 0}, query_class='build', ttl=0, name="prefix index days")
+            if daily is None:
+                return None
+        refreshed = PrefixIndex(fingerprints, daily)
+        counts = {'builds': 1, 'days_rebuilt': refreshed.days}
+    with _index_lock:
+        for stat, amount in counts.items():
+            _index_stats[stat] += amount
+        _index_stats['build_ms'] = round((time.perf_counter() - start) * 1000, 2)
+    return refreshed
+
+def _build(index, version):
+    """Thread latar: membangun atau memperbarui index lalu memasangnya; kegagalan dicoba lagi setelah retry_after"""
+    try:
+        refreshed = _refresh(index)
+    except Exception:
+        refreshed = None
+    with _index_lock:
+        if refreshed is not None:
+            _index_state.update(index=refreshed, version=version, loaded_at=time.time())
+        else:
+            _index_state['failed_at'] = time.time()
+        _index_state['building'] = False
+
+def get_prefix_index():
+    """The process-wide PrefixIndex, or None when disabled, not built yet, or out of date (callers fall back to SQL);
+    building and refreshing run in a background thread so no render waits for them"""
+    config = get_prefix_index_config()
+    if not config['enabled']:
+        return None
+
+    now = time.time()
+    versions = get_data_versions()
+    version = versions.get('crime_daily_cube') if versions else None
+    with _index_lock:
+        index = _index_state['index']
+        if version is not None:
+            # Diperbarui hanya jika cube sudah di-refresh sejak index dibangun
+            expired = index is not None and _index_state['version'] != version
+        else:
+            max_age = float(config['max_age'])
+            expired = index is not None and max_age > 0 and now - _index_state['loaded_at'] > max_age
+        retry = now - _index_state['failed_at'] > float(config['retry_after'])
+        if (index is None or expired) and retry and not _index_state['building']:
+            _index_state['building'] = True
+            threading.Thread(target=_build, args=(index, version), name="prefix-index-build", daemon=True).start()
+        # Index yang sudah tertinggal tidak dipakai sampai pembaruannya selesai, supaya total tetap sama dengan SQL
+        return None if expired else index
+
+def prefix_total(start_key, end_key, filters=None):
+    """Total incidents over a date_key range from the prefix index, or None when the caller must run SQL"""
+    index = get_prefix_index()
+    if index is None:
+        if get_prefix_index_config()['enabled']:
+            with _index_lock:
+                _index_stats['fallbacks'] += 1
+        return None
+    with _index_lock:
+        _index_stats['served'] += 1
+    return index.total(start_key, end_key, filters)
+
+def get_prefix_index_stats():
+    """Prefix index stats (size, builds vs incremental updates, totals served without SQL)"""
+    with _index_lock:
+        index = _index_state['index']
+        stats = dict(_index_stats)
+        version = _index_state['version']
+    stats.update({
+        'enabled': bool(get_prefix_index_config()['enabled']),
+        'version': version,
+        'days': index.days if index is not None else 0,
+        'combinations': len(index.column_of) if index is not None else 0,
+        'bytes': index.nbytes() if index is not None else 0
+    })
+    return stats
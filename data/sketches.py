@@ -0,0 +1,275 @@
+import math
+import threading
+import time
+import numpy as np
+import pandas as pd
+import streamlit as st
+from database.connection import run_query, get_data_versions
+from database.watermark import query_watermark
+from data.date_range import resolve_date_range
+
+# Sketch HyperLogLog per hari untuk jumlah nilai unik, bisa di-override lewat [sketches] di st.secrets
+SKETCH_DEFAULTS = {
+    'enabled': True,
+    'max_age': 600,
+    'retry_after': 60
+}
+
+# 2^PRECISION register per sketch. Standard error HyperLogLog = 1.04 / sqrt(2^PRECISION) = 3.25% untuk PRECISION 10
+# (sekitar 95% estimasi dalam ±6.5%); di bawah 2.5 * 1024 nilai unik dipakai linear counting (hampir tepat untuk jumlah kecil,
+# error naik sampai sekitar 4% di dekat batas peralihan itu)
+PRECISION = 10
+REGISTERS = 1 << PRECISION
+STANDARD_ERROR = 1.04 / math.sqrt(REGISTERS)
+
+# Nilai yang bisa dihitung unik -> ekspresi SQL yang di-hash
+SKETCH_KINDS = {
+    'primary_type': "dc.primary_type",
+    'location_description': "dl.location_description",
+    'coordinates': "cf.latitude::text || ',' || cf.longitude::text"
+}
+
+# Nilai yang hanya di-sketch per hari (tanpa kombinasi kategori dan waktu): hitungan koordinat unik tidak pernah difilter,
+# dan per kombinasi hampir setiap fakta akan menjadi satu baris sketch tersendiri
+DAY_ONLY_KINDS = ('coordinates',)
+
+# Kolom yang bisa dipakai sebagai filter (sama dengan kolom crime_daily_cube) -> ekspresi SQL
+FILTER_COLUMNS = ('crime_category', 'location_category', 'daytime', 'weekday')
+COMBINATION_COLUMNS = ('crime_category', 'location_category', 'daytime')
+FILTER_EXPRESSIONS = {
+    'crime_category': "dcc.crime_category",
+    'location_category': "dlc.location_category",
+    'daytime': "dd.daytime",
+    'weekday': "dd.weekday",
+    'month': "dd.month",
+    'year': "dd.year"
+}
+
+# Fakta yang punya jenis kejahatan dan lokasi, sama seperti tabel detail
+FACT_SOURCE = """
+    FROM crime_facts cf
+    JOIN dim_date dd ON cf.id_date = dd.id_date
+    JOIN dim_crime dc ON cf.id_crime = dc.id_crime
+    LEFT JOIN dim_crime_category dcc ON dc.id_crime_category = dcc.id_crime_category
+    JOIN dim_location dl ON cf.id_location = dl.id_location
+    LEFT JOIN dim_location_category dlc ON dl.id_location_category = dlc.id_location_category
+"""
+
+# Setiap nilai di-hash dengan hashtext (32 bit): PRECISION bit bawah memilih register, rank = posisi bit 1 pertama
+# pada 22 bit sisanya (23 jika semuanya nol). Yang dikirim adalah rank maksimum per register per hari dan kombinasi, jadi
+# jumlah baris per (hari, kombinasi, jenis) paling banyak min(nilai unik, 2^PRECISION). Untuk jenis kejahatan dan deskripsi
+# lokasi itu jauh lebih sedikit dari jumlah fakta; untuk koordinat (hampir semuanya unik) tetap sekitar satu baris per fakta,
+# karena itu sketch dimuat di thread latar dengan kelas query build, bukan saat render.
+_COMBINATION_SELECT = ",\n        ".join(f"CASE WHEN kinds.per_combination THEN {FILTER_EXPRESSIONS[column]} END AS {column}"
+                                       for column in COMBINATION_COLUMNS)
+SKETCH_QUERY = f"""
+WITH hashed AS (
+    SELECT
+        dd.date_key,
+        {_COMBINATION_SELECT},
+        dd.weekday,
+        kinds.kind,
+        kinds.hash
+    {FACT_SOURCE.strip()}
+    CROSS JOIN LATERAL (VALUES
+        {', '.join(f"('{kind}', hashtext({expression}), {str(kind not in DAY_ONLY_KINDS).lower()})" for kind, expression in SKETCH_KINDS.items())}
+    ) AS kinds(kind, hash, per_combination)
+    WHERE kinds.hash IS NOT NULL
+)
+SELECT
+    date_key,
+    crime_category,
+    location_category,
+    daytime,
+    weekday,
+    kind,
+    hash & {REGISTERS - 1} AS register,
+    MAX({33 - PRECISION} - length(ltrim(((hash >> {PRECISION}) & {(1 << (32 - PRECISION)) - 1})::bit({32 - PRECISION})::text, '0'))) AS rank
+FROM hashed
+GROUP BY date_key, crime_category, location_category, daytime, weekday, kind, register
+ORDER BY date_key
+"""
+
+_sketch_lock = threading.Lock()
+_sketch_state = {
+    'sketches': None,
+    'watermark': None,
+    'loaded_at': 0.0,
+    'failed_at': 0.0,
+    'loading': False
+}
+_sketch_stats = {
+    'loads': 0,
+    'load_ms': 0.0,
+    'served': 0,
+    'fallbacks': 0
+}
+
+def get_sketch_config():
+    """Effective sketch config (defaults + st.secrets["sketches"])"""
+    config = dict(SKETCH_DEFAULTS)
+    try:
+        config.update(dict(st.secrets.get("sketches", {})))
+    except Exception:
+        pass
+    return config
+
+def estimate(registers):
+    """HyperLogLog cardinality estimate of one register array (linear counting for small counts)"""
+    alpha = 0.7213 / (1 + 1.079 / REGISTERS)
+    raw = alpha * REGISTERS * REGISTERS / float(np.sum(np.exp2(-registers.astype(np.float64))))
+    zeros = int(np.count_nonzero(registers == 0))
+    if raw <= 2.5 * REGISTERS and zeros:
+        return REGISTERS * math.log(REGISTERS / zeros)
+    if raw > (1 << 32) / 30:
+        return -(1 << 32) * math.log(1 - raw / (1 << 32))
+    return raw
+
+class DailySketches:
+    """Sparse per-day HyperLogLog sketches: (day, combination, kind) -> register ranks, sorted by date_key so a range is one slice"""
+
+    def __init__(self, df):
+        self.rows = len(df)
+        self.date_key = df['date_key'].to_numpy(dtype=np.int64)
+        self.month = (self.date_key // 100 % 100).astype(np.int8)
+        self.year = (self.date_key // 10000).astype(np.int16)
+        # Kolom teks disimpan sebagai kode integer; NULL mendapat kode -1 sehingga tidak pernah cocok dengan filter
+        self.codes = {}
+        self.categories = {}
+        for column in FILTER_COLUMNS + ('kind',):
+            values = pd.Categorical(df[column].astype(object))
+            self.codes[column] = values.codes.astype(np.int16)
+            self.categories[column] = list(values.categories)
+        self.register = df['register'].to_numpy(dtype=np.int16)
+        self.rank = df['rank'].to_numpy(dtype=np.uint8)
+
+    def _code_of(self, column, value):
+        """Code of a label (-2 if it never occurs, so it matches no row)"""
+        try:
+            return self.categories[column].index(value)
+        except ValueError:
+            return -2
+
+    def union(self, kind, start_key, end_key, filters=None):
+        """Registers of the union of all daily sketches of `kind` in [start_key, end_key] matching equality filters"""
+        lo = np.searchsorted(self.date_key, start_key, side='left')
+        hi = np.searchsorted(self.date_key, end_key, side='right')
+        mask = self.codes['kind'][lo:hi] == self._code_of('kind', kind)
+        for column, value in (filters or {}).items():
+            if value is None:
+                continue
+            if column == 'month':
+                mask &= self.month[lo:hi] == int(value)
+            elif column == 'year':
+                mask &= self.year[lo:hi] == int(value)
+            else:
+                mask &= self.codes[column][lo:hi] == self._code_of(column, value)
+        registers = np.zeros(REGISTERS, dtype=np.uint8)
+        np.maximum.at(registers, self.register[lo:hi][mask], self.rank[lo:hi][mask])
+        return registers
+
+    def distinct(self, kind, start_key, end_key, filters=None):
+        """Estimated number of distinct values of `kind` in the range (0 when there are no rows)"""
+        registers = self.union(kind, start_key, end_key, filters)
+        if not registers.any():
+            return 0
+        return int(round(estimate(registers)))
+
+    def nbytes(self):
+        return sum(array.nbytes for array in [self.date_key, self.month, self.year, self.register, self.rank, *self.codes.values()])
+
+def _load(watermark):
+    """Thread latar: memuat semua sketch lalu memasangnya; kegagalan dicoba lagi setelah retry_after"""
+    start = time.perf_counter()
+    try:
+        df = run_query(SKETCH_QUERY, query_class='build', ttl=0, name="daily sketches")
+        sketches = DailySketches(df) if df is not None else None
+    except Exception:
+        sketches = None
+    with _sketch_lock:
+        if sketches is not None:
+            _sketch_state.update(sketches=sketches, watermark=watermark, loaded_at=time.time())
+            _sketch_stats['loads'] += 1
+            _sketch_stats['load_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        else:
+            _sketch_state['failed_at'] = time.time()
+        _sketch_state['loading'] = False
+
+def get_daily_sketches():
+    """The process-wide DailySketches, or None when disabled, not loaded yet, or out of date (callers fall back to SQL);
+    loading runs in a background thread so no render waits for it"""
+    config = get_sketch_config()
+    if not config['enabled']:
+        return None
+
+    now = time.time()
+    watermark = query_watermark(SKETCH_QUERY, get_data_versions())
+    with _sketch_lock:
+        sketches = _sketch_state['sketches']
+        if watermark is not None:
+            # Dimuat ulang hanya jika salah satu tabel yang dibaca sudah berubah
+            expired = sketches is not None and _sketch_state['watermark'] != watermark
+        else:
+            max_age = float(config['max_age'])
+            expired = sketches is not None and max_age > 0 and now - _sketch_state['loaded_at'] > max_age
+        retry = now - _sketch_state['failed_at'] > float(config['retry_after'])
+        if (sketches is None or expired) and retry and not _sketch_state['loading']:
+            _sketch_state['loading'] = True
+            threading.Thread(target=_load, args=(watermark,), name="sketch-load", daemon=True).start()
+        # Sketch yang sudah tertinggal tidak dipakai sampai yang baru selesai dimuat
+        return None if expired else sketches
+
+def distinct_count(kind, start_key, end_key, filters=None):
+    """Estimated distinct count of `kind` over a date_key range from the daily sketches, or None when the caller must run SQL"""
+    sketches = get_daily_sketches()
+    if kind in DAY_ONLY_KINDS and any(column in COMBINATION_COLUMNS for column in (filters or {})):
+        # Sketch jenis ini tidak punya kombinasi kategori dan waktu, jadi filternya hanya bisa dijawab SQL
+        sketches = None
+    if sketches is None:
+        if get_sketch_config()['enabled']:
+            with _sketch_lock:
+                _sketch_stats['fallbacks'] += 1
+        return None
+    with _sketch_lock:
+        _sketch_stats['served'] += 1
+    return sketches.distinct(kind, start_key, end_key, filters)
+
+def _distinct_query(kind, start_date, end_date, filters):
+    """Exact COUNT(DISTINCT ...) over the facts, used when the sketches are not available"""
+    query = f"""
+    SELECT COUNT(DISTINCT {SKETCH_KINDS[kind]}) AS distinct_count
+    {FACT_SOURCE.strip()}
+    WHERE dd.date_key BETWEEN %(start_key)s AND %(end_key)s
+    """
+    params = resolve_date_range(start_date, end_date)
+    for column, value in filters.items():
+        query += f" AND {FILTER_EXPRESSIONS[column]} = %(filter_{column})s"
+        params[f"filter_{column}"] = value
+    return query, params
+
+def get_distinct_count(kind, start_date, end_date, filters=None, query_class='kpi'):
+    """Number of distinct `kind` values (primary_type, location_description, coordinates) in a date range under equality filters;
+    estimated from the daily sketches (standard error STANDARD_ERROR), exact SQL when they are not available"""
+    filters = {column: value for column, value in (filters or {}).items() if value not in (None, "")}
+    params = resolve_date_range(start_date, end_date)
+    count = distinct_count(kind, params['start_key'], params['end_key'], filters)
+    if count is not None:
+        return count
+    df = run_query(*_distinct_query(kind, start_date, end_date, filters), query_class=query_class, name=f"distinct {kind}")
+    if df is None or df.empty:
+        return 0
+    return int(df['distinct_count'].iloc[0])
+
+def get_sketch_stats():
+    """Sketch stats (size, loads, distinct counts served without SQL, error bound)"""
+    with _sketch_lock:
+        sketches = _sketch_state['sketches']
+        stats = dict(_sketch_stats)
+    stats.update({
+        'enabled': bool(get_sketch_config()['enabled']),
+        'precision': PRECISION,
+        'standard_error': round(STANDARD_ERROR, 4),
+        'rows': sketches.rows if sketches is not None else 0,
+        'bytes': sketches.nbytes() if sketches is not None else 0
+    })
+    return stats
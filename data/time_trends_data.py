@@ -1,548 +1,244 @@
-import streamlit as st
+from dataclasses import dataclass, field
 import pandas as pd
-from database.connection import init_connection
+from database.connection import run_query, run_query_batch
+from data.date_range import resolve_date_range
+from data.aggregate_engine import engine_grouping_sets, get_aggregate_engine
+from data.blocks import block_jobs, run_blocked_aggregate
+from data.dimensions import attach_labels, get_dimension
+from data.metrics import compile_metric, get_metric_value
+from data.prefix_index import get_prefix_index
+from data.sketches import get_distinct_count
 
-def get_total_cases_by_date_range(start_date, end_date):
-    """Get total number of cases within date range"""
-    engine = init_connection()
-    if engine is None:
-        return 0
+@dataclass
+class TimeTrendsBundle:
+    """All aggregates shown on the Time Trends page for one date range"""
+    total_cases: int = 0
+    risky_time: dict = field(default_factory=lambda: {"daytime": "N/A", "total_incidents": 0})
+    risky_day: dict = field(default_factory=lambda: {"weekday": "N/A", "total_incidents": 0})
+    risky_month: dict = field(default_factory=lambda: {"month_name": "N/A", "total_incidents": 0})
+    time_of_day: pd.DataFrame = field(default_factory=pd.DataFrame)
+    day_of_week: pd.DataFrame = field(default_factory=pd.DataFrame)
+    by_month: pd.DataFrame = field(default_factory=pd.DataFrame)
+    category_by_daytime: pd.DataFrame = field(default_factory=pd.DataFrame)
+    category_by_weekday: pd.DataFrame = field(default_factory=pd.DataFrame)
+    category_by_month: pd.DataFrame = field(default_factory=pd.DataFrame)
+
+def _sort_by_list(df, column, order, then=None):
+    """Sort rows by the position of `column` values in `order` (unknown values last)"""
+    positions = df[column].astype(object).map({value: i for i, value in enumerate(order)})
+    df = df.assign(_position=positions)
+    df = df.sort_values(['_position'] + ([then] if then else []), na_position='last')
+    return df.drop(columns='_position').reset_index(drop=True)
+
+def _top_row(df, label_column, label_key):
+    """Turn the largest row of a distribution into a risky_* KPI dict"""
+    if df.empty:
+        return {label_key: "N/A", "total_incidents": 0}
+    top = df.sort_values('total_incidents', ascending=False, kind='stable').iloc[0]
+    return {label_key: top[label_column], "total_incidents": int(top['total_incidents'])}
+
+# Kolom pengelompokan hasil query bundle (selain total_incidents yang dijumlahkan antar blok bulan)
+TIME_TRENDS_BUNDLE_KEYS = ['grouping_set', 'crime_category', 'daytime', 'weekday', 'month']
+
+def _time_trends_bundle_query(start_date, end_date):
+    """SQL and parameters of the Time Trends GROUPING SETS query"""
+    query = """
+    SELECT 
+        CASE
+            WHEN GROUPING(cdc.crime_category) = 0 AND GROUPING(cdc.daytime) = 0 THEN 'category_daytime'
+            WHEN GROUPING(cdc.crime_category) = 0 AND GROUPING(cdc.weekday) = 0 THEN 'category_weekday'
+            WHEN GROUPING(cdc.crime_category) = 0 AND GROUPING(cdc.month) = 0 THEN 'category_month'
+            WHEN GROUPING(cdc.daytime) = 0 THEN 'daytime'
+            WHEN GROUPING(cdc.weekday) = 0 THEN 'weekday'
+            WHEN GROUPING(cdc.month) = 0 THEN 'month'
+            ELSE 'total'
+        END AS grouping_set,
+        cdc.crime_category,
+        cdc.daytime,
+        cdc.weekday,
+        cdc.month,
+        SUM(cdc.incident_count) AS total_incidents
+    FROM crime_daily_cube cdc
+    WHERE cdc.date_key BETWEEN %(start_key)s AND %(end_key)s
+    GROUP BY GROUPING SETS (
+        (),
+        (cdc.daytime),
+        (cdc.weekday),
+        (cdc.month),
+        (cdc.crime_category, cdc.daytime),
+        (cdc.crime_category, cdc.weekday),
+        (cdc.crime_category, cdc.month)
+    )
+    """
+    
+    params = resolve_date_range(start_date, end_date)
+    return query, params
+
+def get_time_trends_bundle(start_date, end_date):
+    """Get every Time Trends distribution from one GROUPING SETS scan of crime_daily_cube; risky_* KPIs are derived from it"""
+    query, params = _time_trends_bundle_query(start_date, end_date)
     
-    try:
-        start_year = start_date.year
-        start_month = start_date.month
-        start_day = start_date.day
-        end_year = end_date.year
-        end_month = end_date.month
-        end_day = end_date.day
-        
-        query = """
-        SELECT SUM(crime_facts.incident_count) AS total_incidents 
-        FROM crime_facts 
-        JOIN dim_date ON crime_facts.id_date = dim_date.id_date
-        WHERE (dim_date.year > %(start_year)s OR 
-               (dim_date.year = %(start_year)s AND dim_date.month > %(start_month)s) OR
-               (dim_date.year = %(start_year)s AND dim_date.month = %(start_month)s AND dim_date.day >= %(start_day)s))
-        AND (dim_date.year < %(end_year)s OR 
-             (dim_date.year = %(end_year)s AND dim_date.month < %(end_month)s) OR
-             (dim_date.year = %(end_year)s AND dim_date.month = %(end_month)s AND dim_date.day <= %(end_day)s))
-        """
-        
-        params = {
-            'start_year': start_year,
-            'start_month': start_month, 
-            'start_day': start_day,
-            'end_year': end_year,
-            'end_month': end_month,
-            'end_day': end_day
-        }
-        
-        df = pd.read_sql_query(query, engine, params=params)
-        return int(df['total_incidents'].iloc[0]) if not df.empty and df['total_incidents'].iloc[0] is not None else 0
-    except Exception as e:
-        st.error(f"Error fetching total cases: {e}")
-        return 0
+    df = engine_grouping_sets(params['start_key'], params['end_key'], {
+        'total': (),
+        'daytime': ('daytime',),
+        'weekday': ('weekday',),
+        'month': ('month',),
+        'category_daytime': ('crime_category', 'daytime'),
+        'category_weekday': ('crime_category', 'weekday'),
+        'category_month': ('crime_category', 'month')
+    })
+    if df is None:
+        df = run_blocked_aggregate(query, params, TIME_TRENDS_BUNDLE_KEYS, query_class='chart', name="time trends bundle")
+    bundle = TimeTrendsBundle()
+    if df is None or df.empty:
+        return bundle
+    # Fakta tanpa kategori tetap dihitung di total dan distribusi waktu, tetapi tidak ditampilkan per kategori
+    df = df[~(df['grouping_set'].astype(str).str.startswith('category_') & df['crime_category'].isna())]
+
+    months = get_months_list()
+    total = df[df['grouping_set'] == 'total']
+    if not total.empty and pd.notna(total['total_incidents'].iloc[0]):
+        bundle.total_cases = int(total['total_incidents'].iloc[0])
+
+    daytime = df[df['grouping_set'] == 'daytime'][['daytime', 'total_incidents']]
+    bundle.time_of_day = _sort_by_list(daytime, 'daytime', get_daytime_list()).rename(columns={'total_incidents': 'total_cases'})
+    bundle.risky_time = _top_row(daytime, 'daytime', 'daytime')
+
+    weekday = df[df['grouping_set'] == 'weekday'][['weekday', 'total_incidents']]
+    bundle.day_of_week = _sort_by_list(weekday, 'weekday', get_weekdays_list())
+    bundle.risky_day = _top_row(weekday, 'weekday', 'weekday')
+
+    month = df[df['grouping_set'] == 'month']
+    by_month = pd.DataFrame({
+        'month_name': month['month'].astype(int).map(lambda m: months[m - 1]),
+        'month_number': month['month'].astype(int),
+        'total_incidents': month['total_incidents']
+    })
+    bundle.by_month = by_month.sort_values('month_number').reset_index(drop=True)
+    bundle.risky_month = _top_row(by_month, 'month_name', 'month_name')
+
+    category_daytime = df[df['grouping_set'] == 'category_daytime'][['crime_category', 'daytime', 'total_incidents']]
+    bundle.category_by_daytime = _sort_by_list(category_daytime, 'daytime', get_daytime_list(), then='crime_category')
+
+    category_weekday = df[df['grouping_set'] == 'category_weekday'][['crime_category', 'weekday', 'total_incidents']]
+    bundle.category_by_weekday = _sort_by_list(category_weekday, 'weekday', get_weekdays_list(), then='crime_category')
+
+    category_month = df[df['grouping_set'] == 'category_month']
+    category_month = pd.DataFrame({
+        'crime_category': category_month['crime_category'],
+        'month_name': category_month['month'].astype(int).map(lambda m: months[m - 1]),
+        'month_number': category_month['month'].astype(int),
+        'total_incidents': category_month['total_incidents']
+    })
+    bundle.category_by_month = category_month.sort_values(['month_number', 'crime_category']).reset_index(drop=True)
+    return bundle
+
+def get_total_cases_by_date_range(start_date, end_date):
+    """Get total number of cases within date range (shared `incidents` metric)"""
+    return get_metric_value('incidents', start_date, end_date)
 
 def get_risky_time_by_date_range(start_date, end_date):
     """Get risky time within date range"""
-    engine = init_connection()
-    if engine is None:
-        return {"daytime": "N/A", "total_incidents": 0}
-    
-    try:
-        start_year = start_date.year
-        start_month = start_date.month
-        start_day = start_date.day
-        end_year = end_date.year
-        end_month = end_date.month
-        end_day = end_date.day
-        
-        query = """
-        SELECT 
-            dim_date.daytime, 
-            SUM(crime_facts.incident_count) AS total_incidents
-        FROM crime_facts
-        JOIN dim_date ON crime_facts.id_date = dim_date.id_date
-        WHERE (dim_date.year > %(start_year)s OR 
-               (dim_date.year = %(start_year)s AND dim_date.month > %(start_month)s) OR
-               (dim_date.year = %(start_year)s AND dim_date.month = %(start_month)s AND dim_date.day >= %(start_day)s))
-        AND (dim_date.year < %(end_year)s OR 
-             (dim_date.year = %(end_year)s AND dim_date.month < %(end_month)s) OR
-             (dim_date.year = %(end_year)s AND dim_date.month = %(end_month)s AND dim_date.day <= %(end_day)s))
-        GROUP BY dim_date.daytime
-        ORDER BY total_incidents DESC
-        LIMIT 1
-        """
-        
-        params = {
-            'start_year': start_year,
-            'start_month': start_month, 
-            'start_day': start_day,
-            'end_year': end_year,
-            'end_month': end_month,
-            'end_day': end_day
-        }
-        
-        df = pd.read_sql_query(query, engine, params=params)
-        if not df.empty:
-            return {
-                "daytime": df['daytime'].iloc[0],
-                "total_incidents": int(df['total_incidents'].iloc[0])
-            }
-        return {"daytime": "N/A", "total_incidents": 0}
-    except Exception as e:
-        st.error(f"Error fetching risky time: {e}")
-        return {"daytime": "N/A", "total_incidents": 0}
+    return get_time_trends_bundle(start_date, end_date).risky_time
 
 def get_risky_day_by_date_range(start_date, end_date):
     """Get risky day within date range"""
-    engine = init_connection()
-    if engine is None:
-        return {"weekday": "N/A", "total_incidents": 0}
-    
-    try:
-        start_year = start_date.year
-        start_month = start_date.month
-        start_day = start_date.day
-        end_year = end_date.year
-        end_month = end_date.month
-        end_day = end_date.day
-        
-        query = """
-        SELECT 
-            dim_date.weekday, 
-            SUM(crime_facts.incident_count) AS total_incidents
-        FROM crime_facts
-        JOIN dim_date ON crime_facts.id_date = dim_date.id_date
-        WHERE (dim_date.year > %(start_year)s OR 
-               (dim_date.year = %(start_year)s AND dim_date.month > %(start_month)s) OR
-               (dim_date.year = %(start_year)s AND dim_date.month = %(start_month)s AND dim_date.day >= %(start_day)s))
-        AND (dim_date.year < %(end_year)s OR 
-             (dim_date.year = %(end_year)s AND dim_date.month < %(end_month)s) OR
-             (dim_date.year = %(end_year)s AND dim_date.month = %(end_month)s AND dim_date.day <= %(end_day)s))
-        GROUP BY dim_date.weekday
-        ORDER BY total_incidents DESC
-        LIMIT 1
-        """
-        
-        params = {
-            'start_year': start_year,
-            'start_month': start_month, 
-            'start_day': start_day,
-            'end_year': end_year,
-            'end_month': end_month,
-            'end_day': end_day
-        }
-        
-        df = pd.read_sql_query(query, engine, params=params)
-        if not df.empty:
-            return {
-                "weekday": df['weekday'].iloc[0],
-                "total_incidents": int(df['total_incidents'].iloc[0])
-            }
-        return {"weekday": "N/A", "total_incidents": 0}
-    except Exception as e:
-        st.error(f"Error fetching risky day: {e}")
-        return {"weekday": "N/A", "total_incidents": 0}
+    return get_time_trends_bundle(start_date, end_date).risky_day
 
 def get_risky_month_by_date_range(start_date, end_date):
     """Get risky month within date range"""
-    engine = init_connection()
-    if engine is None:
-        return {"month_name": "N/A", "total_incidents": 0}
-    
-    try:
-        start_year = start_date.year
-        start_month = start_date.month
-        start_day = start_date.day
-        end_year = end_date.year
-        end_month = end_date.month
-        end_day = end_date.day
-        
-        query = """
-        SELECT 
-            CASE dim_date.month
-                WHEN 1 THEN 'Januari'
-                WHEN 2 THEN 'Februari'
-                WHEN 3 THEN 'Maret'
-                WHEN 4 THEN 'April'
-                WHEN 5 THEN 'Mei'
-                WHEN 6 THEN 'Juni'
-                WHEN 7 THEN 'Juli'
-                WHEN 8 THEN 'Agustus'
-                WHEN 9 THEN 'September'
-                WHEN 10 THEN 'Oktober'
-                WHEN 11 THEN 'November'
-                WHEN 12 THEN 'Desember'
-            END AS month_name,
-            SUM(crime_facts.incident_count) AS total_incidents
-        FROM crime_facts
-        JOIN dim_date ON crime_facts.id_date = dim_date.id_date
-        WHERE (dim_date.year > %(start_year)s OR 
-               (dim_date.year = %(start_year)s AND dim_date.month > %(start_month)s) OR
-               (dim_date.year = %(start_year)s AND dim_date.month = %(start_month)s AND dim_date.day >= %(start_day)s))
-        AND (dim_date.year < %(end_year)s OR 
-             (dim_date.year = %(end_year)s AND dim_date.month < %(end_month)s) OR
-             (dim_date.year = %(end_year)s AND dim_date.month = %(end_month)s AND dim_date.day <= %(end_day)s))
-        GROUP BY dim_date.month
-        ORDER BY total_incidents DESC
-        LIMIT 1
-        """
-        
-        params = {
-            'start_year': start_year,
-            'start_month': start_month, 
-            'start_day': start_day,
-            'end_year': end_year,
-            'end_month': end_month,
-            'end_day': end_day
-        }
-        
-        df = pd.read_sql_query(query, engine, params=params)
-        if not df.empty:
-            return {
-                "month_name": df['month_name'].iloc[0],
-                "total_incidents": int(df['total_incidents'].iloc[0])
-            }
-        return {"month_name": "N/A", "total_incidents": 0}
-    except Exception as e:
-        st.error(f"Error fetching risky month: {e}")
-        return {"month_name": "N/A", "total_incidents": 0}
+    return get_time_trends_bundle(start_date, end_date).risky_month
     
 def get_crime_by_time_of_day(start_date, end_date):
     """Get crime distribution by time of day within date range"""
-    engine = init_connection()
-    if engine is None:
-        return pd.DataFrame()
-    
-    try:
-        start_year = start_date.year
-        start_month = start_date.month
-        start_day = start_date.day
-        end_year = end_date.year
-        end_month = end_date.month
-        end_day = end_date.day
-        
-        query = """
-        SELECT 
-            dim_date.daytime,
-            SUM(crime_facts.incident_count) AS total_cases
-        FROM crime_facts
-        JOIN dim_date ON crime_facts.id_date = dim_date.id_date
-        WHERE (dim_date.year > %(start_year)s OR 
-               (dim_date.year = %(start_year)s AND dim_date.month > %(start_month)s) OR
-               (dim_date.year = %(start_year)s AND dim_date.month = %(start_month)s AND dim_date.day >= %(start_day)s))
-        AND (dim_date.year < %(end_year)s OR 
-             (dim_date.year = %(end_year)s AND dim_date.month < %(end_month)s) OR
-             (dim_date.year = %(end_year)s AND dim_date.month = %(end_month)s AND dim_date.day <= %(end_day)s))
-        GROUP BY dim_date.daytime
-        ORDER BY 
-            CASE dim_date.daytime 
-                WHEN 'Dini hari' THEN 1
-                WHEN 'Pagi' THEN 2
-                WHEN 'Siang' THEN 3
-                WHEN 'Sore' THEN 4
-                WHEN 'Malam' THEN 5
-            END
-        """
-        
-        params = {
-            'start_year': start_year,
-            'start_month': start_month, 
-            'start_day': start_day,
-            'end_year': end_year,
-            'end_month': end_month,
-            'end_day': end_day
-        }
-        
-        df = pd.read_sql_query(query, engine, params=params)
-        return df
-    except Exception as e:
-        st.error(f"Error fetching crime by time of day: {e}")
-        return pd.DataFrame()
+    return get_time_trends_bundle(start_date, end_date).time_of_day
 
 def get_crime_by_day_of_week(start_date, end_date):
     """Get crime distribution by day of week within date range"""
-    engine = init_connection()
-    if engine is None:
-        return pd.DataFrame()
-    
-    try:
-        query = """
-        SELECT 
-            dim_date.weekday,
-            SUM(crime_facts.incident_count) AS total_incidents
-        FROM crime_facts
-        JOIN dim_date ON crime_facts.id_date = dim_date.id_date
-        WHERE MAKE_DATE(dim_date.year, dim_date.month, dim_date.day) 
-              BETWEEN %(start_date)s AND %(end_date)s
-        GROUP BY dim_date.weekday
-        ORDER BY 
-            CASE dim_date.weekday 
-                WHEN 'Senin' THEN 1
-                WHEN 'Selasa' THEN 2
-                WHEN 'Rabu' THEN 3
-                WHEN 'Kamis' THEN 4
-                WHEN 'Jumat' THEN 5
-                WHEN 'Sabtu' THEN 6
-                WHEN 'Minggu' THEN 7
-            END
-        """
-        
-        params = {
-            'start_date': start_date,
-            'end_date': end_date
-        }
-        
-        df = pd.read_sql_query(query, engine, params=params)
-        return df
-    except Exception as e:
-        st.error(f"Error fetching crime by day of week: {e}")
-        return pd.DataFrame()
+    return get_time_trends_bundle(start_date, end_date).day_of_week
 
 def get_crime_by_month(start_date, end_date):
     """Get crime distribution by month within date range (aggregated across years)"""
-    engine = init_connection()
-    if engine is None:
-        return pd.DataFrame()
-    
-    try:
-        query = """
-        SELECT 
-            CASE dim_date.month
-                WHEN 1 THEN 'Januari'
-                WHEN 2 THEN 'Februari'
-                WHEN 3 THEN 'Maret'
-                WHEN 4 THEN 'April'
-                WHEN 5 THEN 'Mei'
-                WHEN 6 THEN 'Juni'
-                WHEN 7 THEN 'Juli'
-                WHEN 8 THEN 'Agustus'
-                WHEN 9 THEN 'September'
-                WHEN 10 THEN 'Oktober'
-                WHEN 11 THEN 'November'
-                WHEN 12 THEN 'Desember'
-            END AS month_name,
-            dim_date.month AS month_number,
-            SUM(crime_facts.incident_count) AS total_incidents
-        FROM crime_facts
-        JOIN dim_date ON crime_facts.id_date = dim_date.id_date
-        WHERE MAKE_DATE(dim_date.year, dim_date.month, dim_date.day) 
-              BETWEEN %(start_date)s AND %(end_date)s
-        GROUP BY dim_date.month
-        ORDER BY dim_date.month
-        """
-        
-        params = {
-            'start_date': start_date,
-            'end_date': end_date
-        }
-        
-        df = pd.read_sql_query(query, engine, params=params)
-        return df
-    except Exception as e:
-        st.error(f"Error fetching crime by month: {e}")
-        return pd.DataFrame()
+    return get_time_trends_bundle(start_date, end_date).by_month
 
 def get_crime_category_by_daytime(start_date, end_date):
     """Get crime distribution by category and daytime within date range"""
-    engine = init_connection()
-    if engine is None:
-        return pd.DataFrame()
-    
-    try:
-        query = """
-        SELECT 
-            dcc.crime_category,
-            dd.daytime,
-            SUM(cf.incident_count) AS total_incidents
-        FROM crime_facts cf
-        JOIN dim_date dd ON cf.id_date = dd.id_date
-        JOIN dim_crime dc ON cf.id_crime = dc.id_crime
-        JOIN dim_crime_category dcc ON dc.id_crime_category = dcc.id_crime_category
-        WHERE MAKE_DATE(dd.year, dd.month, dd.day) 
-              BETWEEN %(start_date)s AND %(end_date)s
-        GROUP BY dcc.crime_category, dd.daytime
-        ORDER BY 
-            CASE dd.daytime 
-                WHEN 'Dini hari' THEN 1
-                WHEN 'Pagi' THEN 2
-                WHEN 'Siang' THEN 3
-                WHEN 'Sore' THEN 4
-                WHEN 'Malam' THEN 5
-            END,
-            dcc.crime_category
-        """
-        
-        params = {
-            'start_date': start_date,
-            'end_date': end_date
-        }
-        
-        df = pd.read_sql_query(query, engine, params=params)
-        return df
-    except Exception as e:
-        st.error(f"Error fetching crime category by daytime: {e}")
-        return pd.DataFrame()
+    return get_time_trends_bundle(start_date, end_date).category_by_daytime
 
 def get_crime_category_by_weekday(start_date, end_date):
     """Get crime distribution by category and weekday within date range"""
-    engine = init_connection()
-    if engine is None:
-        return pd.DataFrame()
-    
-    try:
-        query = """
-        SELECT 
-            dcc.crime_category,
-            dd.weekday,
-            SUM(cf.incident_count) AS total_incidents
-        FROM crime_facts cf
-        JOIN dim_date dd ON cf.id_date = dd.id_date
-        JOIN dim_crime dc ON cf.id_crime = dc.id_crime
-        JOIN dim_crime_category dcc ON dc.id_crime_category = dcc.id_crime_category
-        WHERE MAKE_DATE(dd.year, dd.month, dd.day) 
-              BETWEEN %(start_date)s AND %(end_date)s
-        GROUP BY dcc.crime_category, dd.weekday
-        ORDER BY 
-            CASE dd.weekday 
-                WHEN 'Senin' THEN 1
-                WHEN 'Selasa' THEN 2
-                WHEN 'Rabu' THEN 3
-                WHEN 'Kamis' THEN 4
-                WHEN 'Jumat' THEN 5
-                WHEN 'Sabtu' THEN 6
-                WHEN 'Minggu' THEN 7
-            END,
-            dcc.crime_category
-        """
-        
-        params = {
-            'start_date': start_date,
-            'end_date': end_date
-        }
-        
-        df = pd.read_sql_query(query, engine, params=params)
-        return df
-    except Exception as e:
-        st.error(f"Error fetching crime category by weekday: {e}")
-        return pd.DataFrame()
+    return get_time_trends_bundle(start_date, end_date).category_by_weekday
 
 def get_crime_category_by_month(start_date, end_date):
     """Get crime distribution by category and month within date range"""
-    engine = init_connection()
-    if engine is None:
-        return pd.DataFrame()
+    return get_time_trends_bundle(start_date, end_date).category_by_month
+
+def _crime_detail_table_query(start_date, end_date, month_filter=None, weekday_filter=None, daytime_filter=None, crime_category_filter=None):
+    """SQL and parameters of the filtered crime detail table"""
+    query = """
+    SELECT 
+        cf.id_location,
+        cf.id_crime,
+        cf.arrest_status,
+        dd.day,
+        dd.month,
+        dd.year,
+        dd.weekday,
+        dd.daytime
+    FROM crime_facts cf
+    JOIN dim_date dd ON cf.id_date = dd.id_date
+    WHERE dd.date_key BETWEEN %(start_key)s AND %(end_key)s
+    AND cf.id_crime IS NOT NULL
+    AND cf.id_location IS NOT NULL
+    """
     
-    try:
-        query = """
-        SELECT 
-            dcc.crime_category,
-            CASE dd.month
-                WHEN 1 THEN 'Januari'
-                WHEN 2 THEN 'Februari'
-                WHEN 3 THEN 'Maret'
-                WHEN 4 THEN 'April'
-                WHEN 5 THEN 'Mei'
-                WHEN 6 THEN 'Juni'
-                WHEN 7 THEN 'Juli'
-                WHEN 8 THEN 'Agustus'
-                WHEN 9 THEN 'September'
-                WHEN 10 THEN 'Oktober'
-                WHEN 11 THEN 'November'
-                WHEN 12 THEN 'Desember'
-            END AS month_name,
-            dd.month AS month_number,
-            SUM(cf.incident_count) AS total_incidents
-        FROM crime_facts cf
-        JOIN dim_date dd ON cf.id_date = dd.id_date
-        JOIN dim_crime dc ON cf.id_crime = dc.id_crime
-        JOIN dim_crime_category dcc ON dc.id_crime_category = dcc.id_crime_category
-        WHERE MAKE_DATE(dd.year, dd.month, dd.day) 
-              BETWEEN %(start_date)s AND %(end_date)s
-        GROUP BY dcc.crime_category, dd.month
-        ORDER BY dd.month, dcc.crime_category
-        """
-        
-        params = {
-            'start_date': start_date,
-            'end_date': end_date
-        }
-        
-        df = pd.read_sql_query(query, engine, params=params)
-        return df
-    except Exception as e:
-        st.error(f"Error fetching crime category by month: {e}")
-        return pd.DataFrame()
+    params = resolve_date_range(start_date, end_date)
+    
+    if month_filter:
+        if month_filter.isdigit():
+            query += " AND dd.month = %(month_filter)s"
+            params['month_filter'] = int(month_filter)
+        else:
+            month_mapping = {
+                'Januari': 1, 'Februari': 2, 'Maret': 3, 'April': 4,
+                'Mei': 5, 'Juni': 6, 'Juli': 7, 'Agustus': 8, 
+                'September': 9, 'Oktober': 10, 'November': 11, 'Desember': 12
+            }
+            if month_filter in month_mapping:
+                query += " AND dd.month = %(month_filter)s"
+                params['month_filter'] = month_mapping[month_filter]
+    
+    if weekday_filter:
+        query += " AND dd.weekday = %(weekday_filter)s"
+        params['weekday_filter'] = weekday_filter
+    
+    if daytime_filter:
+        query += " AND dd.daytime = %(daytime_filter)s"
+        params['daytime_filter'] = daytime_filter
+    
+    if crime_category_filter:
+        crimes = get_dimension('crime')
+        query += " AND cf.id_crime = ANY(%(crime_ids)s)"
+        params['crime_ids'] = crimes.ids_where('crime_category', crime_category_filter) if crimes is not None else []
+    
+    query += " ORDER BY dd.year DESC, dd.month DESC, dd.day DESC LIMIT 1000"
+    return query, params
 
 def get_crime_detail_table(start_date, end_date, month_filter=None, weekday_filter=None, daytime_filter=None, crime_category_filter=None):
     """Get detailed crime data with filters"""
-    engine = init_connection()
-    if engine is None:
-        return pd.DataFrame()
+    query, params = _crime_detail_table_query(start_date, end_date, month_filter, weekday_filter, daytime_filter, crime_category_filter)
     
-    try:
-        query = """
-        SELECT 
-            dlc.location_category,
-            dl.location_description,
-            dc.primary_type,
-            dc.description,
-            cf.arrest_status,
-            dd.day,
-            dd.month,
-            dd.year,
-            dd.weekday,
-            dd.daytime,
-            dcc.crime_category
-        FROM crime_facts cf
-        JOIN dim_date dd ON cf.id_date = dd.id_date
-        JOIN dim_location dl ON cf.id_location = dl.id_location
-        JOIN dim_location_category dlc ON dl.id_location_category = dlc.id_location_category
-        JOIN dim_crime dc ON cf.id_crime = dc.id_crime
-        JOIN dim_crime_category dcc ON dc.id_crime_category = dcc.id_crime_category
-        WHERE MAKE_DATE(dd.year, dd.month, dd.day) 
-              BETWEEN %(start_date)s AND %(end_date)s
-        """
-        
-        params = {
-            'start_date': start_date,
-            'end_date': end_date
-        }
-        
-        if month_filter:
-            if month_filter.isdigit():
-                query += " AND dd.month = %(month_filter)s"
-                params['month_filter'] = int(month_filter)
-            else:
-                month_mapping = {
-                    'Januari': 1, 'Februari': 2, 'Maret': 3, 'April': 4,
-                    'Mei': 5, 'Juni': 6, 'Juli': 7, 'Agustus': 8, 
-                    'September': 9, 'Oktober': 10, 'November': 11, 'Desember': 12
-                }
-                if month_filter in month_mapping:
-                    query += " AND dd.month = %(month_filter)s"
-                    params['month_filter'] = month_mapping[month_filter]
-        
-        if weekday_filter:
-            query += " AND dd.weekday = %(weekday_filter)s"
-            params['weekday_filter'] = weekday_filter
-        
-        if daytime_filter:
-            query += " AND dd.daytime = %(daytime_filter)s"
-            params['daytime_filter'] = daytime_filter
-        
-        if crime_category_filter:
-            query += " AND dcc.crime_category = %(crime_category_filter)s"
-            params['crime_category_filter'] = crime_category_filter
-        
-        query += " ORDER BY dd.year DESC, dd.month DESC, dd.day DESC LIMIT 1000"
-        
-        df = pd.read_sql_query(query, engine, params=params)
-        return df
-    except Exception as e:
-        st.error(f"Error fetching crime detail table: {e}")
+    df = run_query(query, params, query_class='detail', name="crime detail table")
+    if df is None:
+        return pd.DataFrame()
+    df = attach_labels(df, {
+        'location': ['location_category', 'location_description'],
+        'crime': ['primary_type', 'description', 'crime_category']
+    })
+    if df is None:
         return pd.DataFrame()
+    return df[['location_category', 'location_description', 'primary_type', 'description', 'arrest_status',
+               'day', 'month', 'year', 'weekday', 'daytime', 'crime_category']]
 
 def get_months_list():
     """Get list of available months"""
@@ -557,78 +253,57 @@ def get_daytime_list():
     """Get list of available daytime periods"""
     return ['Dini hari', 'Pagi', 'Siang', 'Sore', 'Malam']
 
+CRIME_CATEGORIES_QUERY = """
+    SELECT DISTINCT crime_category 
+    FROM dim_crime_category 
+    ORDER BY crime_category
+    """
+
 def get_crime_categories_list():
     """Get list of available crime categories"""
-    engine = init_connection()
-    if engine is None:
-        return ["Street and Narcotics Crimes", "Battery Crimes", "Burglary", "Theft Crimes", "Property Crimes"]
-    
-    try:
-        query = """
-        SELECT DISTINCT crime_category 
-        FROM dim_crime_category 
-        ORDER BY crime_category
-        """
-        
-        df = pd.read_sql_query(query, engine)
-        return df['crime_category'].tolist()
-    except Exception as e:
-        st.error(f"Error fetching crime categories: {e}")
+    df = run_query(CRIME_CATEGORIES_QUERY, query_class='metadata', name="crime categories")
+    if df is None:
         return ["Street and Narcotics Crimes", "Battery Crimes", "Burglary", "Theft Crimes", "Property Crimes"]
+    return df['crime_category'].tolist()
+
+def _filtered_total_incidents_filters(month_filter=None, weekday_filter=None, daytime_filter=None, crime_category_filter=None):
+    """Time Trends detail filters as `incidents` metric filters (month names become month numbers)"""
+    month = None
+    if month_filter:
+        if month_filter.isdigit():
+            month = int(month_filter)
+        elif month_filter in get_months_list():
+            month = get_months_list().index(month_filter) + 1
+    return {'month': month, 'weekday': weekday_filter, 'daytime': daytime_filter, 'category': crime_category_filter}
 
 def get_filtered_total_incidents(start_date, end_date, month_filter=None, weekday_filter=None, daytime_filter=None, crime_category_filter=None):
     """Get total incidents with filters applied (aggregated by incident_count, not row count)"""
-    engine = init_connection()
-    if engine is None:
-        return 0
-    
-    try:
-        query = """
-        SELECT 
-            SUM(cf.incident_count) AS total_incidents
-        FROM crime_facts cf
-        JOIN dim_date dd ON cf.id_date = dd.id_date
-        JOIN dim_location dl ON cf.id_location = dl.id_location
-        JOIN dim_location_category dlc ON dl.id_location_category = dlc.id_location_category
-        JOIN dim_crime dc ON cf.id_crime = dc.id_crime
-        JOIN dim_crime_category dcc ON dc.id_crime_category = dcc.id_crime_category
-        WHERE MAKE_DATE(dd.year, dd.month, dd.day) 
-              BETWEEN %(start_date)s AND %(end_date)s
-        """
-        
-        params = {
-            'start_date': start_date,
-            'end_date': end_date
-        }
-
-        if month_filter:
-            if month_filter.isdigit():
-                query += " AND dd.month = %(month_filter)s"
-                params['month_filter'] = int(month_filter)
-            else:
-                month_mapping = {
-                    'Januari': 1, 'Februari': 2, 'Maret': 3, 'April': 4,
-                    'Mei': 5, 'Juni': 6, 'Juli': 7, 'Agustus': 8, 
-                    'September': 9, 'Oktober': 10, 'November': 11, 'Desember': 12
-                }
-                if month_filter in month_mapping:
-                    query += " AND dd.month = %(month_filter)s"
-                    params['month_filter'] = month_mapping[month_filter]
-        
-        if weekday_filter:
-            query += " AND dd.weekday = %(weekday_filter)s"
-            params['weekday_filter'] = weekday_filter
-        
-        if daytime_filter:
-            query += " AND dd.daytime = %(daytime_filter)s"
-            params['daytime_filter'] = daytime_filter
-        
-        if crime_category_filter:
-            query += " AND dcc.crime_category = %(crime_category_filter)s"
-            params['crime_category_filter'] = crime_category_filter
-        
-        df = pd.read_sql_query(query, engine, params=params)
-        return int(df['total_incidents'].iloc[0]) if not df.empty and df['total_incidents'].iloc[0] is not None else 0
-    except Exception as e:
-        st.error(f"Error fetching filtered total incidents: {e}")
-        return 0
\ No newline at end of file
+    filters = _filtered_total_incidents_filters(month_filter, weekday_filter, daytime_filter, crime_category_filter)
+    return get_metric_value('incidents', start_date, end_date, filters=filters)
+
+def get_unique_crime_types(start_date, end_date, month_filter=None, weekday_filter=None, daytime_filter=None, crime_category_filter=None):
+    """Get the number of distinct primary types for the detail filters (HyperLogLog estimate over all matching rows, not only the 1000 shown)"""
+    filters = _filtered_total_incidents_filters(month_filter, weekday_filter, daytime_filter, crime_category_filter)
+    return get_distinct_count('primary_type', start_date, end_date, {
+        'month': filters['month'],
+        'weekday': filters['weekday'],
+        'daytime': filters['daytime'],
+        'crime_category': filters['category']
+    })
+
+def prefetch_time_trends_page(start_date, end_date, month_filter=None, weekday_filter=None, daytime_filter=None, crime_category_filter=None):
+    """Send every Time Trends query in one batch (a single pipeline with psycopg 3) so the getters above are served from cache"""
+    filters = (month_filter, weekday_filter, daytime_filter, crime_category_filter)
+    jobs = [
+        (CRIME_CATEGORIES_QUERY, None, 'metadata', "crime categories"),
+        (*_crime_detail_table_query(start_date, end_date, *filters), 'detail', "crime detail table")
+    ]
+    if get_aggregate_engine() is None:
+        jobs += block_jobs(*_time_trends_bundle_query(start_date, end_date), 'chart', "time trends bundle")
+        # Total kasus dijawab dari index prefix sum jika sudah siap, jadi query-nya tidak perlu ikut dikirim
+        if get_prefix_index() is None:
+            jobs += block_jobs(*compile_metric('incidents', start_date, end_date), 'kpi', "metric incidents")
+            if any(filters):
+                metric_filters = _filtered_total_incidents_filters(*filters)
+                jobs += block_jobs(*compile_metric('incidents', start_date, end_date, filters=metric_filters), 'kpi', "metric incidents")
+    run_query_batch(jobs)
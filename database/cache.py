@@ -0,0 +1,245 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+import streamlit as st
+from database.frames import frame_nbytes, frame_to_ipc, frame_from_ipc, pa
+from database.disk_cache import disk_get, disk_put, clear_disk_cache, get_disk_cache_stats
+
+# Batas memori cache hasil query, bisa di-override lewat [query_cache] di st.secrets.
+# max_bytes = total ukuran semua entri; entri yang paling lama tidak dipakai dibuang lebih dulu (LRU).
+# Hasil >= compress_min_bytes disimpan sebagai buffer Arrow IPC terkompresi (compression = None untuk mematikan)
+CACHE_DEFAULTS = {
+    'max_bytes': 256 * 1024 * 1024,
+    'compression': 'zstd',
+    'compress_min_bytes': 1024 * 1024
+}
+
+# Jumlah entri terbesar yang ditampilkan di statistik cache
+LARGEST_ENTRIES = 10
+
+_cache_lock = threading.Lock()
+# Urutan entri = urutan pemakaian terakhir (paling lama tidak dipakai di depan)
+_cache = OrderedDict()
+_cache_state = {
+    'bytes': 0
+}
+# Key terbaru per query+parameter (tanpa watermark), untuk menemukan hasil lama saat stale-while-revalidate
+_latest = {}
+_cache_stats = {
+    'hits': 0,
+    'misses': 0,
+    'expired': 0,
+    'invalidated': 0,
+    'stale_hits': 0,
+    'disk_hits': 0,
+    'evictions': 0,
+    'evicted_bytes': 0,
+    'rejected': 0
+}
+
+def get_cache_config():
+    """Konfigurasi cache memori yang berlaku (default + st.secrets["query_cache"])"""
+    config = dict(CACHE_DEFAULTS)
+    try:
+        config.update(dict(st.secrets.get("query_cache", {})))
+    except Exception:
+        pass
+    return config
+
+def normalize_sql(query):
+    """Menyeragamkan teks SQL (spasi dan titik koma akhir) agar query yang sama punya key yang sama"""
+    return re.sub(r"\s+", " ", query).strip().rstrip(";").strip()
+
+def _normalize_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if hasattr(value, "item"):
+        return value.item()
+    if isinstance(value, (list, tuple, set)):
+        return [_normalize_value(v) for v in value]
+    return value
+
+def normalize_params(params):
+    """Mengubah parameter query menjadi bentuk kanonik (urut, tanggal sebagai ISO string)"""
+    if not params:
+        return {}
+    return {str(k): _normalize_value(v) for k, v in sorted(params.items())}
+
+def make_cache_key(query, params=None, watermark=None):
+    """Key cache kanonik dari teks SQL, parameter yang sudah dinormalisasi, dan version tabel yang dibaca"""
+    parts = [normalize_sql(query), normalize_params(params)]
+    if watermark:
+        parts.append(dict(sorted(watermark.items())))
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+def _stale_since(entry, now):
+    """Sejak kapan entri tidak lagi segar (kedaluwarsa atau tabelnya berubah), None jika masih segar"""
+    if entry['invalidated_at'] is not None:
+        return entry['invalidated_at']
+    if entry['expires_at'] is not None and entry['expires_at'] <= now:
+        return entry['expires_at']
+    return None
+
+def cache_get(key):
+    """Mengambil salinan DataFrame dari cache memori atau disk, None jika tidak ada atau sudah kedaluwarsa"""
+    with _cache_lock:
+        entry = _cache.get(key)
+        expired = entry is not None and _stale_since(entry, time.time()) is not None
+        if entry is not None and not expired:
+            _cache_stats['hits'] += 1
+            _cache.move_to_end(key)
+    if entry is not None and not expired:
+        return _entry_frame(entry)
+
+    # Belum ada (atau sudah kedaluwarsa) di memori proses ini: coba cache disk yang dipakai bersama semua proses
+    stored = disk_get(key)
+    if stored is None:
+        with _cache_lock:
+            # Entri lama di memori tetap disimpan supaya bisa dipakai cache_get_stale sampai diganti hasil baru
+            if expired:
+                _cache_stats['expired'] += 1
+            _cache_stats['misses'] += 1
+        return None
+    entry = _make_entry(stored['df'], stored['expires_at'], stored['tables'], stored['base_key'])
+    with _cache_lock:
+        _cache_stats['disk_hits'] += 1
+        _store(key, entry)
+    return stored['df']
+
+def cache_get_stale(base_key, max_stale):
+    """Salinan hasil lama terakhir untuk query+parameter (base_key) yang belum lewat max_stale detik sejak tidak segar"""
+    now = time.time()
+    with _cache_lock:
+        key = _latest.get(base_key)
+        entry = _cache.get(key) if key is not None else None
+        if entry is None:
+            return None
+        stale_since = _stale_since(entry, now)
+        if stale_since is None:
+            return None
+        if now - stale_since > max_stale:
+            # Entri tetap disimpan sebagai hasil terakhir untuk circuit breaker (cache_get_last) sampai diganti atau kena LRU
+            return None
+        _cache_stats['stale_hits'] += 1
+        _cache.move_to_end(key)
+    return _entry_frame(entry)
+
+def cache_get_last(base_key):
+    """Hasil terakhir di cache memori untuk query+parameter (base_key) berapa pun umurnya, sebagai (DataFrame, stored_at); None jika tidak ada"""
+    with _cache_lock:
+        key = _latest.get(base_key)
+        entry = _cache.get(key) if key is not None else None
+        if entry is None:
+            return None
+        _cache.move_to_end(key)
+    return _entry_frame(entry), entry['stored_at']
+
+def _make_entry(df, expires_at, tables, base_key):
+    """Entri cache baru untuk DataFrame; hasil besar disimpan sebagai buffer Arrow IPC terkompresi (dilakukan di luar lock)"""
+    config = get_cache_config()
+    raw_bytes = frame_nbytes(df)
+    payload = None
+    if pa is not None and config['compression'] and raw_bytes >= int(config['compress_min_bytes']):
+        payload = frame_to_ipc(df, config['compression'])
+        if payload.size >= raw_bytes:
+            payload = None
+    return {
+        'df': df.copy() if payload is None else None,
+        'payload': payload,
+        'expires_at': expires_at,
+        'invalidated_at': None,
+        'stored_at': time.time(),
+        'tables': set(tables),
+        'base_key': base_key,
+        'bytes': payload.size if payload is not None else raw_bytes,
+        'raw_bytes': raw_bytes
+    }
+
+def _entry_frame(entry):
+    """Salinan DataFrame sebuah entri; entri terkompresi didekompresi dulu"""
+    if entry['payload'] is not None:
+        return frame_from_ipc(entry['payload'])
+    return entry['df'].copy()
+
+def _remove(key):
+    """Membuang satu entri dari cache memori (lock sudah dipegang)"""
+    entry = _cache.pop(key, None)
+    if entry is None:
+        return None
+    _cache_state['bytes'] -= entry['bytes']
+    if _latest.get(entry['base_key']) == key:
+        del _latest[entry['base_key']]
+    return entry
+
+def _store(key, entry):
+    """Memasukkan entri ke cache memori (lock sudah dipegang); hasil lama untuk base_key yang sama dibuang,
+    lalu entri yang paling lama tidak dipakai dibuang sampai total ukuran kembali di bawah max_bytes"""
+    max_bytes = int(get_cache_config()['max_bytes'])
+    previous = _latest.get(entry['base_key'])
+    if previous is not None and previous != key:
+        _remove(previous)
+    _remove(key)
+    if entry['bytes'] > max_bytes:
+        # Satu hasil yang lebih besar dari seluruh budget tidak disimpan di memori (tetap ada di disk cache)
+        _cache_stats['rejected'] += 1
+        return
+
+    _cache[key] = entry
+    _cache_state['bytes'] += entry['bytes']
+    _latest[entry['base_key']] = key
+    while _cache_state['bytes'] > max_bytes:
+        evicted = _remove(next(iter(_cache)))
+        _cache_stats['evictions'] += 1
+        _cache_stats['evicted_bytes'] += evicted['bytes']
+
+def cache_put(key, df, ttl, watermark=None, base_key=None):
+    """Menyimpan DataFrame ke cache memori dan disk selama ttl detik (None = tanpa batas waktu) beserta tabel yang dibacanya"""
+    expires_at = time.time() + ttl if ttl is not None else None
+    base_key = base_key or key
+    entry = _make_entry(df, expires_at, set(watermark or ()), base_key)
+    with _cache_lock:
+        _store(key, entry)
+    disk_put(key, base_key, df, expires_at, watermark)
+
+def invalidate_tables(tables):
+    """Menandai tidak segar hanya entri yang membaca salah satu tabel yang datanya berubah"""
+    tables = set(tables)
+    now = time.time()
+    with _cache_lock:
+        stale = [key for key, entry in _cache.items() if entry['tables'] & tables and entry['invalidated_at'] is None]
+        for key in stale:
+            _cache[key]['invalidated_at'] = now
+        _cache_stats['invalidated'] += len(stale)
+    return len(stale)
+
+def clear_cache():
+    """Mengosongkan seluruh cache hasil query"""
+    with _cache_lock:
+        _cache.clear()
+        _latest.clear()
+        _cache_state['bytes'] = 0
+    clear_disk_cache()
+
+def get_cache_stats():
+    """Statistik cache hasil query: hit/miss, ukuran terhadap budget, eviction, dan ukuran entri terbesar"""
+    max_bytes = int(get_cache_config()['max_bytes'])
+    with _cache_lock:
+        stats = dict(_cache_stats)
+        stats['entries'] = len(_cache)
+        stats['stale_entries'] = sum(1 for entry in _cache.values() if _stale_since(entry, time.time()) is not None)
+        stats['compressed_entries'] = sum(1 for entry in _cache.values() if entry['payload'] is not None)
+        stats['bytes'] = _cache_state['bytes']
+        stats['raw_bytes'] = sum(entry['raw_bytes'] for entry in _cache.values())
+        stats['max_bytes'] = max_bytes
+        largest = sorted(_cache.items(), key=lambda item: item[1]['bytes'], reverse=True)[:LARGEST_ENTRIES]
+        stats['largest'] = [
+            {'key': key[:12], 'bytes': entry['bytes'], 'raw_bytes': entry['raw_bytes'], 'compressed': entry['payload'] is not None}
+            for key, entry in largest
+        ]
+    stats['disk'] = get_disk_cache_stats()
+    return stats
@@ -0,0 +1,114 @@
+import threading
+import time
+from contextlib import contextmanager
+import streamlit as st
+
+try:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+except ImportError:
+    get_script_run_ctx = None
+
+try:
+    from streamlit.runtime.scriptrunner_utils.script_requests import ScriptRequestType
+except ImportError:
+    try:
+        from streamlit.runtime.scriptrunner.script_requests import ScriptRequestType
+    except ImportError:
+        ScriptRequestType = None
+
+# Pembatalan query milik run yang sudah digantikan rerun, bisa di-override lewat [query_cancel] di st.secrets
+CANCEL_DEFAULTS = {
+    'enabled': True,
+    'poll_interval': 0.2
+}
+
+_running_lock = threading.Lock()
+_running = {}
+_watcher_state = {
+    'thread': None
+}
+_cancel_stats = {
+    'tracked': 0,
+    'cancelled': 0,
+    'cancel_errors': 0
+}
+
+class QueryCancelled(Exception):
+    """Query dibatalkan karena sesi pemiliknya sudah memulai run baru (atau ditutup)"""
+
+def get_cancel_config():
+    """Konfigurasi pembatalan yang berlaku (default + st.secrets["query_cancel"])"""
+    config = dict(CANCEL_DEFAULTS)
+    try:
+        config.update(dict(st.secrets.get("query_cancel", {})))
+    except Exception:
+        pass
+    return config
+
+def _superseded(ctx):
+    """True jika sesi sudah meminta rerun atau stop sehingga run yang sedang berjalan tidak lagi dibutuhkan"""
+    state = getattr(ctx.script_requests, '_state', None)
+    return state is not None and state != ScriptRequestType.CONTINUE
+
+def _watch(poll_interval):
+    """Thread latar: membatalkan statement milik run yang sudah digantikan lewat cancel dari driver"""
+    while True:
+        time.sleep(poll_interval)
+        with _running_lock:
+            for entry in _running.values():
+                if entry['cancelled'] or not _superseded(entry['ctx']):
+                    continue
+                entry['cancelled'] = True
+                try:
+                    entry['driver_connection'].cancel()
+                    _cancel_stats['cancelled'] += 1
+                except Exception:
+                    _cancel_stats['cancel_errors'] += 1
+
+def _ensure_watcher(poll_interval):
+    with _running_lock:
+        thread = _watcher_state['thread']
+        if thread is None or not thread.is_alive():
+            thread = threading.Thread(target=_watch, args=(poll_interval,), name="query-cancel-watcher", daemon=True)
+            thread.start()
+            _watcher_state['thread'] = thread
+
+@contextmanager
+def track_statement(conn, name):
+    """Mendaftarkan statement yang berjalan pada conn untuk sesi Streamlit pemanggil; dibatalkan jika sesi itu rerun"""
+    ctx = get_script_run_ctx(suppress_warning=True) if get_script_run_ctx is not None else None
+    config = get_cancel_config()
+    if ctx is None or getattr(ctx, 'script_requests', None) is None or ScriptRequestType is None or not config['enabled']:
+        yield
+        return
+
+    _ensure_watcher(float(config['poll_interval']))
+    entry = {
+        'session_id': ctx.session_id,
+        'ctx': ctx,
+        'name': name,
+        'driver_connection': conn.connection.driver_connection,
+        'cancelled': False
+    }
+    token = object()
+    with _running_lock:
+        _running[token] = entry
+        _cancel_stats['tracked'] += 1
+    try:
+        yield
+    except Exception as e:
+        if entry['cancelled']:
+            raise QueryCancelled(f"{name} superseded by a newer run") from e
+        raise
+    finally:
+        # Dilepas di bawah lock supaya cancel tidak pernah dikirim ke koneksi yang sudah kembali ke pool
+        with _running_lock:
+            del _running[token]
+
+def get_cancel_stats():
+    """Statistik statement yang dilacak dan dibatalkan per sesi"""
+    with _running_lock:
+        stats = dict(_cancel_stats)
+        stats['in_flight'] = len(_running)
+        stats['sessions'] = len({entry['session_id'] for entry in _running.values()})
+    return stats
@@ -0,0 +1,123 @@
+import threading
+import time
+import streamlit as st
+from database.cache import cache_get_last
+
+try:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+except ImportError:
+    get_script_run_ctx = None
+
+# Circuit breaker database, bisa di-override lewat [circuit_breaker] di st.secrets
+CIRCUIT_DEFAULTS = {
+    'enabled': True,
+    'failure_threshold': 3,
+    'probe_interval': 10
+}
+
+_circuit_lock = threading.Lock()
+_circuit_state = {
+    'state': 'closed',
+    'failures': 0,
+    'opened_at': None,
+    'last_error': None,
+    'probe': None
+}
+_circuit_stats = {
+    'trips': 0,
+    'recoveries': 0,
+    'probes': 0,
+    'short_circuited': 0,
+    'stale_served': 0
+}
+_stale_by_session = {}
+
+def get_circuit_config():
+    """Konfigurasi circuit breaker yang berlaku (default + st.secrets["circuit_breaker"])"""
+    config = dict(CIRCUIT_DEFAULTS)
+    try:
+        config.update(dict(st.secrets.get("circuit_breaker", {})))
+    except Exception:
+        pass
+    return config
+
+def circuit_open():
+    """True jika database dianggap tidak sehat sehingga query tidak dikirim sama sekali"""
+    return bool(get_circuit_config()['enabled']) and _circuit_state['state'] == 'open'
+
+def record_success():
+    """Query berhasil: hitungan kegagalan beruntun dimulai dari nol lagi"""
+    with _circuit_lock:
+        _circuit_state['failures'] = 0
+
+def record_failure(error, probe):
+    """Query gagal atau timeout; setelah failure_threshold kegagalan beruntun circuit terbuka dan probe latar dimulai"""
+    config = get_circuit_config()
+    if not config['enabled']:
+        return
+    with _circuit_lock:
+        _circuit_state['failures'] += 1
+        _circuit_state['last_error'] = str(error)
+        if _circuit_state['state'] == 'open' or _circuit_state['failures'] < int(config['failure_threshold']):
+            return
+        _circuit_state.update(state='open', opened_at=time.time())
+        _circuit_stats['trips'] += 1
+        thread = threading.Thread(target=_probe_until_recovered, args=(probe,), name="db-circuit-probe", daemon=True)
+        _circuit_state['probe'] = thread
+    thread.start()
+
+def _probe_until_recovered(probe):
+    """Thread latar: menjalankan probe tiap probe_interval detik sampai database merespons lagi, lalu menutup circuit"""
+    while True:
+        time.sleep(float(get_circuit_config()['probe_interval']))
+        with _circuit_lock:
+            _circuit_stats['probes'] += 1
+        try:
+            healthy = probe()
+        except Exception:
+            healthy = False
+        if healthy:
+            with _circuit_lock:
+                _circuit_state.update(state='closed', failures=0, opened_at=None, probe=None)
+                _circuit_stats['recoveries'] += 1
+            return
+
+def _session_id():
+    ctx = get_script_run_ctx(suppress_warning=True) if get_script_run_ctx is not None else None
+    return ctx.session_id if ctx is not None else None
+
+def last_good(key, short_circuited=False):
+    """Salinan hasil terakhir yang berhasil untuk key (tanpa watermark), ditandai stale lewat df.attrs (None jika tidak ada).
+    Hasil diambil dari cache query sehingga ikut budget max_bytes-nya; query tanpa cache (ttl 0) tidak punya cadangan"""
+    session_id = _session_id()
+    with _circuit_lock:
+        if short_circuited:
+            _circuit_stats['short_circuited'] += 1
+    last = cache_get_last(key)
+    if last is None:
+        return None
+    df, stored_at = last
+    with _circuit_lock:
+        _circuit_stats['stale_served'] += 1
+        _stale_by_session[session_id] = _stale_by_session.get(session_id, 0) + 1
+    df.attrs['stale'] = True
+    df.attrs['stored_at'] = stored_at
+    return df
+
+def get_stale_count():
+    """Jumlah hasil stale yang sudah diberikan ke sesi pemanggil (untuk banner di halaman)"""
+    session_id = _session_id()
+    with _circuit_lock:
+        return _stale_by_session.get(session_id, 0)
+
+def get_circuit_stats():
+    """Status circuit breaker dan jumlah hasil stale yang diberikan"""
+    with _circuit_lock:
+        stats = dict(_circuit_stats)
+        stats.update({
+            'state': _circuit_state['state'],
+            'failures': _circuit_state['failures'],
+            'open_for_s': round(time.time() - _circuit_state['opened_at'], 1) if _circuit_state['opened_at'] else 0,
+            'last_error': _circuit_state['last_error']
+        })
+    return stats
@@ -1,7 +1,126 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 import streamlit as st
 import pandas as pd
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import DBAPIError
 from urllib.parse import quote_plus
+from database.cache import make_cache_key, cache_get, cache_get_stale, cache_put, get_cache_stats, normalize_sql
+from database.frames import compact_frame, frame_nbytes
+from database.watermark import poll_watermarks, last_watermarks, query_watermark, depends_on_clock, get_watermark_stats
+from database.singleflight import coalesce, begin_flight, end_flight, wait_flight, get_flight_stats
+from database.cancellation import track_statement, QueryCancelled, get_cancel_stats
+from database.scheduler import acquire_slot, CLASS_PRIORITIES, get_scheduler_stats
+from database.circuit import circuit_open, record_success, record_failure, last_good, get_circuit_stats
+from data.page_loader import load_page_data
+
+# Default pool, bisa di-override lewat bagian [pool] di st.secrets
+POOL_DEFAULTS = {
+    'pool_size': 10,
+    'max_overflow': 20,
+    'pool_timeout': 30,
+    'pool_recycle': 1800,
+    'pool_pre_ping': True,
+    'application_name': 'chicago_crime_dashboard',
+    'connect_timeout': 10
+}
+
+# statement_timeout (ms) per kelas query, bisa di-override lewat [statement_timeout] di st.secrets
+STATEMENT_TIMEOUTS = {
+    'kpi': 5000,
+    'chart': 15000,
+    'map': 30000,
+    'detail': 30000,
+    'export': 120000,
+    'metadata': 5000,
+    'build': 300000
+}
+
+# TTL cache (detik) per kelas query; 0 = tidak di-cache.
+# Query atas tabel yang dilacak data_watermark disimpan tanpa batas waktu sampai watermark-nya berubah;
+# TTL ini hanya dipakai untuk query lain (information_schema, CURRENT_DATE) atau jika watermark tidak tersedia
+QUERY_TTLS = {
+    'kpi': 600,
+    'chart': 600,
+    'map': 600,
+    'detail': 300,
+    'export': 0,
+    'metadata': 3600,
+    'build': 0
+}
+
+# Prepared statement server-side per koneksi pool, bisa di-override lewat [prepared_statements] di st.secrets
+PREPARED_STATEMENT_DEFAULTS = {
+    'enabled': True,
+    'max_per_connection': 100
+}
+
+# Stale-while-revalidate: hasil yang sudah tidak segar tetap diberikan selama max_stale detik sambil diperbarui di latar,
+# bisa di-override lewat [stale_while_revalidate] di st.secrets
+STALE_WHILE_REVALIDATE_DEFAULTS = {
+    'enabled': True,
+    'max_stale': 900
+}
+
+_PARAM_PATTERN = re.compile(r"%\((\w+)\)s")
+
+_pool_stats_lock = threading.Lock()
+_pool_stats = {
+    'checkouts': 0,
+    'connections_opened': 0,
+    'overflow_events': 0,
+    'wait_total_ms': 0.0,
+    'wait_max_ms': 0.0
+}
+
+def _secrets_section(name):
+    """Membaca satu bagian st.secrets sebagai dict (kosong jika tidak ada)"""
+    try:
+        return dict(st.secrets.get(name, {}))
+    except Exception:
+        return {}
+
+def get_pool_config():
+    """Konfigurasi pool yang berlaku (default + st.secrets["pool"])"""
+    config = dict(POOL_DEFAULTS)
+    config.update(_secrets_section("pool"))
+    return config
+
+def get_statement_timeout(query_class):
+    """statement_timeout (ms) untuk kelas query tertentu"""
+    timeouts = dict(STATEMENT_TIMEOUTS)
+    timeouts.update(_secrets_section("statement_timeout"))
+    return int(timeouts.get(query_class, timeouts['chart']))
+
+def get_stale_while_revalidate_config():
+    """Konfigurasi stale-while-revalidate yang berlaku (default + st.secrets["stale_while_revalidate"])"""
+    config = dict(STALE_WHILE_REVALIDATE_DEFAULTS)
+    config.update(_secrets_section("stale_while_revalidate"))
+    return config
+
+def get_prepared_statement_config():
+    """Konfigurasi prepared statement yang berlaku (default + st.secrets["prepared_statements"])"""
+    config = dict(PREPARED_STATEMENT_DEFAULTS)
+    config.update(_secrets_section("prepared_statements"))
+    return config
+
+def _register_pool_events(engine):
+    """Mencatat statistik checkout dan overflow dari pool engine"""
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        with _pool_stats_lock:
+            _pool_stats['connections_opened'] += 1
+            if engine.pool.overflow() > 0:
+                _pool_stats['overflow_events'] += 1
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        with _pool_stats_lock:
+            _pool_stats['checkouts'] += 1
 
 # Koneksi DB
 @st.cache_resource
@@ -12,36 +131,463 @@ def init_connection():
             'port': st.secrets["postgres"]["port"],
             'database': st.secrets["postgres"]["database"],
             'user': st.secrets["postgres"]["user"],
-            'password': st.secrets["postgres"]["password"]
+            'password': st.secrets["postgres"]["password"],
+            'driver': st.secrets["postgres"].get("driver", "psycopg2")
         }
+        pool_config = get_pool_config()
         
-        connection_string = f"postgresql://{DB_CONFIG['user']}:{quote_plus(DB_CONFIG['password'])}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
-        engine = create_engine(connection_string)
+        connection_string = f"postgresql+{DB_CONFIG['driver']}://{DB_CONFIG['user']}:{quote_plus(DB_CONFIG['password'])}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
+        engine = create_engine(
+            connection_string,
+            pool_size=int(pool_config['pool_size']),
+            max_overflow=int(pool_config['max_overflow']),
+            pool_timeout=float(pool_config['pool_timeout']),
+            pool_recycle=int(pool_config['pool_recycle']),
+            pool_pre_ping=bool(pool_config['pool_pre_ping']),
+            connect_args={
+                'application_name': pool_config['application_name'],
+                'connect_timeout': int(pool_config['connect_timeout'])
+            }
+        )
+        _register_pool_events(engine)
         return engine
     except Exception as e:
         st.error(f"Error connecting to database: {e}")
         return None
 
+@contextmanager
+def checkout_connection(engine, query_class='chart', name=None):
+    """Menunggu slot scheduler kelas query, mengambil koneksi dari pool, mencatat waktu tunggu, memasang statement_timeout, dan melacak statement untuk sesi pemanggil"""
+    with acquire_slot(query_class):
+        start = time.perf_counter()
+        with engine.connect() as conn:
+            wait_ms = (time.perf_counter() - start) * 1000
+            with _pool_stats_lock:
+                _pool_stats['wait_total_ms'] += wait_ms
+                _pool_stats['wait_max_ms'] = max(_pool_stats['wait_max_ms'], wait_ms)
+            with conn.begin():
+                conn.exec_driver_sql(f"SET LOCAL statement_timeout = {get_statement_timeout(query_class)}")
+                with track_statement(conn, name or query_class):
+                    yield conn
+
+def get_pool_stats():
+    """Statistik pool saat ini untuk menyesuaikan ukuran pool dengan konkurensi nyata"""
+    engine = init_connection()
+    if engine is None:
+        return {}
+
+    pool = engine.pool
+    with _pool_stats_lock:
+        stats = dict(_pool_stats)
+    stats.update({
+        'pool_size': pool.size(),
+        'checked_out': pool.checkedout(),
+        'checked_in': pool.checkedin(),
+        'overflow': pool.overflow(),
+        'wait_avg_ms': round(stats['wait_total_ms'] / stats['checkouts'], 2) if stats['checkouts'] else 0.0
+    })
+    stats['wait_total_ms'] = round(stats['wait_total_ms'], 2)
+    stats['wait_max_ms'] = round(stats['wait_max_ms'], 2)
+    return stats
+
+_query_stats_lock = threading.Lock()
+_query_stats = {}
+_batch_stats = {
+    'batches': 0,
+    'jobs': 0,
+    'db_jobs': 0,
+    'pipelined': 0,
+    'sequential': 0,
+    'round_trips_saved': 0
+}
+_revalidate_stats = {
+    'started': 0,
+    'completed': 0,
+    'errors': 0
+}
+_prepared_stats = {
+    'prepares': 0,
+    'executions': 0,
+    'plan_hits': 0,
+    'fallbacks': 0,
+    'deallocations': 0
+}
+
+def _record_query(name, cache_hit, db_ms=0.0, df=None, coalesced=False, stale=False):
+    nbytes = frame_nbytes(df)
+    with _query_stats_lock:
+        stats = _query_stats.setdefault(name, {'calls': 0, 'cache_hits': 0, 'stale_hits': 0, 'coalesce_hits': 0, 'db_calls': 0, 'db_ms': 0.0, 'rows': 0, 'result_bytes': 0})
+        stats['calls'] += 1
+        if cache_hit:
+            stats['cache_hits'] += 1
+            if stale:
+                stats['stale_hits'] += 1
+        elif coalesced:
+            stats['coalesce_hits'] += 1
+        else:
+            stats['db_calls'] += 1
+            stats['db_ms'] += db_ms
+        if df is not None:
+            stats['rows'] = len(df)
+            stats['result_bytes'] = nbytes
+
+def get_query_stats():
+    """Statistik eksekusi query per fungsi data (panggilan, cache hit, round trip ke DB)"""
+    with _query_stats_lock:
+        per_query = {name: dict(stats, db_ms=round(stats['db_ms'], 2)) for name, stats in _query_stats.items()}
+    with _query_stats_lock:
+        prepared = dict(_prepared_stats)
+        batches = dict(_batch_stats)
+        revalidations = dict(_revalidate_stats)
+    return {
+        'cache': get_cache_stats(),
+        'watermark': get_watermark_stats(),
+        'coalescing': get_flight_stats(),
+        'cancellation': get_cancel_stats(),
+        'scheduler': get_scheduler_stats(),
+        'circuit': get_circuit_stats(),
+        'prepared': prepared,
+        'batches': batches,
+        'revalidations': revalidations,
+        'db_round_trips': sum(stats['db_calls'] for stats in per_query.values()) - batches['round_trips_saved'],
+        'queries': per_query
+    }
+
+def to_prepared_sql(query):
+    """Mengubah placeholder %(name)s menjadi $n untuk PREPARE; mengembalikan (sql, urutan nama parameter)"""
+    names = []
+
+    def replace(match):
+        if match.group(1) not in names:
+            names.append(match.group(1))
+        return f"${names.index(match.group(1)) + 1}"
+
+    return _PARAM_PATTERN.sub(replace, normalize_sql(query)).replace("%%", "%"), names
+
+def _remember_prepared(conn, prepared, statement, is_prepared, max_per_connection):
+    """Mencatat status PREPARE per koneksi (LRU); statement yang tergusur di-DEALLOCATE jika memang pernah disiapkan"""
+    prepared[statement] = is_prepared
+    while len(prepared) > max_per_connection:
+        oldest, was_prepared = prepared.popitem(last=False)
+        if not was_prepared:
+            continue
+        conn.exec_driver_sql(f"DEALLOCATE {oldest}")
+        with _query_stats_lock:
+            _prepared_stats['deallocations'] += 1
+
+def _execute_prepared(conn, query, params, max_per_connection):
+    """PREPARE query sekali per koneksi pool, lalu EXECUTE dengan parameter terikat"""
+    sql, names = to_prepared_sql(query)
+    statement = "dash_" + hashlib.sha1(sql.encode("utf-8")).hexdigest()[:16]
+    prepared = conn.info.setdefault('prepared_statements', OrderedDict())
+
+    if statement in prepared:
+        prepared.move_to_end(statement)
+        if not prepared[statement]:
+            # PREPARE pernah gagal di koneksi ini, langsung jalankan query biasa
+            with _query_stats_lock:
+                _prepared_stats['fallbacks'] += 1
+            return pd.read_sql_query(query, conn, params=params)
+        plan_hit = True
+    else:
+        try:
+            with conn.begin_nested():
+                conn.exec_driver_sql(f"PREPARE {statement} AS {sql}")
+        except Exception:
+            _remember_prepared(conn, prepared, statement, False, max_per_connection)
+            with _query_stats_lock:
+                _prepared_stats['fallbacks'] += 1
+            return pd.read_sql_query(query, conn, params=params)
+        _remember_prepared(conn, prepared, statement, True, max_per_connection)
+        plan_hit = False
+
+    with _query_stats_lock:
+        _prepared_stats['executions'] += 1
+        _prepared_stats['plan_hits' if plan_hit else 'prepares'] += 1
+    arguments = ", ".join(f"%({name})s" for name in names)
+    return pd.read_sql_query(f"EXECUTE {statement}({arguments})", conn, params=params)
+
+def read_frame(conn, query, params=None):
+    """Menjalankan query pada koneksi yang sudah di-checkout dan mengembalikan DataFrame ber-dtype ringkas; query berparameter memakai prepared statement (psycopg2)"""
+    config = get_prepared_statement_config()
+    if not params:
+        df = pd.read_sql_query(query, conn)
+    elif config['enabled'] and conn.dialect.driver == 'psycopg2':
+        df = _execute_prepared(conn, query, params, int(config['max_per_connection']))
+    else:
+        df = pd.read_sql_query(query, conn, params=params)
+    return compact_frame(df)
+
+def get_data_versions():
+    """Version data per tabel dari data_watermark (None jika koneksi/tabel tidak tersedia)"""
+    if circuit_open():
+        # Saat circuit terbuka, pakai version terakhir supaya entri cache yang ada tetap terpakai
+        return last_watermarks()
+    engine = init_connection()
+    if engine is None:
+        return None
+    return poll_watermarks(engine)
+
+def _driver_errors():
+    """Kelas exception dasar driver yang terpasang (dipakai pipeline psycopg yang tidak dibungkus SQLAlchemy)"""
+    errors = []
+    for module in ('psycopg', 'psycopg2'):
+        try:
+            errors.append(__import__(module).Error)
+        except ImportError:
+            pass
+    return tuple(errors)
+
+_DRIVER_ERRORS = _driver_errors()
+
+def _is_database_error(error):
+    """True jika error datang dari database/driver; antrean scheduler dan pool lokal yang penuh tidak dihitung circuit breaker"""
+    return isinstance(error, DBAPIError) or isinstance(error, _DRIVER_ERRORS)
+
+def _probe_database():
+    """Probe circuit breaker: SELECT 1 singkat pada koneksi baru dari pool"""
+    engine = init_connection()
+    if engine is None:
+        return False
+    with engine.connect() as conn:
+        with conn.begin():
+            conn.exec_driver_sql(f"SET LOCAL statement_timeout = {get_statement_timeout('kpi')}")
+            conn.exec_driver_sql("SELECT 1")
+    return True
+
+def _cache_slot(query, params, query_class, ttl):
+    """Key, watermark, dan TTL cache untuk satu query (None jika query tidak di-cache)"""
+    if ttl is None:
+        ttl = QUERY_TTLS.get(query_class, QUERY_TTLS['chart'])
+    if not ttl:
+        return None
+    watermark = query_watermark(query, get_data_versions())
+    return {
+        'key': make_cache_key(query, params, watermark),
+        'watermark': watermark,
+        'ttl': None if watermark is not None and not depends_on_clock(query) else ttl
+    }
+
 # Query
-@st.cache_data(ttl=600) 
-def run_query(query, params=None):
-    """Menjalankan query SQL dan mengembalikan DataFrame"""
+def _execute_query(query, params, query_class, name, slot, base_key):
+    """Satu eksekusi query ke database; hasilnya dicatat dan disimpan ke cache (yang juga menjadi cadangan circuit breaker)"""
+    engine = init_connection()
+    if engine is None:
+        return None
+    
+    start = time.perf_counter()
     try:
-        engine = init_connection()
-        if engine is None:
-            return None
-        
-        if params:
-            df = pd.read_sql_query(query, engine, params=params)
-        else:
-            df = pd.read_sql_query(query, engine)
+        with checkout_connection(engine, query_class, name) as conn:
+            df = read_frame(conn, query, params)
+    except QueryCancelled:
+        raise
+    except Exception as e:
+        if _is_database_error(e):
+            record_failure(e, _probe_database)
+        raise
+    record_success()
+    _record_query(name, cache_hit=False, db_ms=(time.perf_counter() - start) * 1000, df=df)
+
+    if slot:
+        cache_put(slot['key'], df, slot['ttl'], slot['watermark'], base_key)
+    return df
+
+def _revalidate(query, params, query_class, name, slot, base_key):
+    """Memperbarui entri cache di thread latar; tidak melakukan apa-apa jika query yang sama sedang berjalan"""
+    flight, leader = begin_flight(slot['key'])
+    if not leader:
+        return
+    with _query_stats_lock:
+        _revalidate_stats['started'] += 1
+
+    def refresh():
+        try:
+            df = _execute_query(query, params, query_class, name, slot, base_key)
+        except Exception as e:
+            end_flight(slot['key'], flight, error=e)
+            with _query_stats_lock:
+                _revalidate_stats['errors'] += 1
+            return
+        end_flight(slot['key'], flight, df=df)
+        with _query_stats_lock:
+            _revalidate_stats['completed'] += 1
+
+    threading.Thread(target=refresh, name="cache-revalidate", daemon=True).start()
+
+def _serve_stale(query, params, query_class, name, slot, base_key):
+    """Hasil lama yang masih dalam batas max_stale (None jika tidak ada); pembaruannya dijalankan di latar"""
+    config = get_stale_while_revalidate_config()
+    if not config['enabled']:
+        return None
+    df = cache_get_stale(base_key, float(config['max_stale']))
+    if df is None:
+        return None
+    _record_query(name, cache_hit=True, df=df, stale=True)
+    if not circuit_open():
+        _revalidate(query, params, query_class, name, slot, base_key)
+    return df
+
+def run_query(query, params=None, query_class='chart', ttl=None, name=None):
+    """Menjalankan query SQL lewat cache bersama dan mengembalikan DataFrame (None jika gagal)"""
+    name = name or query_class
+    slot = _cache_slot(query, params, query_class, ttl)
+    # Key per query+parameter tanpa watermark: hasil lama (stale-while-revalidate) dan cadangan circuit breaker
+    base_key = make_cache_key(query, params)
+    if slot:
+        cached = cache_get(slot['key'])
+        if cached is not None:
+            _record_query(name, cache_hit=True, df=cached)
+            return cached
+        stale = _serve_stale(query, params, query_class, name, slot, base_key)
+        if stale is not None:
+            return stale
+
+    if circuit_open():
+        return last_good(base_key, short_circuited=True)
+
+    try:
+        # Pemanggil bersamaan dengan key yang sama menunggu satu eksekusi yang sedang berjalan
+        df, coalesced = coalesce(slot['key'] if slot else base_key, lambda: _execute_query(query, params, query_class, name, slot, base_key),
+                                 retry_on=QueryCancelled)
+        if coalesced:
+            _record_query(name, cache_hit=False, df=df, coalesced=True)
         return df
+    except QueryCancelled:
+        # Run ini sudah digantikan rerun; tidak perlu pesan error di halaman
+        return None
     except Exception as e:
-        st.error(f"Error executing query: {e}")
+        stale = last_good(base_key)
+        if stale is not None:
+            return stale
+        st.error(f"Error fetching {name}: {e}")
         return None
 
+def _read_frames_pipelined(conn, jobs):
+    """Mengirim semua query (query, params) dalam satu pipeline psycopg 3 pada koneksi yang sama; hasil sesuai urutan job"""
+    driver_connection = conn.connection.driver_connection
+    cursors = []
+    with driver_connection.pipeline():
+        for query, params in jobs:
+            cursor = driver_connection.cursor()
+            cursor.execute(query, params or None)
+            cursors.append(cursor)
+
+    frames = []
+    for cursor in cursors:
+        columns = [column.name for column in cursor.description]
+        frames.append(compact_frame(pd.DataFrame.from_records(cursor.fetchall(), columns=columns, coerce_float=True)))
+        cursor.close()
+    return frames
+
+def run_query_batch(jobs):
+    """Menjalankan beberapa job (query, params[, query_class[, name]]) secara paralel per kelas query (atau per job tanpa pipeline) dan mengembalikan DataFrame sesuai urutan job"""
+    jobs = [(tuple(job) + (None, None, None))[:4] for job in jobs]
+    results = [None] * len(jobs)
+    pending = []
+    joined = []
+    for index, (query, params, query_class, name) in enumerate(jobs):
+        query_class = query_class or 'chart'
+        slot = _cache_slot(query, params, query_class, None)
+        base_key = make_cache_key(query, params)
+        cached = cache_get(slot['key']) if slot else None
+        if cached is None and slot:
+            cached = _serve_stale(query, params, query_class, name or query_class, slot, base_key)
+        elif cached is not None:
+            _record_query(name or query_class, cache_hit=True, df=cached)
+        if cached is not None:
+            results[index] = cached
+            continue
+        if circuit_open():
+            results[index] = last_good(base_key, short_circuited=True)
+            continue
+        key = slot['key'] if slot else base_key
+        flight, leader = begin_flight(key)
+        if leader:
+            pending.append((index, query, params, query_class, name or query_class, slot, key, flight))
+        else:
+            joined.append((index, query, params, query_class, name or query_class, flight))
+    if pending:
+        _run_batch_jobs(pending, len(jobs), results)
+
+    # Job yang sedang dijalankan sesi lain cukup ditunggu hasilnya
+    for index, query, params, query_class, name, flight in joined:
+        try:
+            results[index] = wait_flight(flight)
+            _record_query(name, cache_hit=False, df=results[index], coalesced=True)
+        except QueryCancelled:
+            # Pemimpinnya (sesi lain) dibatalkan, jalankan sendiri
+            results[index] = run_query(query, params, query_class, name=name)
+        except Exception as e:
+            results[index] = last_good(make_cache_key(query, params))
+            if results[index] is None:
+                st.error(f"Error fetching {name}: {e}")
+    return results
+
+def _run_batch_jobs(pending, total_jobs, results):
+    """Menjalankan job batch yang belum ada di cache secara paralel: satu koneksi per kelas query dengan pipeline psycopg 3, satu koneksi per job jika driver tidak mendukung pipeline"""
+    with _query_stats_lock:
+        _batch_stats['batches'] += 1
+        _batch_stats['jobs'] += total_jobs
+    engine = init_connection()
+    if engine is not None and engine.dialect.driver == 'psycopg':
+        groups = {}
+        for job in pending:
+            groups.setdefault(job[3], []).append(job)
+        units = [(query_class, groups[query_class]) for query_class in groups]
+    else:
+        # Tanpa pipeline, menjalankan job berurutan pada satu koneksi hanya menambah latensi; jalankan bersamaan seperti page loader
+        units = [(job[3], [job]) for job in pending]
+    # Setiap kelas mengambil slot scheduler dan statement_timeout-nya sendiri, jadi job detail tetap tunduk pada batas kelas detail
+    units.sort(key=lambda unit: CLASS_PRIORITIES.get(unit[0], CLASS_PRIORITIES['chart']))
+    load_page_data({position: (_run_class_batch, query_class, jobs, results) for position, (query_class, jobs) in enumerate(units)})
+
+def _run_class_batch(query_class, pending, results):
+    """Menjalankan job satu kelas query pada satu koneksi dan menyelesaikan flight masing-masing"""
+    frames = [None] * len(pending)
+    error = None
+    try:
+        engine = init_connection()
+        if engine is None:
+            return
+
+        start = time.perf_counter()
+        with checkout_connection(engine, query_class, ', '.join(job[4] for job in pending)) as conn:
+            if conn.dialect.driver == 'psycopg' and len(pending) > 1:
+                frames = _read_frames_pipelined(conn, [(job[1], job[2]) for job in pending])
+                pipelined = True
+            else:
+                # frames baru diganti setelah semua job selesai supaya finally tetap mengakhiri flight setiap job
+                frames = [read_frame(conn, job[1], job[2]) for job in pending]
+                pipelined = False
+        db_ms = (time.perf_counter() - start) * 1000
+
+        with _query_stats_lock:
+            _batch_stats['db_jobs'] += len(pending)
+            _batch_stats['pipelined' if pipelined else 'sequential'] += 1
+            if pipelined:
+                _batch_stats['round_trips_saved'] += len(pending) - 1
+        record_success()
+        for (index, query, params, query_class, name, slot, key, flight), df in zip(pending, frames):
+            _record_query(name, cache_hit=False, db_ms=db_ms / len(pending), df=df)
+            if slot:
+                cache_put(slot['key'], df, slot['ttl'], slot['watermark'], make_cache_key(query, params))
+            results[index] = df
+    except QueryCancelled as e:
+        error = e
+    except Exception as e:
+        error = e
+        if _is_database_error(e):
+            record_failure(e, _probe_database)
+        stale = [last_good(make_cache_key(job[1], job[2])) for job in pending]
+        for job, df in zip(pending, stale):
+            results[job[0]] = df
+        if any(df is None for df in stale):
+            st.error(f"Error fetching {', '.join(job[4] for job, df in zip(pending, stale) if df is None)}: {e}")
+    finally:
+        for (index, query, params, query_class, name, slot, key, flight), df in zip(pending, frames):
+            end_flight(key, flight, df=df, error=error)
+
 # Tabel
-@st.cache_data(ttl=3600)  
 def get_table_info():
     """Mendapatkan informasi tentang tabel-tabel dalam database"""
     query = """
@@ -50,10 +596,9 @@ def get_table_info():
     WHERE table_schema = 'public' 
     ORDER BY table_name, ordinal_position;
     """
-    return run_query(query)
+    return run_query(query, query_class='metadata', name="table info")
 
 # Daftar tabel
-@st.cache_data(ttl=3600)
 def get_tables():
     """Mendapatkan daftar nama tabel"""
     query = """
@@ -62,7 +607,7 @@ def get_tables():
     WHERE table_schema = 'public' 
     ORDER BY table_name;
     """
-    return run_query(query)
+    return run_query(query, query_class='metadata', name="tables")
 
 # Test koneksi db
 def test_database_connection():
@@ -72,7 +617,7 @@ def test_database_connection():
         try:
             # Test query
             test_query = "SELECT 1 as test"
-            result = run_query(test_query)
+            result = run_query(test_query, query_class='metadata', ttl=0, name="test query")
             if result is not None:
                 st.success("✅ Database connected successfully!")
 
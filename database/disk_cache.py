@@ -0,0 +1,225 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+import streamlit as st
+from database.frames import frame_to_ipc, frame_from_ipc
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Cache hasil query di disk (file Arrow IPC + index SQLite) yang dipakai bersama oleh semua proses server,
+# bisa di-override lewat [disk_cache] di st.secrets; directory harus sama untuk semua proses.
+# max_bytes = total ukuran file (entri yang paling lama tidak dibaca dibuang lebih dulu), max_age = umur maksimum entri (detik, 0 = tanpa batas)
+DISK_CACHE_DEFAULTS = {
+    'enabled': True,
+    'directory': '.query_cache',
+    'compression': 'zstd',
+    'max_bytes': 1073741824,
+    'max_age': 86400
+}
+
+_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    base_key TEXT NOT NULL,
+    file TEXT NOT NULL,
+    tables TEXT NOT NULL,
+    expires_at REAL,
+    stored_at REAL NOT NULL,
+    bytes INTEGER NOT NULL,
+    watermark TEXT,
+    accessed_at REAL
+)
+"""
+
+# Kolom yang ditambahkan setelah versi pertama index; index lama di-ALTER saat dibuka
+_ADDED_COLUMNS = {
+    'watermark': "TEXT",
+    'accessed_at': "REAL"
+}
+
+_disk_lock = threading.Lock()
+_disk_state = {
+    'directory': None
+}
+_disk_stats = {
+    'hits': 0,
+    'misses': 0,
+    'writes': 0,
+    'skipped_older': 0,
+    'replaced': 0,
+    'expired_removed': 0,
+    'evictions': 0,
+    'errors': 0
+}
+
+def get_disk_cache_config():
+    """Konfigurasi disk cache yang berlaku (default + st.secrets["disk_cache"])"""
+    config = dict(DISK_CACHE_DEFAULTS)
+    try:
+        config.update(dict(st.secrets.get("disk_cache", {})))
+    except Exception:
+        pass
+    return config
+
+def _directory():
+    """Directory disk cache yang sudah siap dipakai (index dibuat sekali per proses), None jika tidak aktif"""
+    config = get_disk_cache_config()
+    if pa is None or not config['enabled']:
+        return None
+    directory = os.path.abspath(config['directory'])
+    with _disk_lock:
+        if _disk_state['directory'] != directory:
+            os.makedirs(directory, exist_ok=True)
+            with _connect(directory) as index:
+                index.execute("PRAGMA journal_mode=WAL")
+                index.execute(_INDEX_SCHEMA)
+                columns = {row[1] for row in index.execute("PRAGMA table_info(entries)").fetchall()}
+                for column, column_type in _ADDED_COLUMNS.items():
+                    if column not in columns:
+                        index.execute(f"ALTER TABLE entries ADD COLUMN {column} {column_type}")
+                index.execute("CREATE INDEX IF NOT EXISTS idx_entries_base_key ON entries (base_key)")
+                index.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed_at ON entries (accessed_at)")
+            _disk_state['directory'] = directory
+    return directory
+
+@contextmanager
+def _connect(directory):
+    """Koneksi ke index SQLite; commit di akhir blok lalu ditutup"""
+    connection = sqlite3.connect(os.path.join(directory, "index.sqlite"), timeout=10)
+    try:
+        with connection:
+            yield connection
+    finally:
+        connection.close()
+
+def _count(stat, amount=1):
+    with _disk_lock:
+        _disk_stats[stat] += amount
+
+def _is_newer(stored, watermark):
+    """True jika watermark entri yang tersimpan lebih baru dari watermark kita untuk salah satu tabel (entri tanpa watermark dianggap lebih lama)"""
+    if not stored:
+        return False
+    stored = json.loads(stored)
+    return any(version > (watermark or {}).get(table, -1) for table, version in stored.items())
+
+def _remove_files(directory, files):
+    for file in files:
+        try:
+            os.remove(os.path.join(directory, file))
+        except OSError:
+            pass
+
+def _sweep(index, config):
+    """Menghapus baris yang kedaluwarsa atau melewati max_age, lalu yang paling lama tidak dibaca sampai total ukuran <= max_bytes; mengembalikan file yang harus dihapus"""
+    now = time.time()
+    max_age = float(config['max_age'])
+    expired = index.execute("SELECT key, file FROM entries WHERE expires_at <= ? OR (? > 0 AND stored_at < ?)",
+                            (now, max_age, now - max_age)).fetchall()
+    index.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in expired])
+
+    evicted = []
+    excess = index.execute("SELECT COALESCE(SUM(bytes), 0) FROM entries").fetchone()[0] - int(config['max_bytes'])
+    if excess > 0:
+        for key, file, size in index.execute("SELECT key, file, bytes FROM entries ORDER BY COALESCE(accessed_at, stored_at)").fetchall():
+            if excess <= 0:
+                break
+            evicted.append((key, file))
+            excess -= size
+        index.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in evicted])
+    _count('expired_removed', len(expired))
+    _count('evictions', len(evicted))
+    return [file for _, file in expired + evicted]
+
+def disk_get(key):
+    """Entri untuk key dari disk jika ada dan belum kedaluwarsa: dict df, base_key, tables, expires_at (None jika tidak ada)"""
+    try:
+        directory = _directory()
+        if directory is None:
+            return None
+        with _connect(directory) as index:
+            row = index.execute("SELECT file, base_key, tables, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[3] is not None and row[3] <= time.time()):
+            _count('misses')
+            return None
+        with pa.OSFile(os.path.join(directory, row[0]), 'rb') as source:
+            df = frame_from_ipc(source)
+        with _connect(directory) as index:
+            # Waktu baca terakhir menentukan urutan eviction saat disk cache melewati max_bytes
+            index.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+    except Exception:
+        _count('errors')
+        return None
+    _count('hits')
+    return {'df': df, 'base_key': row[1], 'tables': set(filter(None, row[2].split(','))), 'expires_at': row[3]}
+
+def disk_put(key, base_key, df, expires_at, watermark=None):
+    """Menulis DataFrame sebagai file Arrow IPC (atomic rename) dan mendaftarkannya di index. Entri lain untuk base_key yang sama
+    hanya diganti jika watermark-nya lebih lama; jika proses lain sudah menyimpan hasil dari data yang lebih baru, tulisan ini dilewati"""
+    try:
+        directory = _directory()
+        if directory is None:
+            return
+        config = get_disk_cache_config()
+        file = f"{key}.arrow"
+        path = os.path.join(directory, file)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        buffer = frame_to_ipc(df, config['compression'])
+        with pa.OSFile(temp_path, 'wb') as sink:
+            sink.write(buffer)
+
+        with _connect(directory) as index:
+            # Kunci tulis diambil sebelum membaca entri lain supaya pemeriksaan watermark dan penggantiannya atomic antar proses
+            index.execute("BEGIN IMMEDIATE")
+            previous = index.execute("SELECT key, file, watermark FROM entries WHERE base_key = ? AND key != ?", (base_key, key)).fetchall()
+            if any(_is_newer(stored, watermark) for _, _, stored in previous):
+                os.remove(temp_path)
+                _count('skipped_older')
+                return
+            os.replace(temp_path, path)
+            index.executemany("DELETE FROM entries WHERE key = ?", [(previous_key,) for previous_key, _, _ in previous])
+            now = time.time()
+            index.execute(
+                "INSERT OR REPLACE INTO entries (key, base_key, file, tables, expires_at, stored_at, bytes, watermark, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, base_key, file, ','.join(sorted(watermark or ())), expires_at, now, os.path.getsize(path),
+                 json.dumps(watermark, sort_keys=True) if watermark else None, now)
+            )
+            removed = _sweep(index, config)
+        _count('replaced', len(previous))
+        _remove_files(directory, [previous_file for _, previous_file, _ in previous] + removed)
+    except Exception:
+        _count('errors')
+        return
+    _count('writes')
+
+def clear_disk_cache():
+    """Menghapus semua file dan index disk cache"""
+    directory = _directory()
+    if directory is None:
+        return
+    with _connect(directory) as index:
+        files = [row[0] for row in index.execute("SELECT file FROM entries").fetchall()]
+        index.execute("DELETE FROM entries")
+    _remove_files(directory, files)
+
+def get_disk_cache_stats():
+    """Statistik disk cache (hit/miss dan eviction proses ini, jumlah entri dan ukuran file bersama terhadap max_bytes)"""
+    with _disk_lock:
+        stats = dict(_disk_stats)
+    stats['enabled'] = False
+    try:
+        directory = _directory()
+        if directory is not None:
+            with _connect(directory) as index:
+                entries, total_bytes = index.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM entries").fetchone()
+            stats.update(enabled=True, entries=entries, bytes=total_bytes, max_bytes=int(get_disk_cache_config()['max_bytes']))
+    except Exception:
+        pass
+    return stats
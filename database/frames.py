@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Kolom string dengan rasio nilai unik <= batas ini disimpan sebagai category, sisanya sebagai string Arrow
+CATEGORY_MAX_RATIO = 0.5
+
+# Kolom float yang cukup disimpan sebagai float32 (koordinat)
+FLOAT32_COLUMNS = ('latitude', 'longitude')
+
+_INT32 = np.iinfo(np.int32)
+
+def _compact_column(series):
+    """Satu kolom hasil query dalam dtype yang paling hemat tanpa mengubah nilainya"""
+    if pd.api.types.is_bool_dtype(series) or isinstance(series.dtype, pd.CategoricalDtype):
+        return series
+    if pd.api.types.is_integer_dtype(series):
+        if series.empty or (series.min() >= _INT32.min and series.max() <= _INT32.max):
+            return series.astype(np.int32)
+        return series
+    if pd.api.types.is_float_dtype(series):
+        return series.astype(np.float32) if series.name in FLOAT32_COLUMNS else series
+    if pd.api.types.infer_dtype(series, skipna=True) == "string":
+        if len(series) and series.nunique(dropna=True) <= CATEGORY_MAX_RATIO * len(series):
+            return series.astype("category")
+        return series.astype(pd.StringDtype("pyarrow"))
+    return series
+
+def compact_frame(df):
+    """Mengubah DataFrame hasil query ke dtype ringkas: int32, float32 untuk koordinat, category/string Arrow untuk teks"""
+    if df is None or df.empty:
+        return df
+    return pd.DataFrame({column: _compact_column(df[column]) for column in df.columns}, index=df.index)
+
+def frame_nbytes(df):
+    """Ukuran DataFrame di memori (byte), termasuk isi string"""
+    if df is None:
+        return 0
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+def frame_to_ipc(df, compression=None):
+    """DataFrame sebagai buffer Arrow IPC, opsional dikompresi per kolom (misalnya 'zstd')"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # Codec yang tidak tersedia di build pyarrow ini: disimpan tanpa kompresi
+    options = pa.ipc.IpcWriteOptions(compression=compression) if compression and pa.Codec.is_available(compression) else None
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, table.schema, options=options) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+def frame_from_ipc(buffer):
+    """DataFrame dari buffer atau file Arrow IPC (hasil frame_to_ipc) dengan dtype aslinya"""
+    return pa.ipc.open_file(buffer).read_all().to_pandas()
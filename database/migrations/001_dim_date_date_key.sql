@@ -0,0 +1,16 @@
+-- Kunci tanggal terurut (yyyymmdd) pada dim_date agar filter rentang tanggal
+-- dapat memakai index, menggantikan rantai OR year/month/day dan MAKE_DATE.
+-- Kolom generated sehingga baris dim_date baru dari ETL otomatis terisi.
+
+ALTER TABLE dim_date
+    ADD COLUMN IF NOT EXISTS date_key INTEGER
+    GENERATED ALWAYS AS (year * 10000 + month * 100 + day) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_dim_date_date_key
+    ON dim_date (date_key) INCLUDE (id_date, daytime, weekday);
+
+CREATE INDEX IF NOT EXISTS idx_crime_facts_id_date
+    ON crime_facts (id_date);
+
+ANALYZE dim_date;
+ANALYZE crime_facts;
@@ -0,0 +1,56 @@
+-- Cube agregat harian: SUM(incident_count) per tanggal, daytime, weekday,
+-- kategori kejahatan, kategori lokasi, status arrest dan domestic.
+-- Dipakai oleh grafik/KPI yang tidak butuh koordinat atau deskripsi, sehingga
+-- tidak perlu scan crime_facts + join ke dimensi setiap kali halaman dibuka.
+-- LEFT JOIN agar fakta tanpa kategori tetap terhitung (id kategori NULL);
+-- query yang dulu memakai INNER JOIN menyaring id kategori IS NOT NULL.
+-- Measure di-cast ke integer (cukup untuk grain harian) supaya SUM di atas cube
+-- tetap bigint seperti SUM(incident_count) pada crime_facts.
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS crime_daily_cube AS
+SELECT
+    dd.date_key,
+    dd.year,
+    dd.month,
+    dd.day,
+    dd.daytime,
+    dd.weekday,
+    dcc.id_crime_category,
+    dcc.crime_category,
+    dlc.id_location_category,
+    dlc.location_category,
+    cf.arrest_status,
+    cf.domestic_status,
+    COUNT(*)::integer AS fact_rows,
+    SUM(cf.incident_count)::integer AS incident_count
+FROM crime_facts cf
+JOIN dim_date dd ON cf.id_date = dd.id_date
+LEFT JOIN dim_crime dc ON cf.id_crime = dc.id_crime
+LEFT JOIN dim_crime_category dcc ON dc.id_crime_category = dcc.id_crime_category
+LEFT JOIN dim_location dl ON cf.id_location = dl.id_location
+LEFT JOIN dim_location_category dlc ON dl.id_location_category = dlc.id_location_category
+GROUP BY
+    dd.date_key, dd.year, dd.month, dd.day, dd.daytime, dd.weekday,
+    dcc.id_crime_category, dcc.crime_category,
+    dlc.id_location_category, dlc.location_category,
+    cf.arrest_status, cf.domestic_status
+WITH DATA;
+
+-- Unique index wajib untuk REFRESH ... CONCURRENTLY (dashboard tetap bisa membaca saat refresh)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_crime_daily_cube_grain
+    ON crime_daily_cube (date_key, daytime, weekday, id_crime_category, id_location_category, arrest_status, domestic_status);
+
+CREATE INDEX IF NOT EXISTS idx_crime_daily_cube_date_key
+    ON crime_daily_cube (date_key);
+
+-- Jalankan setelah setiap load ETL: CALL refresh_crime_daily_cube();
+CREATE OR REPLACE PROCEDURE refresh_crime_daily_cube()
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    REFRESH MATERIALIZED VIEW CONCURRENTLY crime_daily_cube;
+    ANALYZE crime_daily_cube;
+END;
+$$;
+
+ANALYZE crime_daily_cube;
@@ -0,0 +1,62 @@
+-- Watermark versi data per tabel. Setiap statement INSERT/UPDATE/DELETE/TRUNCATE
+-- pada tabel fakta/dimensi menaikkan version dan loaded_at tabel tersebut, dan
+-- refresh_crime_daily_cube() menaikkan watermark crime_daily_cube.
+-- Dashboard menyimpan hasil query dengan key yang memuat version tabel-tabel
+-- yang dibaca, jadi cache dipakai terus sampai ada load data yang benar-benar
+-- menyentuh tabel tersebut.
+
+CREATE TABLE IF NOT EXISTS data_watermark (
+    table_name TEXT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    loaded_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION bump_data_watermark_for(target TEXT)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    INSERT INTO data_watermark (table_name, version, loaded_at)
+    VALUES (target, 1, now())
+    ON CONFLICT (table_name)
+    DO UPDATE SET version = data_watermark.version + 1, loaded_at = now();
+$$;
+
+CREATE OR REPLACE FUNCTION bump_data_watermark()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM bump_data_watermark_for(TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$;
+
+DO $$
+DECLARE
+    target TEXT;
+BEGIN
+    FOREACH target IN ARRAY ARRAY['crime_facts', 'dim_date', 'dim_crime', 'dim_crime_category', 'dim_location', 'dim_location_category']
+    LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_%1$s_watermark ON %1$I', target);
+        EXECUTE format('CREATE TRIGGER trg_%1$s_watermark AFTER INSERT OR UPDATE OR DELETE ON %1$I
+                        FOR EACH STATEMENT EXECUTE FUNCTION bump_data_watermark()', target);
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_%1$s_watermark_truncate ON %1$I', target);
+        EXECUTE format('CREATE TRIGGER trg_%1$s_watermark_truncate AFTER TRUNCATE ON %1$I
+                        FOR EACH STATEMENT EXECUTE FUNCTION bump_data_watermark()', target);
+        INSERT INTO data_watermark (table_name) VALUES (target) ON CONFLICT DO NOTHING;
+    END LOOP;
+END;
+$$;
+
+INSERT INTO data_watermark (table_name) VALUES ('crime_daily_cube') ON CONFLICT DO NOTHING;
+
+-- Menggantikan versi dari migrasi 002: refresh cube juga menaikkan watermark-nya
+CREATE OR REPLACE PROCEDURE refresh_crime_daily_cube()
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    REFRESH MATERIALIZED VIEW CONCURRENTLY crime_daily_cube;
+    ANALYZE crime_daily_cube;
+    PERFORM bump_data_watermark_for('crime_daily_cube');
+END;
+$$;
@@ -0,0 +1,153 @@
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+import streamlit as st
+
+# Admission control query, bisa di-override lewat [scheduler] di st.secrets.
+# max_active = total query yang boleh berjalan bersamaan; reserved_interactive = bagian dari max_active yang hanya boleh dipakai kelas interaktif
+SCHEDULER_DEFAULTS = {
+    'enabled': True,
+    'max_active': 12,
+    'reserved_interactive': 3,
+    'max_wait': 60
+}
+
+# Batas konkurensi per kelas, bisa di-override lewat [scheduler_limits] di st.secrets
+CLASS_LIMITS = {
+    'kpi': 12,
+    'metadata': 4,
+    'chart': 8,
+    'map': 4,
+    'detail': 2,
+    'export': 1,
+    'build': 1
+}
+
+# Prioritas antrean (angka kecil didahulukan); kelas dengan prioritas 0 dianggap interaktif
+CLASS_PRIORITIES = {
+    'kpi': 0,
+    'metadata': 0,
+    'chart': 1,
+    'map': 2,
+    'detail': 3,
+    'export': 4,
+    'build': 5
+}
+
+# Jumlah waktu tunggu terakhir per kelas yang disimpan untuk menghitung p95
+WAIT_SAMPLES = 500
+
+_scheduler_condition = threading.Condition()
+_sequence = itertools.count()
+_waiting = {}
+_active = {}
+_class_stats = {}
+
+class QueueTimeout(Exception):
+    """Query tidak mendapat slot dalam batas waktu tunggu antrean"""
+
+def get_scheduler_config():
+    """Konfigurasi scheduler yang berlaku (default + st.secrets["scheduler"] dan st.secrets["scheduler_limits"])"""
+    config = dict(SCHEDULER_DEFAULTS)
+    limits = dict(CLASS_LIMITS)
+    try:
+        config.update(dict(st.secrets.get("scheduler", {})))
+        limits.update(dict(st.secrets.get("scheduler_limits", {})))
+    except Exception:
+        pass
+    config['limits'] = limits
+    return config
+
+def _stats_for(query_class):
+    return _class_stats.setdefault(query_class, {
+        'admitted': 0,
+        'timeouts': 0,
+        'max_queue_depth': 0,
+        'wait_total_ms': 0.0,
+        'wait_max_ms': 0.0,
+        'waits': deque(maxlen=WAIT_SAMPLES)
+    })
+
+def _can_start(query_class, config):
+    """Apakah kelas ini masih punya slot (batas kelas, batas total, dan slot cadangan untuk kelas interaktif)"""
+    total = sum(_active.values())
+    capacity = int(config['max_active'])
+    if CLASS_PRIORITIES.get(query_class, CLASS_PRIORITIES['chart']) > 0:
+        capacity -= int(config['reserved_interactive'])
+    limit = int(config['limits'].get(query_class, config['limits']['chart']))
+    return total < capacity and _active.get(query_class, 0) < limit
+
+def _next_ticket(config):
+    """Tiket menunggu dengan prioritas tertinggi (lalu paling lama menunggu) yang bisa dijalankan sekarang"""
+    runnable = [ticket for ticket, query_class in _waiting.items() if _can_start(query_class, config)]
+    return min(runnable) if runnable else None
+
+@contextmanager
+def acquire_slot(query_class):
+    """Menunggu giliran sesuai prioritas dan batas konkurensi kelas query, lalu menahan slot selama query berjalan"""
+    config = get_scheduler_config()
+    if not config['enabled']:
+        yield
+        return
+
+    start = time.perf_counter()
+    ticket = (CLASS_PRIORITIES.get(query_class, CLASS_PRIORITIES['chart']), next(_sequence))
+    deadline = time.monotonic() + float(config['max_wait'])
+    with _scheduler_condition:
+        stats = _stats_for(query_class)
+        _waiting[ticket] = query_class
+        depth = sum(1 for waiting_class in _waiting.values() if waiting_class == query_class)
+        stats['max_queue_depth'] = max(stats['max_queue_depth'], depth)
+        while _next_ticket(config) != ticket:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                del _waiting[ticket]
+                stats['timeouts'] += 1
+                _scheduler_condition.notify_all()
+                raise QueueTimeout(f"No {query_class} slot after {config['max_wait']} s")
+            _scheduler_condition.wait(remaining)
+        del _waiting[ticket]
+        _active[query_class] = _active.get(query_class, 0) + 1
+        wait_ms = (time.perf_counter() - start) * 1000
+        stats['admitted'] += 1
+        stats['wait_total_ms'] += wait_ms
+        stats['wait_max_ms'] = max(stats['wait_max_ms'], wait_ms)
+        stats['waits'].append(wait_ms)
+        # Tiket berikutnya mungkin kelas lain yang juga bisa jalan
+        _scheduler_condition.notify_all()
+    try:
+        yield
+    finally:
+        with _scheduler_condition:
+            _active[query_class] -= 1
+            _scheduler_condition.notify_all()
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def get_scheduler_stats():
+    """Statistik scheduler per kelas: slot aktif, kedalaman antrean, dan waktu tunggu (rata-rata, p95, maks)"""
+    with _scheduler_condition:
+        per_class = {}
+        for query_class, stats in _class_stats.items():
+            waits = list(stats['waits'])
+            per_class[query_class] = {
+                'active': _active.get(query_class, 0),
+                'queued': sum(1 for waiting_class in _waiting.values() if waiting_class == query_class),
+                'max_queue_depth': stats['max_queue_depth'],
+                'admitted': stats['admitted'],
+                'timeouts': stats['timeouts'],
+                'wait_avg_ms': round(stats['wait_total_ms'] / stats['admitted'], 2) if stats['admitted'] else 0.0,
+                'wait_p95_ms': round(_percentile(waits, 0.95), 2),
+                'wait_max_ms': round(stats['wait_max_ms'], 2)
+            }
+        return {
+            'active': sum(_active.values()),
+            'queued': len(_waiting),
+            'classes': per_class
+        }
@@ -0,0 +1,74 @@
+import threading
+
+_flight_lock = threading.Lock()
+_flights = {}
+_flight_stats = {
+    'leaders': 0,
+    'coalesced': 0,
+    'shared_errors': 0,
+    'max_waiters': 0
+}
+
+class Flight:
+    """Satu eksekusi query yang sedang berjalan; pemanggil lain dengan key yang sama menunggu hasilnya"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.df = None
+        self.error = None
+        self.waiters = 0
+
+def begin_flight(key):
+    """Mendaftarkan pemanggil untuk key; mengembalikan (flight, True) jika pemanggil harus menjalankan query sendiri"""
+    with _flight_lock:
+        flight = _flights.get(key)
+        if flight is not None:
+            flight.waiters += 1
+            _flight_stats['coalesced'] += 1
+            _flight_stats['max_waiters'] = max(_flight_stats['max_waiters'], flight.waiters)
+            return flight, False
+        flight = Flight()
+        _flights[key] = flight
+        _flight_stats['leaders'] += 1
+        return flight, True
+
+def end_flight(key, flight, df=None, error=None):
+    """Menyimpan hasil (atau error) eksekusi dan membangunkan semua pemanggil yang menunggu"""
+    flight.df = df
+    flight.error = error
+    with _flight_lock:
+        if _flights.get(key) is flight:
+            del _flights[key]
+        if error is not None and flight.waiters:
+            _flight_stats['shared_errors'] += flight.waiters
+    flight.done.set()
+
+def wait_flight(flight):
+    """Menunggu eksekusi pemimpin selesai; mengembalikan salinan hasilnya atau melempar error yang sama"""
+    flight.done.wait()
+    if flight.error is not None:
+        raise flight.error
+    return flight.df.copy() if flight.df is not None else None
+
+def coalesce(key, function, retry_on=()):
+    """Menjalankan function() sekali untuk semua pemanggil bersamaan dengan key yang sama; mengembalikan (hasil, coalesced), penunggu yang menerima error retry_on mencoba lagi"""
+    flight, leader = begin_flight(key)
+    while not leader:
+        try:
+            return wait_flight(flight), True
+        except retry_on:
+            flight, leader = begin_flight(key)
+    try:
+        df = function()
+    except Exception as e:
+        end_flight(key, flight, error=e)
+        raise
+    end_flight(key, flight, df=df)
+    return df, False
+
+def get_flight_stats():
+    """Statistik penggabungan query yang sedang berjalan (single-flight)"""
+    with _flight_lock:
+        stats = dict(_flight_stats)
+        stats['in_flight'] = len(_flights)
+    return stats
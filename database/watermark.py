@@ -0,0 +1,90 @@
+import re
+import threading
+import time
+import streamlit as st
+from database.cache import invalidate_tables
+
+# Interval polling tabel data_watermark (detik), bisa di-override lewat [watermark] di st.secrets
+WATERMARK_DEFAULTS = {
+    'poll_interval': 5
+}
+
+_TABLE_PATTERN = re.compile(r"\b(?:FROM|JOIN)\s+([A-Za-z_][A-Za-z0-9_.]*)", re.IGNORECASE)
+_CLOCK_PATTERN = re.compile(r"\b(?:CURRENT_DATE|CURRENT_TIMESTAMP|LOCALTIMESTAMP|NOW\s*\()", re.IGNORECASE)
+
+_watermark_lock = threading.Lock()
+_watermark_state = {
+    'versions': None,
+    'checked_at': 0.0
+}
+_watermark_stats = {
+    'polls': 0,
+    'poll_errors': 0,
+    'changes': 0
+}
+
+def get_watermark_config():
+    """Konfigurasi watermark yang berlaku (default + st.secrets["watermark"])"""
+    config = dict(WATERMARK_DEFAULTS)
+    try:
+        config.update(dict(st.secrets.get("watermark", {})))
+    except Exception:
+        pass
+    return config
+
+def tables_in_query(query):
+    """Nama tabel (tanpa schema) yang muncul setelah FROM/JOIN pada teks SQL"""
+    return sorted({name.split(".")[-1].lower() for name in _TABLE_PATTERN.findall(query)})
+
+def depends_on_clock(query):
+    """True jika hasil query bergantung pada waktu sekarang (CURRENT_DATE, NOW(), ...)"""
+    return bool(_CLOCK_PATTERN.search(query))
+
+def query_watermark(query, versions):
+    """Version tabel-tabel yang dibaca query, None jika tidak ada tabel yang dilacak watermark"""
+    if not versions:
+        return None
+    watermark = {table: versions[table] for table in tables_in_query(query) if table in versions}
+    return watermark or None
+
+def poll_watermarks(engine):
+    """Version terbaru per tabel dari data_watermark, dibaca paling sering sekali per poll_interval detik"""
+    now = time.time()
+    with _watermark_lock:
+        if now - _watermark_state['checked_at'] < float(get_watermark_config()['poll_interval']):
+            return _watermark_state['versions']
+        _watermark_state['checked_at'] = now
+
+    try:
+        with engine.connect() as conn:
+            rows = conn.exec_driver_sql("SELECT table_name, version FROM data_watermark").fetchall()
+        versions = {table: int(version) for table, version in rows}
+    except Exception:
+        versions = None
+
+    with _watermark_lock:
+        _watermark_stats['polls'] += 1
+        if versions is None:
+            # Poll gagal: pertahankan version terakhir yang berhasil dibaca
+            _watermark_stats['poll_errors'] += 1
+            return _watermark_state['versions']
+        previous = _watermark_state['versions'] or {}
+        _watermark_state['versions'] = versions
+        changed = [table for table, version in versions.items() if table in previous and previous[table] != version]
+        _watermark_stats['changes'] += len(changed)
+
+    if changed:
+        invalidate_tables(changed)
+    return versions
+
+def last_watermarks():
+    """Version per tabel dari poll terakhir tanpa menghubungi database"""
+    with _watermark_lock:
+        return _watermark_state['versions']
+
+def get_watermark_stats():
+    """Statistik polling watermark dan version yang terakhir terbaca"""
+    with _watermark_lock:
+        stats = dict(_watermark_stats)
+        stats['versions'] = dict(_watermark_state['versions'] or {})
+    return stats
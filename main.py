@@ -1,5 +1,11 @@
 import streamlit as st
-from database.connection import test_database_connection
+from database.connection import test_database_connection, get_pool_stats, get_query_stats
+from database.circuit import circuit_open, get_stale_count
+from data.aggregate_engine import get_engine_stats
+from data.dimensions import get_dimension_stats
+from data.blocks import get_block_stats
+from data.prefix_index import get_prefix_index_stats
+from data.sketches import get_sketch_stats
 from views import overview, time_trends, geographic
 from styles.custom_css import apply_custom_styles
 
@@ -61,6 +67,27 @@ with st.sidebar:
         with st.spinner("Testing connection..."):
             test_database_connection()
 
+    with st.expander("📈 Pool Stats"):
+        st.json(get_pool_stats())
+
+    with st.expander("🧮 Query Stats"):
+        st.json(get_query_stats())
+
+    with st.expander("⚡ Engine Stats"):
+        st.json(get_engine_stats())
+
+    with st.expander("🗂️ Dimension Stats"):
+        st.json(get_dimension_stats())
+
+    with st.expander("🧱 Calendar Block Stats"):
+        st.json(get_block_stats())
+
+    with st.expander("➕ Prefix Index Stats"):
+        st.json(get_prefix_index_stats())
+
+    with st.expander("🔢 Sketch Stats"):
+        st.json(get_sketch_stats())
+
 # Content
 page = st.session_state.page
 
@@ -74,6 +101,10 @@ with title_container:
         </div>
     """, unsafe_allow_html=True)
 
+# Banner mode degradasi, diisi setelah halaman selesai dirender
+status_banner = st.empty()
+stale_before = get_stale_count()
+
 def render_page_subtitle(subtitle):
     st.markdown(f"""
         <div class="page-subtitle-container">
@@ -103,6 +134,9 @@ except Exception as e:
     st.error(f"An error occurred while loading the page: {str(e)}")
     st.info("Please try refreshing the page or contact support if the problem persists.")
 
+if circuit_open() or get_stale_count() > stale_before:
+    status_banner.warning("⚠️ Database sedang lambat atau tidak tersedia. Data yang ditampilkan adalah hasil terakhir yang berhasil dimuat dan mungkin belum terbaru.")
+
 # Footer
 st.markdown("---")
 footer_col1, footer_col2, footer_col3 = st.columns([1, 2, 1])
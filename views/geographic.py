@@ -3,9 +3,8 @@ import plotly.express as px
 import plotly.graph_objects as go
 from datetime import date
 from data.geographic_data import (
+    get_geographic_kpis,
     get_total_cases_by_date_range,
-    get_crime_hotspot_category_by_date_range,
-    get_risky_area_by_date_range,
     get_total_areas,
     get_map_data_by_date_range,
     get_crime_by_location_category,
@@ -13,8 +12,11 @@ from data.geographic_data import (
     get_crime_details_by_date_range,
     get_location_categories,
     get_crime_categories,
-    get_filtered_total_incidents_geographic  
+    get_filtered_total_incidents_geographic,
+    get_unique_crime_types_geographic,
+    get_distinct_coordinates_by_date_range
 )
+from data.page_loader import load_page_data
 
 def show():
     today = date.today()
@@ -43,14 +45,25 @@ def show():
         if start_date > end_date:
             st.error("Tanggal mulai tidak boleh lebih besar dari tanggal akhir")
         else:
-            # Fetch data from database
-            total_cases = get_total_cases_by_date_range(start_date, end_date)
-            hotspot_category, hotspot_cases = get_crime_hotspot_category_by_date_range(start_date, end_date)
-            risky_area, risky_cases = get_risky_area_by_date_range(start_date, end_date)
-            total_areas = get_total_areas()
-            map_data = get_map_data_by_date_range(start_date, end_date)
-            location_crime_data = get_crime_by_location_category(start_date, end_date)
-            top_locations_data = get_top_location_descriptions(start_date, end_date, limit=5)
+            # Fetch data from database (independent queries run concurrently)
+            page_data = load_page_data({
+                'kpis': (get_geographic_kpis, start_date, end_date),
+                'total_cases': (get_total_cases_by_date_range, start_date, end_date),
+                'total_areas': (get_total_areas, start_date, end_date),
+                'map_data': (get_map_data_by_date_range, start_date, end_date),
+                'location_crime_data': (get_crime_by_location_category, start_date, end_date),
+                'top_locations_data': (get_top_location_descriptions, start_date, end_date, 5),
+                'location_categories': (get_location_categories,),
+                'crime_categories': (get_crime_categories,)
+            })
+            kpis = page_data['kpis']
+            total_cases = page_data['total_cases']
+            hotspot_category, hotspot_cases = kpis['hotspot_category'], kpis['hotspot_cases']
+            risky_area, risky_cases = kpis['risky_area'], kpis['risky_cases']
+            total_areas = page_data['total_areas']
+            map_data = page_data['map_data']
+            location_crime_data = page_data['location_crime_data']
+            top_locations_data = page_data['top_locations_data']
             
             col1, col2, col3, col4 = st.columns(4)
 
@@ -186,6 +199,7 @@ def show():
                 )
                 
                 st.plotly_chart(fig, use_container_width=True)
+                st.caption(f"📍 Sekitar {get_distinct_coordinates_by_date_range(start_date, end_date):,} titik lokasi unik dalam rentang waktu ini")
                 
             else:
                 st.warning("Tidak ada data lokasi (latitude/longitude) untuk rentang tanggal yang dipilih.")
@@ -197,7 +211,7 @@ def show():
             # Crime by Location Category
             with col1:
                 if not location_crime_data.empty:
-                    location_totals = location_crime_data.groupby('location_category')['total_incidents'].sum().reset_index()
+                    location_totals = location_crime_data.groupby('location_category', observed=True)['total_incidents'].sum().reset_index()
                     location_totals = location_totals.sort_values('total_incidents', ascending=False)
 
                     total_all = location_totals['total_incidents'].sum()
@@ -209,7 +223,7 @@ def show():
                         incidents = row['total_incidents']
 
                         loc_crimes = location_crime_data[location_crime_data['location_category'] == loc_cat]
-                        top_crime = loc_crimes.groupby('crime_category')['total_incidents'].sum().sort_values(ascending=False).head(1)
+                        top_crime = loc_crimes.groupby('crime_category', observed=True)['total_incidents'].sum().sort_values(ascending=False).head(1)
                         
                         if not top_crime.empty:
                             top_crime_name = top_crime.index[0]
@@ -259,7 +273,7 @@ def show():
             # Lokasi Kejahatan Tertinggi
             with col2:                          
                 if not top_locations_data.empty:
-                    location_desc_totals = top_locations_data.groupby(['location_description', 'location_category']).agg({
+                    location_desc_totals = top_locations_data.groupby(['location_description', 'location_category'], observed=True).agg({
                         'total_incidents': 'sum'
                     }).reset_index()
 
@@ -272,7 +286,7 @@ def show():
                         incidents = row['total_incidents']
 
                         loc_crimes = top_locations_data[top_locations_data['location_description'] == loc_desc]
-                        top_crime = loc_crimes.groupby('crime_category')['total_incidents'].sum().sort_values(ascending=False).head(1)
+                        top_crime = loc_crimes.groupby('crime_category', observed=True)['total_incidents'].sum().sort_values(ascending=False).head(1)
                         
                         if not top_crime.empty:
                             top_crime_name = top_crime.index[0]
@@ -332,7 +346,7 @@ def show():
             col1, col2 = st.columns(2)
             
             with col1:
-                location_categories = get_location_categories()
+                location_categories = page_data['location_categories']
                 selected_location_category = st.selectbox(
                     "Pilih Kategori Area:",
                     options=location_categories,
@@ -340,7 +354,7 @@ def show():
                 )
             
             with col2:
-                crime_categories = get_crime_categories()
+                crime_categories = page_data['crime_categories']
                 selected_crime_category = st.selectbox(
                     "Pilih Kategori Kejahatan:",
                     options=crime_categories,
@@ -445,7 +459,11 @@ def show():
                     """, unsafe_allow_html=True)
                 
                 with col3:
-                    unique_crimes = display_data['primary_type'].nunique()
+                    unique_crimes = get_unique_crime_types_geographic(
+                        start_date, end_date,
+                        selected_location_category if selected_location_category != "Semua Area" else None,
+                        selected_crime_category if selected_crime_category != "Semua Kategori" else None
+                    )
                     st.markdown(f"""
                         <div style="
                             background: linear-gradient(135deg, #4facfe 0%, #00f2fe 100%);
@@ -2,23 +2,15 @@ import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from data.overview_data import (
-    get_total_cases,
-    get_common_crime,
-    get_trend_case,
-    get_arrest_rate,
-    get_crime_history_data,
-    get_arrest_rates_by_category,
-    get_cases_by_category,
-    get_domestic_status_by_category
-)
+from data.overview_data import get_overview_bundle
 
 def show():  
-    # Fetch real data from database
-    total_cases = get_total_cases()
-    common_crime = get_common_crime()
-    trend_case = get_trend_case()
-    arrest_rate = get_arrest_rate()
+    # Fetch real data from database (single pass over crime_facts)
+    bundle = get_overview_bundle()
+    total_cases = bundle.total_cases
+    common_crime = bundle.common_crime
+    trend_case = bundle.trend_case
+    arrest_rate = bundle.arrest_rate
     
     col1, col2, col3, col4 = st.columns(4)
     
@@ -96,7 +88,7 @@ def show():
 
     st.markdown("---")
     st.subheader("Crime History")
-    df_monthly = get_crime_history_data()
+    df_monthly = bundle.crime_history
     if not df_monthly.empty:
         df_monthly['Arrest_Percentage'] = (df_monthly['Arrested Cases'] / df_monthly['Total Crime'] * 100).round(2)
 
@@ -172,7 +164,7 @@ def show():
     col1, col2 = st.columns(2)
 
     with col1:
-        df_arrest_rates = get_arrest_rates_by_category()
+        df_arrest_rates = bundle.arrest_rates_by_category
         if not df_arrest_rates.empty:
             fig_arrest = px.bar(df_arrest_rates, x='Crime Type', y='Arrest Rate', 
                             title='Arrest Rate per Crime Category')
@@ -223,7 +215,7 @@ def show():
             st.error("No data available for arrest rate chart")
 
     with col2:
-        df_cases_category = get_cases_by_category()
+        df_cases_category = bundle.cases_by_category
         if not df_cases_category.empty:
             colorful_palette = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7', '#F7DC6F', '#BB8FCE', '#85C1E9', '#F8C471', '#82E0AA']
             
@@ -244,7 +236,7 @@ def show():
 
     st.markdown("---")
    
-    df_domestic_status = get_domestic_status_by_category()
+    df_domestic_status = bundle.domestic_status_by_category
     if not df_domestic_status.empty:
         max_domestic = df_domestic_status['domestic_cases'].max()
         max_non_domestic = df_domestic_status['non_domestic_cases'].max()
@@ -3,22 +3,16 @@ import plotly.express as px
 import plotly.graph_objects as go
 from datetime import date
 from data.time_trends_data import (
+    get_time_trends_bundle,
     get_total_cases_by_date_range,
-    get_risky_time_by_date_range,
-    get_risky_day_by_date_range,
-    get_risky_month_by_date_range,
-    get_crime_by_time_of_day,
-    get_crime_by_day_of_week,
-    get_crime_by_month,
-    get_crime_category_by_daytime,
-    get_crime_category_by_weekday,
-    get_crime_category_by_month,
     get_crime_detail_table,
     get_months_list,
     get_weekdays_list,
     get_daytime_list,
     get_crime_categories_list,
-    get_filtered_total_incidents 
+    get_filtered_total_incidents,
+    get_unique_crime_types,
+    prefetch_time_trends_page
 )
 
 def show():
@@ -48,14 +42,20 @@ def show():
         if start_date > end_date:
             st.error("Tanggal mulai tidak boleh lebih besar dari tanggal akhir")
         else:
-            # Fetch data from database
+            # Fetch data from database: all page queries go out in one batch, the getters below read them from cache
+            detail_filters = [
+                st.session_state.get(key, "Semua")
+                for key in ("time_trends_month", "time_trends_weekday", "time_trends_daytime", "time_trends_crime_category")
+            ]
+            prefetch_time_trends_page(start_date, end_date, *[value if value != "Semua" else None for value in detail_filters])
+            bundle = get_time_trends_bundle(start_date, end_date)
             total_cases = get_total_cases_by_date_range(start_date, end_date)
-            risky_time_data = get_risky_time_by_date_range(start_date, end_date)
-            risky_day_data = get_risky_day_by_date_range(start_date, end_date)
-            risky_month_data = get_risky_month_by_date_range(start_date, end_date)
-            df_time_of_day = get_crime_by_time_of_day(start_date, end_date)
-            df_days_of_week = get_crime_by_day_of_week(start_date, end_date)
-            df_crime_by_month = get_crime_by_month(start_date, end_date)
+            risky_time_data = bundle.risky_time
+            risky_day_data = bundle.risky_day
+            risky_month_data = bundle.risky_month
+            df_time_of_day = bundle.time_of_day
+            df_days_of_week = bundle.day_of_week
+            df_crime_by_month = bundle.by_month
             
             col1, col2, col3, col4 = st.columns(4)
 
@@ -211,7 +211,7 @@ def show():
             
             with tab1:
                 # Crime Category by Daytime
-                df_category_daytime = get_crime_category_by_daytime(start_date, end_date)
+                df_category_daytime = bundle.category_by_daytime
                 
                 if not df_category_daytime.empty:
                     fig_category_daytime = px.bar(
@@ -235,7 +235,7 @@ def show():
 
             with tab2:
                 # Weekday
-                df_category_weekday = get_crime_category_by_weekday(start_date, end_date)
+                df_category_weekday = bundle.category_by_weekday
                 
                 if not df_category_weekday.empty:
                     fig_category_weekday = px.bar(
@@ -259,7 +259,7 @@ def show():
 
             with tab3:
                 # Month
-                df_category_month = get_crime_category_by_month(start_date, end_date)
+                df_category_month = bundle.category_by_month
                 
                 if not df_category_month.empty:
                     fig_category_month = px.bar(
@@ -292,7 +292,8 @@ def show():
                 selected_month = st.selectbox(
                     "Pilih Bulan:",
                     options=["Semua"] + months_list,
-                    index=0
+                    index=0,
+                    key="time_trends_month"
                 )
             
             with col2:
@@ -300,7 +301,8 @@ def show():
                 selected_weekday = st.selectbox(
                     "Pilih Hari:",
                     options=["Semua"] + weekdays_list,
-                    index=0
+                    index=0,
+                    key="time_trends_weekday"
                 )
             
             with col3:
@@ -308,7 +310,8 @@ def show():
                 selected_daytime = st.selectbox(
                     "Pilih Waktu:",
                     options=["Semua"] + daytime_list,
-                    index=0
+                    index=0,
+                    key="time_trends_daytime"
                 )
             
             with col4:
@@ -316,7 +319,8 @@ def show():
                 selected_crime_category = st.selectbox(
                     "Pilih Kategori Kejahatan:",
                     options=["Semua"] + crime_categories_list,
-                    index=0
+                    index=0,
+                    key="time_trends_crime_category"
                 )
 
             crime_detail_data = get_crime_detail_table(
@@ -421,7 +425,13 @@ def show():
                     """, unsafe_allow_html=True)
 
                 with col3:
-                    unique_crimes = display_data['primary_type'].nunique() if not display_data.empty else 0
+                    unique_crimes = get_unique_crime_types(
+                        start_date, end_date,
+                        selected_month if selected_month != "Semua" else None,
+                        selected_weekday if selected_weekday != "Semua" else None,
+                        selected_daytime if selected_daytime != "Semua" else None,
+                        selected_crime_category if selected_crime_category != "Semua" else None
+                    )
                     st.markdown(f"""
                         <div style="
                             background: linear-gradient(135deg, #4facfe 0%, #00f2fe 100%);